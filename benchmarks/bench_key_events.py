@@ -0,0 +1,100 @@
+"""Feed keys through the key event buffer at fixed rates and measure what is sustained.
+
+The main thread calls KeyboardController.on_press at a steady rate, like the
+keyboard listener does while someone types, and the consumer thread handles
+the events as it would in the engine. For each rate this reports the events
+handled per second, the lag from on_press until the matcher decided, the
+average batch size and the keys dropped. A rate of 0 pushes the keys as fast
+as possible; with more keys than the buffer holds it shows what happens when
+the consumer falls behind.
+
+Usage:
+    python benchmarks/bench_key_events.py [--rates 50,200,1000,10000,0] [--seconds 5] [--size 10000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import KeyboardController
+from bench_keystrokes import RecordingTextInput, make_profile, make_stream, to_keys, wait_idle
+
+# Keys pushed unthrottled when the rate is 0, more than the event buffer holds
+BURST_KEYS = 50_000
+
+
+def feed(on_press, keys, rate):
+    clock = time.perf_counter
+    start = clock()
+    if not rate:
+        for key in keys:
+            on_press(key)
+        return
+    interval = 1.0 / rate
+    for i, key in enumerate(keys):
+        due = start + i * interval
+        delay = due - clock()
+        # Sleeping, not spinning, leaves the GIL to the consumer like the real listener does
+        if delay > 0:
+            time.sleep(delay)
+        on_press(key)
+
+
+def run(controller, stream, rate, seconds):
+    count = int(rate * seconds) if rate else BURST_KEYS
+    keys = to_keys((stream * (count // len(stream) + 1))[:count])
+    events = controller.key_events
+    consumer = controller.key_consumer
+    controller.matcher.reset()
+    controller.metrics.reset()
+    dropped = events.dropped
+    batches = consumer.batches
+
+    start = time.perf_counter()
+    feed(controller.on_press, keys, rate)
+    wait_idle(controller)
+    elapsed = time.perf_counter() - start
+
+    dropped = events.dropped - dropped
+    batches = consumer.batches - batches
+    handled = len(keys) - dropped
+    lag = controller.metrics.histograms['keystroke']
+    ms = 1e6
+    label = f"{rate}/s" if rate else "burst"
+    print(f"{label:>9} | {len(keys):>7} keys in {elapsed:6.2f} s, {handled / elapsed:10.0f} events/s handled,"
+          f" {dropped} dropped")
+    print(f"          lag p50 {lag.percentile(0.5) / ms:7.3f} ms  p99 {lag.percentile(0.99) / ms:7.3f} ms"
+          f"  max {lag.max / ms:7.3f} ms | {batches} batches, {handled / max(batches, 1):6.1f} events each")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rates', default='50,200,1000,10000,0', help="comma separated keys per second, 0 for a burst")
+    parser.add_argument('--seconds', type=float, default=5.0, help="how long each rate is fed")
+    parser.add_argument('--size', type=int, default=10_000, help="shortcuts in the profile")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        profiles_file = os.path.join(workdir, 'profiles.json')
+        with open(profiles_file, 'w') as f:
+            json.dump({'Default': make_profile(args.size, rng)}, f)
+        controller = KeyboardController(profiles_file=profiles_file, text_input=RecordingTextInput(), metrics=True,
+                                        usage_file=os.path.join(workdir, 'usage.json'))
+        stream = make_stream(list(controller.shortcuts), 20_000, rng)
+        print(f"event buffer of {controller.key_events.capacity} keys, {args.size} shortcuts")
+        for rate in (int(r) for r in args.rates.split(',')):
+            run(controller, stream, rate, args.seconds)
+        controller.key_consumer.stop()
+        controller.injector.stop()
+        controller.profiles.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Replay keystroke streams through KeyboardController.on_press without a display.
+
+Keys are fake pynput keys and injection goes to a recording backend, so this
+runs anywhere. Reports how long on_press holds the listener thread,
+expansions and keys handled per second, allocations and peak memory for each
+profile size. The replay pauses for the event buffer to drain whenever it is
+half full, so no keys are dropped. Sizes run in
+increasing order, so the process peak RSS reported for each one is the peak
+for that profile.
+
+Usage:
+    python benchmarks/bench_keystrokes.py [--sizes 10,10000,1000000] [--keys 200000]
+    python benchmarks/bench_keystrokes.py --stream recorded.txt   # '\\b' is backspace
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import KeyboardController
+
+
+class FakeKeyCode:
+    """Stands in for pynput.keyboard.KeyCode."""
+
+    __slots__ = ('char',)
+
+    def __init__(self, char):
+        self.char = char
+
+
+class FakeKey:
+    """Stands in for a pynput.keyboard.Key member."""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+
+SPECIAL_KEYS = {' ': FakeKey('space'), '\n': FakeKey('enter'), '\t': FakeKey('tab'), '\b': FakeKey('backspace')}
+
+
+class RecordingTextInput:
+    """Backend stub that records injections instead of sending them."""
+
+    # Tagged like the Windows backend, so no echo filtering is needed
+    EVENT_TAG = 0
+
+    def __init__(self):
+        self.calls = []
+
+    def replace_text(self, count, text):
+        self.calls.append(('type', count, text))
+
+    def paste_text(self, count, text):
+        self.calls.append(('paste', count, text))
+
+    def move_left(self, count):
+        self.calls.append(('left', count))
+
+    def can_paste(self):
+        return True
+
+    def replay_events(self, events):
+        pass
+
+
+def make_profile(size, rng):
+    shortcuts = {}
+    while len(shortcuts) < size:
+        length = rng.randint(2, 8)
+        trigger = ''.join(rng.choices(string.ascii_lowercase, k=length))
+        shortcuts[trigger] = ' '.join(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+                                      for _ in range(rng.randint(1, 6)))
+    return shortcuts
+
+
+def make_stream(triggers, count, rng):
+    """Random words with a trigger every few words, ending in varied delimiters."""
+    text = []
+    total = 0
+    while total < count:
+        if triggers and rng.random() < 0.2:
+            word = rng.choice(triggers)
+        else:
+            word = ''.join(rng.choices(string.ascii_letters, k=rng.randint(1, 10)))
+            if rng.random() < 0.05:
+                word += '\b'
+        word += rng.choice('      .,\n')
+        text.append(word)
+        total += len(word)
+    return ''.join(text)[:count]
+
+
+def to_keys(text):
+    return [SPECIAL_KEYS.get(char) or FakeKeyCode(char) for char in text]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def peak_rss_mib():
+    if resource is None:
+        return float('nan')
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def wait_idle(controller):
+    while len(controller.key_events) or controller.injector.busy or controller._pending_keys:
+        time.sleep(0.001)
+
+
+def replay(controller, keys, latencies=None):
+    on_press = controller.on_press
+    events = controller.key_events
+    high_water = events.capacity // 2
+    clock = time.perf_counter_ns
+    for key in keys:
+        if len(events) >= high_water:
+            wait_idle(controller)
+        if latencies is None:
+            on_press(key)
+        else:
+            t0 = clock()
+            on_press(key)
+            latencies.append(clock() - t0)
+    wait_idle(controller)
+
+
+def run(size, keys_text, key_count, rng, workdir, metrics=False):
+    profiles_file = os.path.join(workdir, f'profiles_{size}.json')
+    shortcuts = make_profile(size, rng)
+    with open(profiles_file, 'w') as f:
+        json.dump({'Default': shortcuts}, f)
+    del shortcuts
+
+    gc.collect()
+    start = time.perf_counter()
+    text_input = RecordingTextInput()
+    controller = KeyboardController(profiles_file=profiles_file, text_input=text_input, metrics=metrics)
+    load_seconds = time.perf_counter() - start
+
+    if keys_text is None:
+        # Generated per size so the triggers come from this profile
+        keys_text = make_stream(list(controller.shortcuts), key_count, rng)
+    keys = to_keys(keys_text)
+
+    # Timed pass
+    latencies = []
+    start = time.perf_counter()
+    replay(controller, keys, latencies)
+    elapsed = time.perf_counter() - start
+    expansions = len(text_input.calls)
+
+    # Allocation pass, traced separately so it doesn't skew the timings
+    controller.matcher.reset()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    replay(controller, keys)
+    after = tracemalloc.take_snapshot()
+    _, replay_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    allocated_blocks = sum(max(stat.count_diff, 0) for stat in stats)
+
+    controller.key_consumer.stop()
+    controller.injector.stop()
+    controller.profiles.close()
+
+    latencies.sort()
+    us = 1000.0
+    print(f"{size:>9} shortcuts | load {load_seconds * 1000:8.1f} ms, process peak RSS {peak_rss_mib():7.1f} MiB")
+    print(f"          keystrokes {len(keys):>8} | p50 {percentile(latencies, 0.5) / us:6.2f} us"
+          f"  p90 {percentile(latencies, 0.9) / us:6.2f} us  p99 {percentile(latencies, 0.99) / us:6.2f} us"
+          f"  max {latencies[-1] / us:8.2f} us")
+    print(f"          expansions {expansions:>8} | {expansions / elapsed:10.0f}/s,"
+          f" {len(keys) / elapsed:10.0f} keys/s")
+    print(f"          replay allocations {allocated_blocks} live blocks, peak {replay_peak / 2**10:.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,10000,1000000', help="comma separated profile sizes")
+    parser.add_argument('--keys', type=int, default=200_000, help="synthetic keystrokes per size")
+    parser.add_argument('--stream', help="text file to replay instead of a synthetic stream")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--metrics', action='store_true', help="run with latency instrumentation enabled")
+    args = parser.parse_args()
+
+    keys_text = None
+    if args.stream:
+        with open(args.stream, 'r') as f:
+            keys_text = f.read().replace('\\b', '\b')
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(s) for s in args.sizes.split(',')):
+            run(size, keys_text, args.keys, rng, workdir, args.metrics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compare the xdotool and XTEST Linux backends under a private Xvfb server.
+
+Usage:
+    python benchmarks/bench_linux_input.py [--runs 50] [--trigger btw] [--expansion "by the way"]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def start_xvfb(display_name):
+    if not shutil.which('Xvfb'):
+        sys.exit("Xvfb is not installed")
+    proc = subprocess.Popen(['Xvfb', display_name, '-screen', '0', '1024x768x24', '-nolisten', 'tcp'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = display_name
+    # Wait until the server accepts connections
+    from Xlib import display
+    for _ in range(50):
+        try:
+            display.Display(display_name).close()
+            return proc
+        except Exception:
+            time.sleep(0.1)
+    proc.terminate()
+    sys.exit("Xvfb did not start")
+
+
+def measure(backend, count, text, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.replace_text(count, text)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:8} mean {statistics.mean(timings):8.2f} ms   p50 {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--trigger', default='btw')
+    parser.add_argument('--expansion', default='by the way')
+    parser.add_argument('--display', default=':99')
+    args = parser.parse_args()
+
+    xvfb = start_xvfb(args.display)
+    try:
+        from platform_specific.linux.text_input import LinuxTextInput
+        from platform_specific.linux.xtest_input import XTestTextInput
+
+        # Delete the trigger plus its delimiter, type the expansion plus the delimiter
+        count = len(args.trigger) + 1
+        text = args.expansion + ' '
+        print(f"Replacing {count} chars with {len(text)} chars, {args.runs} runs")
+        if shutil.which('xdotool'):
+            report('xdotool', measure(LinuxTextInput, count, text, args.runs))
+        else:
+            print("xdotool  not installed, skipped")
+        report('xtest', measure(XTestTextInput, count, text, args.runs))
+    finally:
+        xvfb.terminate()
+        xvfb.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Measure time from launching shrthnder until the first expansion is possible.
+
+Each run starts shrthnder.py in a fresh process with a generated profile and
+waits for the keyboard listener to start, which is the moment triggers begin
+to expand (the profile and matcher are ready before that). Reports startup
+time and resident memory at that point for the engine and the GUI.
+On Linux without a display, a private Xvfb server is started.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--size 10000] [--modes engine,gui]
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_keystrokes import make_profile
+from bench_linux_input import start_xvfb
+
+# Logged by KeyboardController.start() once keys are being listened to
+READY_LINE = "Started keyboard listener"
+
+# The GUI runs its own engine here, a detached one would outlive the measurement
+MODES = {
+    'engine': ['--engine'],
+    'gui': ['--in-process'],
+}
+
+
+def rss_mib(pid):
+    # Only Linux exposes another process's memory without extra packages
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return float('nan')
+
+
+def pump(stream, lines):
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+def launch(mode, workdir, timeout):
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'shrthnder.py')] + MODES[mode],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    # Read the log on a thread so a launch that hangs silently still times out
+    lines = queue.Queue()
+    threading.Thread(target=pump, args=(proc.stderr, lines), daemon=True).start()
+    output = []
+    try:
+        while True:
+            line = lines.get(timeout=max(timeout - (time.perf_counter() - start), 0.001))
+            if line is None:
+                break
+            if READY_LINE in line:
+                return (time.perf_counter() - start) * 1000, rss_mib(proc.pid)
+            output.append(line)
+    except queue.Empty:
+        pass
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    sys.exit(f"{mode} did not become ready:\n{''.join(output[-10:])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--size', type=int, default=10_000, help="shortcuts in the Default profile")
+    parser.add_argument('--modes', default='engine,gui', help="comma separated: " + ', '.join(MODES))
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds to wait for each launch")
+    parser.add_argument('--display', default=':99', help="Xvfb display used when DISPLAY is not set")
+    args = parser.parse_args()
+
+    xvfb = None
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        xvfb = start_xvfb(args.display)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            with open(os.path.join(workdir, 'shrthnder_profiles.json'), 'w') as f:
+                json.dump({'Default': make_profile(args.size, random.Random(1))}, f, indent=4)
+            print(f"{args.size} shortcuts, {args.runs} runs per mode")
+            for mode in args.modes.split(','):
+                timings = []
+                memory = []
+                for _ in range(args.runs):
+                    ms, mib = launch(mode, workdir, args.timeout)
+                    timings.append(ms)
+                    memory.append(mib)
+                print(f"{mode:9} first {timings[0]:8.1f} ms   median {statistics.median(timings):8.1f} ms"
+                      f"   min {min(timings):8.1f} ms   RSS {statistics.median(memory):6.1f} MiB")
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+
+if __name__ == '__main__':
+    main()
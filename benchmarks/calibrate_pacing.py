@@ -0,0 +1,240 @@
+"""Find the fastest reliable key delay for the Linux backends against a text field under Xvfb.
+
+Starts a private Xvfb server and a Qt text field in a child process, then
+types a test text through each backend with shorter and shorter delays
+between keys, reading the field back after every run. A delay is reliable
+when every run left exactly the text that was typed. Reports the characters
+per second each strategy achieves (xdotool and XTEST typing at their fastest
+reliable delay, and pasting), then lets the adaptive pacer learn a delay
+from the same checks. --save stores the delay found for the backend the
+engine uses as the default in shrthnder_pacing.json.
+
+Usage:
+    python benchmarks/calibrate_pacing.py [--runs 5] [--adaptive-runs 60] [--save]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_linux_input import start_xvfb
+from engine.pacing import InjectionPacer, PACING_FILE, DEFAULT_APP
+
+# Delays tried, in seconds, from safe to none at all
+DELAYS = (0.02, 0.01, 0.005, 0.002, 0.001, 0.0005, 0.0)
+
+DEFAULT_TEXT = "The quick brown fox jumps over the lazy dog. 0123456789 (Shrthnder) pacing check: !@#$%&*+=?"
+
+# Seconds the text field gets to show everything that was typed
+SETTLE_TIMEOUT = 2.0
+
+
+def run_text_field():
+    """Child process: a text field answering 'read' and 'clear' lines on stdin."""
+    from PyQt5.QtCore import QSocketNotifier
+    from PyQt5.QtWidgets import QApplication, QPlainTextEdit
+
+    app = QApplication(['shrthnder-calibrate'])
+    editor = QPlainTextEdit()
+    editor.resize(800, 600)
+    editor.show()
+    editor.activateWindow()
+    editor.setFocus()
+
+    def reply(value):
+        sys.stdout.write(json.dumps(value) + '\n')
+        sys.stdout.flush()
+
+    def command():
+        line = sys.stdin.readline().strip()
+        if not line or line == 'quit':
+            app.quit()
+        elif line == 'clear':
+            editor.clear()
+            reply(None)
+        elif line == 'read':
+            reply(editor.toPlainText())
+
+    notifier = QSocketNotifier(sys.stdin.fileno(), QSocketNotifier.Read)
+    notifier.activated.connect(command)
+    reply(int(editor.winId()))
+    app.exec_()
+
+
+class TextField:
+    """The text field in its child process, focused for input."""
+
+    def __init__(self):
+        self.proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--text-field'],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                                     env=dict(os.environ, QT_QPA_PLATFORM='xcb'))
+        window_id = json.loads(self.proc.stdout.readline())
+        self._focus(window_id)
+
+    @staticmethod
+    def _focus(window_id):
+        # There is no window manager to hand out focus
+        from Xlib import X, display
+        conn = display.Display()
+        window = conn.create_resource_object('window', window_id)
+        for _ in range(50):
+            if window.get_attributes().map_state == X.IsViewable:
+                break
+            time.sleep(0.05)
+        window.set_input_focus(X.RevertToParent, X.CurrentTime)
+        conn.sync()
+        conn.close()
+
+    def _call(self, command):
+        self.proc.stdin.write(command + '\n')
+        self.proc.stdin.flush()
+        return json.loads(self.proc.stdout.readline())
+
+    def clear(self):
+        self._call('clear')
+
+    def wait_for(self, expected):
+        """Return True once the field holds expected, False if it settles on anything else."""
+        deadline = time.monotonic() + SETTLE_TIMEOUT
+        while True:
+            text = self._call('read')
+            if text == expected:
+                return True
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.02)
+
+    def close(self):
+        self.proc.stdin.write('quit\n')
+        self.proc.stdin.flush()
+        self.proc.wait(5)
+
+
+def type_once(field, backend, text, paste=False):
+    """Type text into the cleared field, returning (seconds, whether it arrived intact)."""
+    field.clear()
+    start = time.perf_counter()
+    if paste:
+        backend.paste_text(0, text)
+    else:
+        backend.replace_text(0, text)
+    elapsed = time.perf_counter() - start
+    return elapsed, field.wait_for(text)
+
+
+def calibrate(field, backend, text, runs):
+    """Return (delay, characters per second) at the fastest reliable delay, or None."""
+    best = None
+    for delay in DELAYS:
+        backend.key_delay = delay
+        timings = []
+        for _ in range(runs):
+            elapsed, intact = type_once(field, backend, text)
+            if not intact:
+                print(f"          {delay * 1000:5.1f} ms  dropped or garbled keys")
+                return best
+            timings.append(elapsed)
+        rate = len(text) * runs / sum(timings)
+        print(f"          {delay * 1000:5.1f} ms  {rate:8.0f} chars/s")
+        best = (delay, rate)
+    return best
+
+
+def adapt(field, backend, text, runs, default):
+    """Let the pacer learn a delay from verified runs, returning (delay, chars/s over the last runs)."""
+    with tempfile.TemporaryDirectory() as workdir:
+        pacer = InjectionPacer(os.path.join(workdir, 'pacing.json'), verified=True)
+        timings = []
+        for _ in range(runs):
+            backend.key_delay = pacer.delay_for('calibrate', default)
+            elapsed, intact = type_once(field, backend, text)
+            pacer.record('calibrate', default, intact)
+            timings.append(elapsed)
+        last = timings[-10:]
+        return pacer.delay_for('calibrate', default), len(text) * len(last) / sum(last)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="runs per delay, all must arrive intact")
+    parser.add_argument('--adaptive-runs', type=int, default=60, help="verified runs the adaptive pacer gets")
+    parser.add_argument('--text', default=DEFAULT_TEXT)
+    parser.add_argument('--display', default=':99')
+    parser.add_argument('--save', action='store_true',
+                        help=f"store the delay found for the engine's backend as the default in {PACING_FILE}")
+    parser.add_argument('--text-field', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.text_field:
+        run_text_field()
+        return
+
+    xvfb = start_xvfb(args.display)
+    field = None
+    try:
+        from platform_specific.linux.text_input import LinuxTextInput
+        from platform_specific.linux.xtest_input import XTestTextInput
+        from platform_specific.linux import clipboard
+
+        field = TextField()
+        backends = [('xtest', XTestTextInput)]
+        if shutil.which('xdotool'):
+            backends.insert(0, ('xdotool', LinuxTextInput))
+        else:
+            print("xdotool  not installed, skipped")
+
+        print(f"Typing {len(args.text)} characters, {args.runs} runs per delay")
+        results = {}
+        for name, backend in backends:
+            default = backend.key_delay
+            print(f"{name:8} fixed delays")
+            results[name] = calibrate(field, backend, args.text, args.runs)
+            delay, rate = adapt(field, backend, args.text, args.adaptive_runs, default)
+            print(f"{name:8} adaptive pacing settled on {delay * 1000:.1f} ms, {rate:8.0f} chars/s")
+            backend.key_delay = default
+
+        if clipboard.is_available():
+            timings = []
+            intact = True
+            for _ in range(args.runs):
+                elapsed, ok = type_once(field, XTestTextInput, args.text, paste=True)
+                timings.append(elapsed)
+                intact = intact and ok
+            rate = len(args.text) * args.runs / sum(timings)
+            print(f"{'paste':8} {rate:8.0f} chars/s{'' if intact else ', text did not arrive intact'}")
+        else:
+            print("paste    needs xclip or xsel, skipped")
+
+        print()
+        for name, result in results.items():
+            if result is None:
+                print(f"{name:8} dropped keys even at {DELAYS[0] * 1000:.0f} ms")
+            else:
+                print(f"{name:8} fastest reliable delay {result[0] * 1000:.1f} ms, {result[1]:8.0f} chars/s")
+
+        if args.save:
+            # The engine types through XTEST whenever the server supports it
+            result = results.get('xtest')
+            if result is None:
+                print(f"Nothing to save in {PACING_FILE}")
+            else:
+                pacer = InjectionPacer()
+                pacer.load()
+                pacer.set_delay(DEFAULT_APP, result[0])
+                pacer.save()
+                print(f"Saved {result[0] * 1000:.1f} ms as the default delay in {PACING_FILE}")
+    finally:
+        if field is not None:
+            field.close()
+        xvfb.terminate()
+        xvfb.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+from .matcher import TriggerMatcher, Match
+from .injector import InjectionWorker, EchoFilter
+from .events import KeyEncoder, KeyEventRing, KeyEventConsumer
+from .strategy import InjectionStrategy, DEFAULT_PASTE_THRESHOLD
+from .pacing import InjectionPacer
+from .profile_store import ProfileStore, ProfileWatcher, DEFAULT_MAX_LOADED_SHORTCUTS
+from .search_index import ShortcutSearchIndex
+from .metrics import PipelineMetrics, LatencyHistogram
+from .profile_stack import ProfileStack, AppProfileRules
+from .completion import CompletionIndex
+from .templates import Template, compile_template
+from .usage import UsageRecorder
+from .ipc import EngineServer, EngineClient, EngineError
+from .remote import RemoteController
+from .controller import KeyboardController
@@ -0,0 +1,159 @@
+import heapq
+from bisect import bisect_left, insort
+
+# Suggestions offered for a prefix
+DEFAULT_SUGGESTIONS = 5
+
+# Words shorter than this get no suggestions
+MIN_PREFIX = 2
+
+# Only the start of a trigger or expansion is indexed
+MAX_KEY_LENGTH = 32
+
+# Prefixes with more entries than this keep their top suggestions precomputed,
+# smaller ranges are ranked when asked
+SCAN_LIMIT = 64
+
+# Sorts after every character, closes the range of entries starting with a prefix
+_END = '\U0010ffff'
+
+
+class CompletionIndex:
+    """Top k shortcuts whose trigger or expansion starts with a typed prefix.
+
+    Every shortcut is indexed under its lowercased trigger and expansion
+    start, as "key\\0trigger" strings in one sorted list, so the entries for a
+    prefix are a contiguous range found by binary search. Ranges of up to
+    SCAN_LIMIT entries are ranked on the fly. Larger ones keep their top k
+    precomputed and updated as shortcuts and usage counts change, so every
+    lookup does a bounded amount of work.
+
+    Suggestions are ranked by usage count, then alphabetically. scores maps
+    lowercased triggers to counts and may be shared with the caller.
+    """
+
+    def __init__(self, shortcuts=None, scores=None, k=DEFAULT_SUGGESTIONS):
+        self.k = k
+        self.scores = scores if scores is not None else {}
+        self._keys = {}     # Trigger -> the keys it is indexed under
+        self._top = {}      # Prefix -> precomputed top k triggers
+        entries = []
+        for trigger, expansion in (shortcuts or {}).items():
+            keys = self._keys[trigger] = self._index_keys(trigger, expansion)
+            entries.extend(f"{key}\0{trigger}" for key in keys)
+        entries.sort()
+        self._entries = entries
+        self._build('', 0, len(entries))
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _index_keys(trigger, expansion):
+        keys = {trigger[:MAX_KEY_LENGTH].lower(), expansion[:MAX_KEY_LENGTH].lower()}
+        keys.discard('')
+        return tuple(keys)
+
+    def _rank_key(self, trigger):
+        return -self.scores.get(trigger.lower(), 0), trigger
+
+    def _best(self, triggers):
+        return heapq.nsmallest(self.k, set(triggers), key=self._rank_key)
+
+    def _range(self, prefix):
+        entries = self._entries
+        lo = bisect_left(entries, prefix)
+        return lo, bisect_left(entries, prefix + _END, lo)
+
+    def _rank(self, lo, hi):
+        return self._best(entry.split('\0', 1)[1] for entry in self._entries[lo:hi])
+
+    def _build(self, prefix, lo, hi):
+        # Precompute every heavy prefix below this one, bottom up. Returns the range's top k
+        if hi - lo <= SCAN_LIMIT:
+            return self._rank(lo, hi)
+        entries = self._entries
+        depth = len(prefix)
+        candidates = []
+        i = lo
+        while i < hi:
+            char = entries[i][depth]
+            if char == '\0':
+                # Keys equal to the prefix sort first
+                j = bisect_left(entries, prefix + '\x01', i, hi)
+                candidates.extend(self._rank(i, j))
+            else:
+                j = bisect_left(entries, prefix + chr(ord(char) + 1), i, hi)
+                candidates.extend(self._build(prefix + char, i, j))
+            i = j
+        top = self._best(candidates)
+        if depth >= MIN_PREFIX:
+            self._top[prefix] = top
+        return top
+
+    def suggest(self, prefix):
+        """Return up to k triggers for a typed prefix, best first."""
+        if len(prefix) < MIN_PREFIX:
+            return []
+        prefix = prefix.lower()
+        top = self._top.get(prefix)
+        if top is not None:
+            return list(top)
+        return self._rank(*self._range(prefix))
+
+    def add(self, trigger, expansion):
+        if trigger in self._keys:
+            self.remove(trigger)
+        keys = self._keys[trigger] = self._index_keys(trigger, expansion)
+        for key in keys:
+            insort(self._entries, f"{key}\0{trigger}")
+            for depth in range(MIN_PREFIX, len(key) + 1):
+                prefix = key[:depth]
+                top = self._top.get(prefix)
+                if top is not None:
+                    self._top[prefix] = self._best(top + [trigger])
+                    continue
+                lo, hi = self._range(prefix)
+                if hi - lo <= SCAN_LIMIT:
+                    # Longer prefixes only have fewer entries
+                    break
+                self._top[prefix] = self._rank(lo, hi)
+
+    def remove(self, trigger):
+        keys = self._keys.pop(trigger, None)
+        if keys is None:
+            return
+        entries = self._entries
+        for key in keys:
+            entry = f"{key}\0{trigger}"
+            pos = bisect_left(entries, entry)
+            if pos < len(entries) and entries[pos] == entry:
+                del entries[pos]
+            for depth in range(MIN_PREFIX, len(key) + 1):
+                prefix = key[:depth]
+                top = self._top.get(prefix)
+                if top is None:
+                    break
+                lo, hi = self._range(prefix)
+                if hi - lo <= SCAN_LIMIT:
+                    del self._top[prefix]
+                elif trigger in top:
+                    self._top[prefix] = self._rank(lo, hi)
+
+    def rerank(self, trigger):
+        """Move a trigger up after its usage count grew in scores."""
+        lowered = trigger.lower()
+        # Triggers are matched case-insensitively, find the ones indexed for it
+        lo, hi = self._range(lowered[:MAX_KEY_LENGTH] + '\0')
+        originals = [entry.split('\0', 1)[1] for entry in self._entries[lo:hi]]
+        for original in originals:
+            if original.lower() != lowered:
+                continue
+            for key in self._keys[original]:
+                for depth in range(MIN_PREFIX, len(key) + 1):
+                    prefix = key[:depth]
+                    top = self._top.get(prefix)
+                    if top is None:
+                        break
+                    if original in top or len(top) < self.k or self._rank_key(original) < self._rank_key(top[-1]):
+                        self._top[prefix] = self._best(top + [original])
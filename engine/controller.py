@@ -0,0 +1,907 @@
+import logging
+import os
+import platform
+import threading
+import time
+from collections import OrderedDict, deque
+
+from platform_specific import TextInputFactory
+from .matcher import TriggerMatcher, Match
+from .injector import InjectionWorker, EchoFilter
+from .strategy import InjectionStrategy, DEFAULT_PASTE_THRESHOLD
+from .profile_store import ProfileStore, ProfileWatcher, DEFAULT_MAX_LOADED_SHORTCUTS
+from .metrics import PipelineMetrics
+from .edit_plan import match_case, plan_edit
+from .profile_stack import ProfileStack, AppProfileRules, APP_RULES_FILE, MAX_CACHED_STACKS
+from .completion import CompletionIndex
+from .usage import UsageRecorder, USAGE_FILE
+from .events import KeyEncoder, KeyEventRing, KeyEventConsumer, event_token, BACKSPACE, OVERFLOW, ACCEPT, PASTE_TOKEN
+from .templates import compile_template, compile_templates
+from .pacing import InjectionPacer, PACING_FILE
+
+PROFILES_FILE = 'shrthnder_profiles.json'
+
+# Window classes remembered for setting up application rules
+RECENT_WINDOW_CLASSES = 20
+
+# Profiles written on first start
+DEFAULT_PROFILES = {
+    "Default": {
+        "btw": "by the way",
+        "idk": "I don't know",
+        "omw": "on my way"
+    },
+    "Developer": {
+        "cls": "class",
+        "fn": "function",
+        "ret": "return",
+        "imp": "import",
+        "pr": "print"
+    },
+    "Medical": {
+        "pt": "patient",
+        "rx": "prescription",
+        "dx": "diagnosis",
+        "tx": "treatment",
+        "hx": "history"
+    },
+    "Legal": {
+        "def": "defendant",
+        "plt": "plaintiff",
+        "jdg": "judgment",
+        "crt": "court",
+        "att": "attorney"
+    },
+    "Student": {
+        "asap": "as soon as possible",
+        "tba": "to be announced",
+        "tbd": "to be determined",
+        "eg": "for example",
+        "ie": "that is"
+    }
+}
+
+# Keys are told apart by name, so anything shaped like a pynput key works
+# (pynput.keyboard.Key members have a name, KeyCode objects have a char)
+
+# Special keys that type a character
+SPECIAL_KEY_CHARS = {
+    'space': ' ',
+    'enter': '\n',
+    'tab': '\t',
+}
+
+# Keys that never change the typed text
+MODIFIER_KEYS = {
+    'shift', 'shift_l', 'shift_r',
+    'ctrl', 'ctrl_l', 'ctrl_r',
+    'alt', 'alt_l', 'alt_r', 'alt_gr',
+    'cmd', 'cmd_l', 'cmd_r',
+    'caps_lock',
+}
+
+TAB = ord('\t')
+
+# Systems whose keyboard hook can keep the Tab that takes a suggestion from the
+# application. On X11 pynput only watches keys, so the Tab would reach the
+# application first and Tab doesn't take suggestions there
+TAB_ACCEPTS_SYSTEMS = ('Windows', 'Darwin')
+
+# Low-level keyboard hook values the Windows event filter looks at
+WM_KEYDOWN = 0x0100
+VK_TAB = 0x09
+
+class _ClipboardNeeded(Exception):
+    """Raised while rendering on the key thread by a template that reads the clipboard."""
+
+def _defer_clipboard():
+    raise _ClipboardNeeded
+
+class KeyboardController:
+    def __init__(self, paste_threshold=DEFAULT_PASTE_THRESHOLD, max_loaded_shortcuts=DEFAULT_MAX_LOADED_SHORTCUTS,
+                 profiles_file=PROFILES_FILE, text_input=None, metrics=False,
+                 app_rules_file=APP_RULES_FILE, suggestions=False, usage_file=USAGE_FILE, pacing_file=PACING_FILE):
+        self.logger = self.setup_logger()
+        self.max_loaded_shortcuts = max_loaded_shortcuts
+        self.profiles_file = profiles_file
+        # Serializes the profile store between the GUI and background threads
+        self._profile_lock = threading.RLock()
+        self.profile_watcher = None
+        # Called with the changes after the profiles file was edited by another program
+        self.profile_listeners = []
+        self.text_input = text_input or TextInputFactory.get_text_input()
+        self.input_language = "English"  # Default input language
+        self.current_profile = "Default"
+        # Only profile names are read here, shortcuts load when a profile is selected
+        self.profiles = self.load_default_shortcuts()
+        self.profiles.pin(self.current_profile)
+        self.shortcuts = self.profiles[self.current_profile]
+        self.shorthand_map = self.shortcuts
+        # Profiles in use, merged into one table. Edits go to current_profile, the last one
+        self.profile_stack = ProfileStack((self.current_profile,), self.profiles)
+        self.matcher = TriggerMatcher(self.profile_stack.shortcuts)
+        # Expansions with placeholders, compiled per lowercased trigger
+        self._templates = compile_templates(self.profile_stack.shortcuts)
+        # Recently used stacks with their matchers and templates, most recent last
+        self._stacks = OrderedDict({self.profile_stack.names: (self.profile_stack, self.matcher, self._templates)})
+        # Stack picked in the GUI, used while no application rule applies
+        self.manual_stack = self.profile_stack.names
+        # Called with the profile names whenever the active stack changes
+        self.stack_listeners = []
+        # Automatic stacks for focused applications
+        self.app_rules = self.load_app_rules(app_rules_file)
+        self.active_window_class = None
+        self.recent_window_classes = OrderedDict()
+        self.window_monitor = None
+        # Expansions and keystrokes saved per trigger, written out in the background
+        self.usage = self.load_usage(usage_file)
+        self.usage.listeners.append(self._on_usage)
+        # Uses per lowercased trigger, ranks the completion suggestions
+        self.usage_counts = self.usage.uses()
+        # Completion index per cached stack, and the active one. None while suggestions are off
+        self._completions = {}
+        self.completion = None
+        # (trigger, expansion) pairs offered for the word being typed, Tab takes the first
+        # where the keyboard hook can swallow it
+        self.suggestions = []
+        self._system = platform.system()
+        self.tab_accepts = self._system in TAB_ACCEPTS_SYSTEMS
+        # Set by on_press on macOS for _darwin_intercept to drop the Tab it just saw
+        self._swallow_key = False
+        # Called with the suggestions whenever they change
+        self.suggestion_listeners = []
+        self.keyboard_listener = None
+        # Backends that tag their own events don't need echo matching
+        self.echo_filter = None if hasattr(self.text_input, 'EVENT_TAG') else EchoFilter()
+        # Long expansions are pasted through the clipboard instead of typed
+        can_paste = hasattr(self.text_input, 'paste_text') and self.text_input.can_paste()
+        self.injection_strategy = InjectionStrategy(paste_threshold, can_paste)
+        # Delay between injected keys per application, for backends that pause between keys
+        self.pacer = self.load_pacing(pacing_file)
+        self._default_key_delay = getattr(self.text_input, 'key_delay', None)
+        # (app, default delay, echo mark, finished) of injections whose keys may still be coming back
+        self._unconfirmed = deque()
+        # on_press only encodes keys into this buffer, the consumer thread handles them in batches
+        self._key_encoder = KeyEncoder(SPECIAL_KEY_CHARS, MODIFIER_KEYS)
+        self.key_events = KeyEventRing()
+        self.key_consumer = KeyEventConsumer(self.key_events, self._handle_key_events)
+        # (code, received) of keys typed while an injection runs, replayed in order once it finishes
+        self._pending_keys = deque()
+        self._held_events = []
+        self._key_lock = threading.Lock()
+        self.injector = InjectionWorker(on_idle=self._on_injection_idle)
+        self.injector.start()
+        self.key_consumer.start()
+        # Latency histograms, None while measuring is off
+        self.metrics = PipelineMetrics() if metrics else None
+        if suggestions:
+            self.set_suggestions_enabled(True)
+
+    def set_metrics_enabled(self, enabled):
+        if enabled and self.metrics is None:
+            self.metrics = PipelineMetrics()
+        elif not enabled:
+            self.metrics = None
+
+    @property
+    def suggestions_enabled(self):
+        return self.completion is not None
+
+    def set_suggestions_enabled(self, enabled):
+        with self._profile_lock:
+            completion = None
+            if enabled:
+                completion = self._completion_for(self.profile_stack)
+            else:
+                self._completions.clear()
+            with self._key_lock:
+                self.completion = completion
+                self._set_suggestions([])
+
+    def _completion_for(self, stack):
+        completion = self._completions.get(stack.names)
+        if completion is None:
+            completion = CompletionIndex(stack.shortcuts, self.usage_counts)
+            self._completions[stack.names] = completion
+        return completion
+
+    def setup_logger(self):
+        logger = logging.getLogger('shrthnder')
+        logger.setLevel(logging.INFO)
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(message)s')
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+        return logger
+
+    def load_default_shortcuts(self):
+        # Load from file, falling back to the default profiles if it doesn't exist
+        try:
+            return ProfileStore(self.profiles_file, defaults=DEFAULT_PROFILES, max_loaded_shortcuts=self.max_loaded_shortcuts)
+        except Exception as e:
+            self.logger.error(f"Error loading profiles from file: {e}")
+        # Keep the unreadable file for inspection and start over from the defaults.
+        # The journal and index belong to it, replayed over new defaults they would corrupt those too
+        for path in (self.profiles_file, self.profiles_file + '.journal', self.profiles_file + '.index'):
+            try:
+                if os.path.exists(path):
+                    os.replace(path, path + '.corrupt')
+            except OSError as e:
+                self.logger.error(f"Error moving {path} aside: {e}")
+        try:
+            return ProfileStore(self.profiles_file, defaults=DEFAULT_PROFILES, max_loaded_shortcuts=self.max_loaded_shortcuts)
+        except Exception as e:
+            self.logger.error(f"Error creating profiles file: {e}")
+        self.logger.warning("Using the default profiles without saving, edits will be lost on exit")
+        return ProfileStore(None, defaults=DEFAULT_PROFILES)
+
+    def load_app_rules(self, path):
+        rules = AppProfileRules(path)
+        try:
+            rules.load()
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error loading application rules: {e}")
+        return rules
+
+    def load_pacing(self, path):
+        pacer = InjectionPacer(path)
+        try:
+            pacer.load()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.error(f"Error loading injection pacing: {e}")
+        return pacer
+
+    def load_usage(self, path):
+        usage = UsageRecorder(path)
+        try:
+            usage.load()
+        except (OSError, ValueError, AttributeError) as e:
+            self.logger.error(f"Error loading usage statistics: {e}")
+        return usage
+
+    def start(self):
+        from pynput import keyboard
+
+        if self.keyboard_listener:
+            self.keyboard_listener.stop()
+        self.keyboard_listener = keyboard.Listener(
+            on_press=self.on_press,
+            win32_event_filter=self._win32_event_filter,
+            darwin_intercept=self._darwin_intercept,
+        )
+        self.keyboard_listener.start()
+        if self.profile_watcher is None:
+            self.profile_watcher = ProfileWatcher(self.profiles, self.reload_profiles)
+            self.profile_watcher.start()
+        if self.usage.ident is None:
+            self.usage.start()
+        if self.window_monitor is None:
+            # Focus changes arrive as events, on_press never asks for the active window
+            try:
+                self.window_monitor = TextInputFactory.get_active_window_monitor(self.on_active_window_changed)
+                if self.window_monitor:
+                    self.window_monitor.start()
+            except Exception as e:
+                self.logger.error(f"Error watching the active window: {e}")
+                self.window_monitor = None
+        self.logger.info("Started keyboard listener")
+
+    def stop(self):
+        if self.keyboard_listener:
+            self.keyboard_listener.stop()
+            self.keyboard_listener = None
+        if self.profile_watcher:
+            self.profile_watcher.stop()
+            self.profile_watcher = None
+        if self.window_monitor:
+            self.window_monitor.stop()
+            self.window_monitor = None
+        self.usage.stop()
+
+    @property
+    def current_word(self):
+        return self.matcher.current_word
+
+    def _win32_event_filter(self, msg, data):
+        # Our own injected events reach the application but not on_press
+        if data.dwExtraInfo == self.text_input.EVENT_TAG:
+            return False
+        # Hold the user's keys back while we inject, they are re-posted afterwards
+        if self.injector.busy:
+            self._held_events.append((data.vkCode, data.scanCode, data.flags))
+            self.keyboard_listener.suppress_event()
+        # A Tab taking a suggestion never reaches the application, nor on_press
+        if data.vkCode == VK_TAB and msg == WM_KEYDOWN and self._tab_takes_suggestion():
+            self._push_key(ACCEPT)
+            self.keyboard_listener.suppress_event()
+        return True
+
+    def _darwin_intercept(self, event_type, event):
+        # Called after on_press saw the event, None keeps it from the application
+        if self._swallow_key:
+            self._swallow_key = False
+            return None
+        return event
+
+    def _tab_takes_suggestion(self):
+        # Our own Tabs are typed while the injector is busy, those pass
+        return self.tab_accepts and self.suggestions and not self.injector.busy
+
+    def on_press(self, key):
+        # The listener thread only queues the key, so a burst never stalls the OS hook
+        code = self._key_encoder.encode(key)
+        if code is None:
+            return
+        # Windows decided about the Tab in _win32_event_filter, macOS drops it in _darwin_intercept
+        if code == TAB and self._system == 'Darwin' and self._tab_takes_suggestion():
+            code = ACCEPT
+            self._swallow_key = True
+        self._push_key(code)
+
+    def _push_key(self, code):
+        metrics = self.metrics
+        self.key_events.push(code, metrics.clock() if metrics is not None else 0)
+
+    def _handle_key_events(self, start, count):
+        # Called from the consumer thread with a run of slots in the event buffer
+        codes = self.key_events.codes
+        stamps = self.key_events.stamps
+        echo_filter = self.echo_filter
+        with self._key_lock:
+            for slot in range(start, start + count):
+                code = codes[slot]
+                # Drop the keystrokes we injected ourselves
+                if echo_filter and echo_filter.consume(event_token(code)):
+                    continue
+                received = stamps[slot] or None
+                if self.injector.busy or self._pending_keys:
+                    self._pending_keys.append((code, received))
+                    continue
+                self._handle_key(code, received)
+
+    def _on_injection_idle(self):
+        # Give back the keys that were suppressed at the OS level
+        if self._held_events:
+            held, self._held_events = self._held_events, []
+            self.text_input.replay_events(held)
+        with self._key_lock:
+            while self._pending_keys and not self.injector.busy:
+                self._handle_key(*self._pending_keys.popleft())
+
+    def _handle_key(self, code, received=None):
+        if code >= 0:
+            # Feed typed characters and delimiters to the matcher one at a time
+            match = self.matcher.feed(chr(code))
+            if received is not None and self.metrics is not None:
+                self.metrics.record('keystroke', received, self.metrics.clock())
+            if match:
+                self.check_and_expand(match, received)
+        elif code == BACKSPACE:
+            self.matcher.backspace()
+        elif code == ACCEPT:
+            self._accept_suggestion(received)
+        else:
+            # Arrows, shortcuts and other keys move the cursor away from the typed word,
+            # and after an overflow it is no longer known what was typed
+            if code == OVERFLOW:
+                self.logger.warning(f"Typing outpaced the expansion engine, {self.key_events.dropped} keys dropped so far")
+            self.matcher.reset()
+        self._update_suggestions()
+
+    def _accept_suggestion(self, received):
+        if not self.suggestions:
+            # The suggestions went away before the swallowed Tab got here, type it after all
+            mark = self.echo_filter.expect(0, '\t') if self.echo_filter else None
+            self.injector.submit(self._inject, InjectionStrategy.TYPE, 0, '\t', 0, mark)
+            self._handle_key(TAB, received)
+            return
+        # The Tab never reached the application, only the word is replaced
+        trigger, expansion = self.suggestions[0]
+        match = Match(trigger.lower(), expansion, self.matcher.current_word, '', trigger)
+        self.matcher.reset()
+        self.check_and_expand(match, received)
+
+    def _update_suggestions(self):
+        completion = self.completion
+        if completion is None:
+            return
+        shortcuts = self.profile_stack.shortcuts
+        self._set_suggestions([(trigger, shortcuts[trigger]) for trigger in completion.suggest(self.matcher.current_word)
+                               if trigger in shortcuts])
+
+    def _set_suggestions(self, suggestions):
+        if suggestions == self.suggestions:
+            return
+        self.suggestions = suggestions
+        for listener in self.suggestion_listeners:
+            listener(suggestions)
+
+    def check_and_expand(self, match, received=None):
+        try:
+            metrics = self.metrics if received is not None else None
+            if metrics is not None:
+                render_start = metrics.clock()
+            # Templates were compiled when the profile was selected, only
+            # dynamic values are filled in
+            template = self._templates.get(match.trigger)
+            if template is None:
+                expansion, back = match.expansion, 0
+            else:
+                try:
+                    expansion, back = template.render(self._resolve_template, _defer_clipboard)
+                except _ClipboardNeeded:
+                    # Reading the clipboard can start a process, and an earlier paste may
+                    # not have put the user's text back yet. The injector renders the
+                    # template once the jobs before it are done
+                    queued = metrics.clock() if metrics is not None else None
+                    self.injector.submit(self._inject_with_clipboard, match, template, received, queued)
+                    return
+            if metrics is not None:
+                metrics.record('render', render_start, metrics.clock())
+
+            edit = self._plan_edit(match, expansion, back)
+            if edit is None:
+                return
+            queued = metrics.clock() if metrics is not None else None
+            self.injector.submit(self._inject, *edit, received, queued)
+
+        except Exception as e:
+            self.logger.error(f"Error in check_and_expand: {e}")
+            return
+
+    def _plan_edit(self, match, expansion, back):
+        # The typed trigger and the delimiter that fired it become the
+        # expansion, in the case the trigger was typed in, followed by the
+        # same delimiter. Only the part after what they have in common is
+        # deleted and retyped
+        target = match_case(match.typed, expansion, match.defined)
+        count, start = plan_edit(match.typed + match.delimiter, target + match.delimiter)
+        text = (target + match.delimiter)[start:]
+        if back:
+            # One arrow press per character between the end and {cursor}
+            back += len(match.delimiter)
+        # Counted in the background, this only appends to a buffer
+        self.usage.record(match.trigger, len(target) - len(match.typed))
+        if not count and not text and not back:
+            return None
+        strategy = self.injection_strategy.choose(len(text))
+        mark = None
+        if self.echo_filter:
+            # Pasted text never comes back, only the key that pasted it
+            mark = self.echo_filter.expect(count, text if strategy == InjectionStrategy.TYPE else PASTE_TOKEN, back)
+        return strategy, count, text, back, mark
+
+    def _inject_with_clipboard(self, match, template, received=None, queued=None):
+        # On the injector thread, so earlier pastes have restored the clipboard.
+        # Keys typed meanwhile wait in _pending_keys until this is done
+        clipboard = self._read_clipboard()
+        with self._key_lock:
+            expansion, back = template.render(self._resolve_template, lambda: clipboard)
+            edit = self._plan_edit(match, expansion, back)
+        if edit is not None:
+            self._inject(*edit, received, queued)
+
+    def _resolve_template(self, trigger):
+        # Shortcuts referenced from a template, in the active stack
+        return self._templates.get(trigger) or self.matcher.get(trigger)
+
+    def _read_clipboard(self):
+        get_clipboard = getattr(self.text_input, 'get_clipboard', None)
+        if get_clipboard is None:
+            return None
+        try:
+            return get_clipboard()
+        except Exception as e:
+            self.logger.error(f"Error reading the clipboard: {e}")
+            return None
+
+    def _inject(self, strategy, count, text, back=0, mark=None, received=None, queued=None):
+        app = self.active_window_class
+        default_delay = self._default_key_delay
+        if self._unconfirmed:
+            self._settle_echoes()
+        if default_delay is not None:
+            self.text_input.key_delay = self.pacer.delay_for(app, default_delay)
+        start = time.perf_counter_ns()
+        if strategy == InjectionStrategy.PASTE:
+            self.text_input.paste_text(count, text)
+        else:
+            self.text_input.replace_text(count, text)
+        if back:
+            self.text_input.move_left(back)
+        done = time.perf_counter_ns()
+        self.injection_strategy.record(strategy, count + len(text) + back, (done - start) / 1e9)
+        if default_delay is not None and mark is not None:
+            # Checked before the next injection, nothing waits for the echo
+            self._unconfirmed.append((app, default_delay, mark, time.monotonic()))
+
+        metrics = self.metrics
+        if metrics is not None and received is not None:
+            metrics.record('queue', queued, start)
+            metrics.record('inject', start, done)
+            metrics.record('total', received, done)
+
+    def reset_usage(self):
+        """Forget the usage statistics, the suggestions go back to alphabetical order."""
+        with self._profile_lock:
+            try:
+                self.usage.reset()
+            except OSError as e:
+                self.logger.error(f"Error saving usage statistics: {e}")
+            with self._key_lock:
+                # The completion indexes rank by these counts, rebuild them without
+                self.usage_counts.clear()
+                self._completions.clear()
+                if self.completion is not None:
+                    self.completion = self._completion_for(self.profile_stack)
+                self._update_suggestions()
+
+    def _settle_echoes(self):
+        # Our keys coming back through the listener shows none were dropped
+        # on the way to the display server. Injections still waiting for
+        # theirs are left for the next time
+        echo_filter = self.echo_filter
+        now = time.monotonic()
+        while self._unconfirmed:
+            app, default_delay, mark, finished = self._unconfirmed[0]
+            intact = echo_filter.echoed(mark)
+            if intact is None:
+                if now - finished < echo_filter.timeout:
+                    break
+                intact = False
+            self._unconfirmed.popleft()
+            self.pacer.record(app, default_delay, intact)
+
+    def _on_usage(self, batch):
+        # Called from the usage thread with the uses since its last flush
+        with self._profile_lock, self._key_lock:
+            for trigger, count in batch.items():
+                self.usage_counts[trigger] = self.usage_counts.get(trigger, 0) + count
+                for completion in self._completions.values():
+                    completion.rerank(trigger)
+
+    def save_profiles(self):
+        """Fold all journaled edits into the profiles file."""
+        with self._profile_lock:
+            try:
+                self.logger.info("Saving profiles")
+                # Don't write over edits another program made since we last read the file
+                self.reload_profiles()
+                # Update the current profile's shortcuts
+                self.shortcuts = self.profiles[self.current_profile]
+                self.shorthand_map = self.shortcuts
+                self.profiles.compact()
+            except Exception as e:
+                self.logger.error(f"Error saving profiles: {e}")
+
+    def create_profile(self, profile_name):
+        with self._profile_lock:
+            profile_name = profile_name.strip()  # Remove whitespace
+            if profile_name.lower() not in [p.lower() for p in self.profiles.keys()]:
+                try:
+                    self.profiles.create_profile(profile_name)
+                except Exception as e:
+                    self.logger.error(f"Error saving profiles: {e}")
+                    return
+                self._select_profile(profile_name)
+                self.logger.info(f"Created new profile: {profile_name}")
+
+    def switch_profile(self, profile_name):
+        profile_name = profile_name.strip()  # Remove whitespace
+        # Case-insensitive profile lookup
+        profile_dict = {k.lower(): k for k in self.profiles.keys()}
+        if profile_name.lower() in profile_dict:
+            actual_name = profile_dict[profile_name.lower()]
+            if not self.set_profile(actual_name):
+                return False
+            self.logger.info(f"Switched to profile: {actual_name}")
+            return True
+        self.logger.error(f"Profile not found: {profile_name}")
+        self.set_profile("Default")
+        return False
+
+    def set_profile(self, profile_name):
+        """Switch to a profile, False if it doesn't exist or can't be read."""
+        if profile_name in self.profiles and self._select_profile(profile_name):
+            self.logger.info(f"Switched to profile: {profile_name}")
+            return True
+        return False
+
+    def set_profile_stack(self, profile_names):
+        """Use several profiles at once, later ones taking precedence."""
+        with self._profile_lock:
+            profile_names = tuple(profile_names)
+            try:
+                self._select_stack(profile_names)
+            except ValueError as e:
+                self.logger.error(f"Error switching profiles: {e}")
+                return False
+            self.manual_stack = profile_names
+            self.logger.info(f"Switched to profiles: {' + '.join(self.profile_stack.names)}")
+            return True
+
+    def _select_profile(self, profile_name):
+        # The current stack stays when the profile can't be read
+        with self._profile_lock:
+            try:
+                self._select_stack((profile_name,))
+            except ValueError as e:
+                self.logger.error(f"Error switching profiles: {e}")
+                return False
+            self.manual_stack = (profile_name,)
+            return True
+
+    def _select_stack(self, profile_names):
+        # Raises ValueError, before changing anything, when a profile can't be read
+        with self._profile_lock:
+            names = tuple(name for name in profile_names if name in self.profiles)
+            if not names:
+                names = ("Default",) if "Default" in self.profiles else (next(iter(self.profiles)),)
+            cached = self._stacks.pop(names, None)
+            if cached is None:
+                stack = ProfileStack(names, self.profiles)
+                # Members stay in memory while a stack is cached, others may be evicted
+                for name in names:
+                    self.profiles.pin(name)
+                cached = (stack, TriggerMatcher(stack.shortcuts), compile_templates(stack.shortcuts))
+            self._stacks[names] = cached
+            while len(self._stacks) > MAX_CACHED_STACKS:
+                self._drop_stack(next(iter(self._stacks)))
+            stack, matcher, templates = cached
+            completion = self._completion_for(stack) if self.completion is not None else None
+            shortcuts = self.profiles[stack.top]
+            # A stack rebuilt in place is shown by whoever changed its profiles
+            switched = names != self.profile_stack.names
+            with self._key_lock:
+                matcher.reset()
+                self.matcher = matcher
+                self._templates = templates
+                self.completion = completion
+                self._set_suggestions([])
+                self.profile_stack = stack
+                self.current_profile = stack.top
+                self.shortcuts = shortcuts
+                self.shorthand_map = shortcuts
+        if switched:
+            for listener in self.stack_listeners:
+                listener(names)
+
+    def _drop_stack(self, names):
+        self._stacks.pop(names, None)
+        self._completions.pop(names, None)
+        in_use = {name for cached in self._stacks for name in cached}
+        for name in names:
+            if name not in in_use:
+                self.profiles.unpin(name)
+
+    def _drop_stacks_with(self, profile_name):
+        # Cached stacks other than the active one are rebuilt when next used
+        for names in [names for names in self._stacks if profile_name in names]:
+            if names != self.profile_stack.names:
+                self._drop_stack(names)
+
+    def _apply_trigger_changes(self, triggers):
+        # Resolve the triggers through the active stack and apply the winners
+        names = self.profile_stack.names
+        updates = self.profile_stack.refresh(self.profiles, triggers)
+        shortcuts = self.profiles[self.current_profile]
+        completion = self._completions.get(names)
+        with self._key_lock:
+            for trigger, expansion in updates.items():
+                if expansion is None:
+                    self.matcher.remove(trigger)
+                    self._templates.pop(trigger.lower(), None)
+                    if completion is not None:
+                        completion.remove(trigger)
+                else:
+                    self.matcher.add(trigger, expansion)
+                    # Compiled when saved, so expanding only fills in the values
+                    template = compile_template(expansion)
+                    if template is not None:
+                        self._templates[trigger.lower()] = template
+                    else:
+                        self._templates.pop(trigger.lower(), None)
+                    if completion is not None:
+                        completion.add(trigger, expansion)
+            self.shortcuts = shortcuts
+            self.shorthand_map = shortcuts
+
+    def _apply_bulk_changes(self, triggers):
+        names = self.profile_stack.names
+        if len(triggers) > len(self.profile_stack.shortcuts) // 4:
+            # Cheaper to rebuild outside the key lock and swap the results in
+            self._drop_stack(names)
+            self._select_stack(names)
+        else:
+            self._apply_trigger_changes(triggers)
+
+    def on_active_window_changed(self, window_class):
+        """Switch to the stack of the first application rule matching the focused window."""
+        with self._profile_lock:
+            self.active_window_class = window_class
+            if window_class:
+                # Offered when adding a rule, the settings window itself has focus by then
+                self.recent_window_classes.pop(window_class, None)
+                self.recent_window_classes[window_class] = None
+                while len(self.recent_window_classes) > RECENT_WINDOW_CLASSES:
+                    self.recent_window_classes.popitem(last=False)
+            stack = self.app_rules.stack_for(window_class) if window_class else None
+            target = stack or self.manual_stack
+            if target != self.profile_stack.names:
+                try:
+                    self._select_stack(target)
+                except ValueError as e:
+                    self.logger.error(f"Error switching profiles for {window_class}: {e}")
+                    return
+                self.logger.info(f"{window_class} has focus, using profiles: {' + '.join(self.profile_stack.names)}")
+
+    def set_app_rule(self, window_class, profile_names):
+        with self._profile_lock:
+            try:
+                self.app_rules.set_rule(window_class, profile_names)
+            except OSError as e:
+                self.logger.error(f"Error saving application rules: {e}")
+                return False
+        self.on_active_window_changed(self.active_window_class)
+        return True
+
+    def remove_app_rule(self, window_class):
+        with self._profile_lock:
+            try:
+                self.app_rules.remove_rule(window_class)
+            except OSError as e:
+                self.logger.error(f"Error saving application rules: {e}")
+                return False
+        self.on_active_window_changed(self.active_window_class)
+        return True
+
+    def get_profiles(self):
+        with self._profile_lock:
+            return list(self.profiles.keys())
+
+    # Readers for the settings window. The profile watcher and the focus monitor
+    # change the store and the stack from their own threads
+
+    def get_profile(self, profile_name=None):
+        """A profile's shortcuts, the current profile's by default.
+
+        Edits through the controller show up in the returned dict, a reload
+        replaces it.
+        """
+        with self._profile_lock:
+            return self.profiles[profile_name or self.current_profile]
+
+    def get_profile_shortcuts(self, profile_name=None):
+        """A copy of a profile's shortcuts, the current profile's by default."""
+        with self._profile_lock:
+            return dict(self.profiles[profile_name or self.current_profile])
+
+    def get_active_stack(self):
+        """The active stack's profile names and the profile edits go to, read together."""
+        with self._profile_lock:
+            return self.profile_stack.names, self.current_profile
+
+    def get_stack_shortcuts(self):
+        """A copy of the active stack's merged shortcuts."""
+        with self._profile_lock:
+            return dict(self.profile_stack.shortcuts)
+
+    def get_app_rule(self, window_class):
+        with self._profile_lock:
+            return self.app_rules.stack_for(window_class)
+
+    def delete_profile(self, profile_name):
+        with self._profile_lock:
+            if profile_name in self.profiles:
+                try:
+                    self.profiles.delete_profile(profile_name)
+                except Exception as e:
+                    self.logger.error(f"Error saving profiles: {e}")
+                    return
+                active = profile_name in self.profile_stack.names
+                for names in [names for names in self._stacks if profile_name in names]:
+                    self._drop_stack(names)
+                if active:
+                    self._select_profile("Default")
+                self.logger.info(f"Deleted profile: {profile_name}")
+
+    def reload_profiles(self):
+        """Apply edits made to the profiles file by another program.
+
+        Only the shortcuts that were added, changed or removed are applied to
+        the matcher, while holding the key lock so key events see the profiles
+        either before or after the reload. Returns the changes, or None.
+        """
+        with self._profile_lock:
+            try:
+                changes = self.profiles.reload()
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Error reloading profiles: {e}")
+                return None
+            if changes is None:
+                return None
+            # Loaded profiles are fresh dicts now, other cached stacks are rebuilt when next used
+            for names in list(self._stacks):
+                if names != self.profile_stack.names:
+                    self._drop_stack(names)
+
+            names = self.profile_stack.names
+            if any(name not in self.profiles for name in names):
+                # One of our profiles was removed from the file
+                self._drop_stack(names)
+                self._select_stack(names)
+            else:
+                triggers = set()
+                for name in names:
+                    if changes.get(name):
+                        changed, removed = changes[name]
+                        triggers.update(changed)
+                        triggers.update(removed)
+                self._apply_bulk_changes(triggers)
+                if triggers:
+                    self.logger.info(f"Reloaded {' + '.join(names)}: {len(triggers)} shortcuts changed")
+
+        for listener in self.profile_listeners:
+            listener(changes)
+        return changes
+
+    def set_input_language(self, language):
+        self.input_language = language
+        self.logger.info(f"Set input language to: {language}")
+
+    def add_shortcut(self, shorthand, expansion):
+        with self._profile_lock:
+            # Add to current profile and make it available to the matcher right away
+            try:
+                self.profiles.set_shortcut(self.current_profile, shorthand, expansion)
+            except Exception as e:
+                self.logger.error(f"Error saving profiles: {e}")
+                return False
+            self._drop_stacks_with(self.current_profile)
+            self._apply_trigger_changes([shorthand])
+            return True
+
+    def plan_import(self, path, fmt=None):
+        """Read a shortcut pack and compare it with the current profile, without changing anything."""
+        # The pack readers pull in xml and urllib, which the engine doesn't need to start
+        from .packs import ImportPlan, read_pack
+
+        with self._profile_lock:
+            return ImportPlan(read_pack(path, fmt), self.profiles[self.current_profile])
+
+    def apply_import(self, plan, overwrite=False):
+        """Add a planned import to the current profile in one journal write.
+
+        Returns the shortcuts that were added or replaced.
+        """
+        shortcuts = plan.shortcuts(overwrite)
+        if not shortcuts:
+            return {}
+        with self._profile_lock:
+            try:
+                self.profiles.set_shortcuts(self.current_profile, shortcuts)
+            except Exception as e:
+                self.logger.error(f"Error saving profiles: {e}")
+                return {}
+            self._drop_stacks_with(self.current_profile)
+            self._apply_bulk_changes(shortcuts)
+            self.logger.info(f"Imported {len(shortcuts)} shortcuts into {self.current_profile}")
+            return shortcuts
+
+    def export_shortcuts(self, path, fmt=None):
+        from .packs import write_pack
+
+        with self._profile_lock:
+            write_pack(path, self.profiles[self.current_profile].items(), fmt)
+
+    def delete_shortcut(self, shorthand):
+        with self._profile_lock:
+            try:
+                self.profiles.delete_shortcut(self.current_profile, shorthand)
+            except Exception as e:
+                self.logger.error(f"Error saving profiles: {e}")
+                return False
+            # A profile lower in the stack may define the same shorthand
+            self._drop_stacks_with(self.current_profile)
+            self._apply_trigger_changes([shorthand])
+            return True
@@ -0,0 +1,31 @@
+def match_case(typed, text, trigger=None):
+    """Carry the case the trigger was typed in over to its expansion.
+
+    "BTW" gives "BY THE WAY" and "Btw" gives "By the way". Anything else,
+    or a trigger typed in the case it is defined in ("BP" for blood
+    pressure), leaves the expansion as it was written.
+    """
+    if typed == trigger:
+        return text
+    letters = [char for char in typed if char.isalpha()]
+    if not letters or not letters[0].isupper():
+        return text
+    if len(letters) > 1 and all(char.isupper() for char in letters):
+        return text.upper()
+    for i, char in enumerate(text):
+        if char.isalpha():
+            return text[:i] + char.upper() + text[i + 1:] if char.islower() else text
+    return text
+
+
+def plan_edit(current, target):
+    """Shortest backspace+type edit turning the text before the cursor into target.
+
+    Returns (backspaces, start): delete that many characters, then type
+    target[start:]. Whatever the two texts start with is left in place.
+    """
+    limit = min(len(current), len(target))
+    start = 0
+    while start < limit and current[start] == target[start]:
+        start += 1
+    return len(current) - start, start
@@ -0,0 +1,152 @@
+import logging
+import threading
+from array import array
+
+# Event codes. A typed character is its code point, the other keys are negative
+BACKSPACE = -1
+RESET = -2      # A key that moves the cursor away from the typed word
+OVERFLOW = -3   # Keys were dropped because the buffer was full
+LEFT = -4       # The left arrow, a RESET unless we pressed it to place the cursor
+ACCEPT = -5     # A Tab the keyboard hook kept from the application to take a suggestion
+
+# What the echo filter expects for our own backspaces and left arrows.
+# Control characters never come from typing, those are RESETs
+BACKSPACE_TOKEN = '\b'
+LEFT_TOKEN = '\x1b'
+# A paste's Ctrl+V (Cmd+V on macOS) comes back as a plain 'v', the modifier has no code
+PASTE_TOKEN = 'v'
+
+# Key events buffered between the keyboard listener and the consumer thread,
+# several minutes of fast typing, so only a stalled consumer fills it
+DEFAULT_CAPACITY = 8192
+
+# Events handled per hold of the key lock, so GUI edits never wait long
+DEFAULT_BATCH_SIZE = 256
+
+
+def event_token(code):
+    """The character an event types, a token for backspace and left, '' for other keys."""
+    if code >= 0:
+        return chr(code)
+    if code == BACKSPACE:
+        return BACKSPACE_TOKEN
+    return LEFT_TOKEN if code == LEFT else ''
+
+
+class KeyEncoder:
+    """Turns pynput keys into event codes, None for keys that never change the typed text."""
+
+    __slots__ = ('_names',)
+
+    def __init__(self, special_chars, modifiers):
+        # Key name -> code, anything else that has a name is a RESET
+        self._names = {name: ord(char) for name, char in special_chars.items()}
+        self._names['backspace'] = BACKSPACE
+        self._names['left'] = LEFT
+        self._names.update((name, None) for name in modifiers)
+
+    def encode(self, key):
+        # pynput already reports characters as the active layout produces them
+        char = getattr(key, 'char', None)
+        if char:
+            if len(char) == 1 and (char.isprintable() or char in '\n\t'):
+                return ord(char)
+            # Control characters, typed with Ctrl held
+            return RESET
+        return self._names.get(getattr(key, 'name', None), RESET)
+
+
+class KeyEventRing:
+    """Fixed-size buffer of key events from one producer thread to one consumer thread.
+
+    Codes and timestamps live in arrays allocated up front, so pushing an
+    event stores two numbers and allocates nothing. Only the producer
+    moves the tail and only the consumer moves the head, so no lock is
+    needed. The producer never waits: when the buffer is full new events
+    are dropped, and the last free slot holds one OVERFLOW event telling
+    the consumer that the typed text has a gap.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.codes = array('i', bytes(4 * capacity))
+        self.stamps = array('q', bytes(8 * capacity))
+        self.dropped = 0
+        self._head = 0   # Events consumed so far
+        self._tail = 0   # Events pushed so far
+        self._overflowed = False
+        self._ready = threading.Event()
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def push(self, code, stamp=0):
+        """Add an event, returning False if it was dropped."""
+        tail = self._tail
+        if tail - self._head >= self.capacity - 1:
+            self.dropped += 1
+            if self._overflowed:
+                return False
+            code, stamp = OVERFLOW, 0
+            self._overflowed = True
+        else:
+            self._overflowed = False
+        slot = tail % self.capacity
+        self.codes[slot] = code
+        self.stamps[slot] = stamp
+        self._tail = tail + 1
+        if not self._ready.is_set():
+            self._ready.set()
+        return code != OVERFLOW
+
+    def wait(self, timeout=None):
+        """Block until events may be ready. Check len() afterwards."""
+        self._ready.wait(timeout)
+        self._ready.clear()
+
+    def wake(self):
+        self._ready.set()
+
+    def peek(self, limit=DEFAULT_BATCH_SIZE):
+        """Return (first slot, count) of the oldest events, without consuming them.
+
+        The slots are contiguous, a run that wraps around the end of the
+        arrays is returned in two batches.
+        """
+        head = self._head
+        start = head % self.capacity
+        return start, min(self._tail - head, limit, self.capacity - start)
+
+    def advance(self, count):
+        self._head += count
+
+
+class KeyEventConsumer(threading.Thread):
+    """Hands buffered key events to handle_batch(start, count) in batches, in order."""
+
+    def __init__(self, ring, handle_batch, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(name='shrthnder-keys', daemon=True)
+        self.logger = logging.getLogger('shrthnder')
+        self.ring = ring
+        self.handle_batch = handle_batch
+        self.batch_size = batch_size
+        self.batches = 0
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+        self.ring.wake()
+
+    def run(self):
+        ring = self.ring
+        while not self._stopped:
+            ring.wait()
+            while len(ring) and not self._stopped:
+                start, count = ring.peek(self.batch_size)
+                try:
+                    self.handle_batch(start, count)
+                except Exception as e:
+                    self.logger.error(f"Error handling key events: {e}")
+                # Consumed only now, so an empty ring means the events were handled
+                ring.advance(count)
+                self.batches += 1
@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from .events import BACKSPACE_TOKEN, LEFT_TOKEN
+
+# How long we wait for our own injected keys to come back through the listener
+ECHO_TIMEOUT = 0.5
+
+
+class InjectionWorker(threading.Thread):
+    """Runs text injection jobs off the keyboard listener thread, in order."""
+
+    def __init__(self, on_idle=None):
+        super().__init__(name='shrthnder-injector', daemon=True)
+        self.logger = logging.getLogger('shrthnder')
+        self.on_idle = on_idle
+        self._jobs = queue.Queue()
+        self._outstanding = 0
+        self._outstanding_lock = threading.Lock()
+
+    @property
+    def busy(self):
+        return self._outstanding > 0
+
+    def submit(self, func, *args):
+        # Mark busy before the listener returns so the next key is buffered
+        with self._outstanding_lock:
+            self._outstanding += 1
+        self._jobs.put((func, args))
+
+    def stop(self):
+        self._jobs.put(None)
+
+    def run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            func, args = job
+            try:
+                func(*args)
+            except Exception as e:
+                self.logger.error(f"Error injecting text: {e}")
+            with self._outstanding_lock:
+                self._outstanding -= 1
+                idle = self._outstanding == 0
+            if idle and self.on_idle:
+                try:
+                    self.on_idle()
+                except Exception as e:
+                    self.logger.error(f"Error replaying buffered keys: {e}")
+
+
+class EchoFilter:
+    """Recognizes our own injected keystrokes when the listener sees them again.
+
+    Used on platforms where injected events cannot be tagged. Each injection
+    registers the keys it sends (characters, plus tokens for backspace and
+    the left arrows that place the cursor); incoming keys that match the
+    head of that sequence are dropped as our own. Keys that don't come back
+    in time were dropped somewhere, which echoed() reports.
+
+    These platforms can't hold the user's keys back at the OS level either:
+    keys typed during an injection reach the application between ours. The
+    controller still hands them to the matcher only after the injection, so
+    expansions see them in order, but the application may not.
+    """
+
+    def __init__(self, timeout=ECHO_TIMEOUT):
+        self.timeout = timeout
+        self._expected = deque()
+        self._deadline = 0.0
+        # Characters expected so far, and how many of them came back or were given up on
+        self._queued = 0
+        self._resolved = 0
+        # The marks between these were given up on the last time keys didn't come back
+        self._dropped_after = 0
+        self._dropped_through = 0
+        self._lock = threading.Lock()
+
+    def expect(self, count, text, left=0):
+        """Register an injection, returning the mark to pass to echoed()."""
+        self._expected.extend(BACKSPACE_TOKEN * count)
+        self._expected.extend(text)
+        self._expected.extend(LEFT_TOKEN * left)
+        self._deadline = time.monotonic() + self.timeout
+        self._queued += count + len(text) + left
+        return self._queued
+
+    def echoed(self, mark):
+        """True once an injection's keys all came back, False if some were given up on, None before.
+
+        Never waits. Keys given up on are only noticed when the next key
+        arrives, so an injection still unresolved after the timeout didn't
+        come back either.
+        """
+        with self._lock:
+            if self._resolved < mark:
+                return None
+            return not self._dropped_after < mark <= self._dropped_through
+
+    def consume(self, char):
+        if not self._expected:
+            return False
+        now = time.monotonic()
+        if now > self._deadline:
+            # Some of our events never came back, stop waiting for them
+            with self._lock:
+                self._dropped_after = self._resolved
+                self._dropped_through = self._resolved + len(self._expected)
+            self._resolve(len(self._expected))
+            self._expected.clear()
+            return False
+        if self._expected[0] != char:
+            return False
+        self._expected.popleft()
+        self._deadline = now + self.timeout
+        self._resolve(1)
+        return True
+
+    def _resolve(self, count):
+        with self._lock:
+            self._resolved += count
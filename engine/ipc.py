@@ -0,0 +1,342 @@
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Listener, Client
+
+# Events queued per connected GUI, newer ones are dropped while it is this far behind
+EVENT_QUEUE_SIZE = 256
+
+
+class EngineError(Exception):
+    """A command sent to the engine failed there."""
+
+
+def runtime_dir():
+    """Directory only this user can read, holding the engine's socket and key."""
+    if sys.platform == 'win32':
+        path = os.path.join(os.environ.get('LOCALAPPDATA') or tempfile.gettempdir(), 'shrthnder')
+    elif os.environ.get('XDG_RUNTIME_DIR'):
+        path = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'shrthnder')
+    else:
+        path = os.path.join(tempfile.gettempdir(), f'shrthnder-{os.getuid()}')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def engine_address():
+    if sys.platform == 'win32':
+        return r'\\.\pipe\shrthnder-' + os.environ.get('USERNAME', 'user')
+    return os.path.join(runtime_dir(), 'engine.sock')
+
+
+def _key_path():
+    return os.path.join(runtime_dir(), 'engine.key')
+
+
+def _read_key():
+    with open(_key_path(), 'rb') as f:
+        return f.read()
+
+
+def _write_key():
+    # A new key for every engine, readable by this user only
+    key = os.urandom(32)
+    path = _key_path()
+    tmp_path = path + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    os.replace(tmp_path, path)
+    return key
+
+
+class EngineService:
+    """The commands a settings window can send to the engine.
+
+    The methods named in COMMANDS are the commands, nothing else can be
+    called remotely. Results are plain data, shortcuts are returned as
+    copies so they are pickled outside the controller's locks.
+    """
+
+    COMMANDS = frozenset((
+        'state', 'get_profiles', 'get_profile', 'stack_shortcuts', 'active_window', 'app_rule_for',
+        'switch_profile', 'set_profile_stack', 'create_profile', 'delete_profile',
+        'add_shortcut', 'delete_shortcut', 'save_profiles', 'set_app_rule', 'remove_app_rule',
+        'set_input_language', 'set_metrics_enabled', 'metrics_summary', 'export_metrics', 'reset_metrics',
+        'set_suggestions_enabled', 'usage_stats', 'reset_usage',
+        'plan_import', 'apply_import', 'export_shortcuts', 'shutdown',
+    ))
+
+    def __init__(self, controller, on_shutdown=None):
+        self.controller = controller
+        self.on_shutdown = on_shutdown
+
+    def state(self):
+        controller = self.controller
+        stack, current_profile = controller.get_active_stack()
+        return {
+            'profiles': controller.get_profiles(),
+            'stack': stack,
+            'current_profile': current_profile,
+            'input_language': controller.input_language,
+            'metrics': controller.metrics is not None,
+            'suggestions': controller.suggestions_enabled,
+            'tab_accepts': controller.tab_accepts,
+        }
+
+    def get_profiles(self):
+        return self.controller.get_profiles()
+
+    def get_profile(self, name):
+        return self.controller.get_profile_shortcuts(name)
+
+    def stack_shortcuts(self):
+        return self.controller.get_stack_shortcuts()
+
+    def active_window(self):
+        return self.controller.active_window_class, list(self.controller.recent_window_classes)
+
+    def app_rule_for(self, window_class):
+        return self.controller.get_app_rule(window_class)
+
+    def switch_profile(self, profile_name):
+        return self.controller.switch_profile(profile_name)
+
+    def set_profile_stack(self, profile_names):
+        return self.controller.set_profile_stack(profile_names)
+
+    def create_profile(self, profile_name):
+        self.controller.create_profile(profile_name)
+
+    def delete_profile(self, profile_name):
+        self.controller.delete_profile(profile_name)
+
+    def add_shortcut(self, shorthand, expansion):
+        return self.controller.add_shortcut(shorthand, expansion)
+
+    def delete_shortcut(self, shorthand):
+        return self.controller.delete_shortcut(shorthand)
+
+    def save_profiles(self):
+        self.controller.save_profiles()
+
+    def set_app_rule(self, window_class, profile_names):
+        return self.controller.set_app_rule(window_class, profile_names)
+
+    def remove_app_rule(self, window_class):
+        return self.controller.remove_app_rule(window_class)
+
+    def set_input_language(self, language):
+        self.controller.set_input_language(language)
+
+    def set_metrics_enabled(self, enabled):
+        self.controller.set_metrics_enabled(enabled)
+
+    def metrics_summary(self, stage='total'):
+        metrics = self.controller.metrics
+        return metrics.summary(stage) if metrics is not None else None
+
+    def export_metrics(self, path):
+        metrics = self.controller.metrics
+        if metrics is not None:
+            metrics.export(path)
+
+    def reset_metrics(self):
+        metrics = self.controller.metrics
+        if metrics is not None:
+            metrics.reset()
+
+    def set_suggestions_enabled(self, enabled):
+        self.controller.set_suggestions_enabled(enabled)
+
+    def usage_stats(self):
+        self.controller.usage.flush()
+        return self.controller.usage.stats()
+
+    def reset_usage(self):
+        self.controller.reset_usage()
+
+    def plan_import(self, path, fmt=None):
+        return self.controller.plan_import(path, fmt)
+
+    def apply_import(self, plan, overwrite=False):
+        return self.controller.apply_import(plan, overwrite)
+
+    def export_shortcuts(self, path, fmt=None):
+        self.controller.export_shortcuts(path, fmt)
+
+    def shutdown(self):
+        if self.on_shutdown is not None:
+            self.on_shutdown()
+
+
+class _Subscriber(threading.Thread):
+    # Sends events to one GUI from its own thread, so a slow GUI never blocks the engine
+    def __init__(self, conn):
+        super().__init__(name='shrthnder-ipc-events', daemon=True)
+        self.conn = conn
+        self.events = queue.Queue(EVENT_QUEUE_SIZE)
+        self.closed = False
+
+    def publish(self, name, payload):
+        try:
+            self.events.put_nowait((name, payload))
+        except queue.Full:
+            pass
+
+    def close(self):
+        self.closed = True
+        self.publish(None, None)
+
+    def run(self):
+        try:
+            while True:
+                event = self.events.get()
+                if event[0] is None:
+                    break
+                self.conn.send(event)
+        except (OSError, EOFError):
+            pass
+        finally:
+            self.closed = True
+            self.conn.close()
+
+
+class EngineServer(threading.Thread):
+    """Serves EngineService commands and pushes engine events to connected windows.
+
+    Each connection sends (command, args, kwargs) and gets back ('ok', result)
+    or ('error', message). A connection that sends ('subscribe',) instead
+    receives (event, payload) tuples: stack_changed, profiles_reloaded and
+    suggestions_changed, the same values the controller's listeners get.
+    """
+
+    def __init__(self, controller, on_shutdown=None, address=None):
+        super().__init__(name='shrthnder-ipc', daemon=True)
+        self.logger = logging.getLogger('shrthnder')
+        self.service = EngineService(controller, on_shutdown)
+        self.address = address or engine_address()
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            # Left behind by an engine that didn't shut down cleanly
+            os.unlink(self.address)
+        self.listener = Listener(self.address, authkey=_write_key())
+        self._subscribers = []
+        self._subscribers_lock = threading.Lock()
+        self._stopped = False
+        controller.stack_listeners.append(lambda names: self._publish('stack_changed', names))
+        controller.profile_listeners.append(lambda changes: self._publish('profiles_reloaded', changes))
+        controller.suggestion_listeners.append(lambda suggestions: self._publish('suggestions_changed', suggestions))
+
+    def stop(self):
+        self._stopped = True
+        self.listener.close()
+        with self._subscribers_lock:
+            for subscriber in self._subscribers:
+                subscriber.close()
+
+    def _publish(self, name, payload):
+        with self._subscribers_lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if not subscriber.closed]
+            for subscriber in self._subscribers:
+                subscriber.publish(name, payload)
+
+    def run(self):
+        while not self._stopped:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                if self._stopped:
+                    break
+                # A client that failed authentication or went away while connecting
+                continue
+            except Exception as e:
+                self.logger.error(f"Error accepting a connection: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name='shrthnder-ipc-client', daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (OSError, EOFError):
+                    break
+                except Exception as e:
+                    # The whole message was read, only unpickling it failed
+                    conn.send(('error', f"Malformed message: {e}"))
+                    continue
+                if message == ('subscribe',):
+                    subscriber = _Subscriber(conn)
+                    with self._subscribers_lock:
+                        self._subscribers.append(subscriber)
+                    subscriber.start()
+                    return
+                reply = self._dispatch(message)
+                try:
+                    conn.send(reply)
+                except (OSError, EOFError):
+                    break
+                except Exception as e:
+                    # A result that can't be pickled, nothing was sent yet
+                    self.logger.error(f"Error sending the result of {message[0]}: {e}")
+                    conn.send(('error', f"Result could not be sent: {e}"))
+        except (OSError, EOFError):
+            pass
+        conn.close()
+
+    def _dispatch(self, message):
+        if not isinstance(message, tuple) or len(message) != 3:
+            return 'error', "Malformed message, expected (command, args, kwargs)"
+        command, args, kwargs = message
+        if not isinstance(command, str) or command not in EngineService.COMMANDS:
+            return 'error', f"Unknown command: {command!r}"
+        if not isinstance(args, (tuple, list)) or not isinstance(kwargs, dict):
+            return 'error', f"Malformed arguments for {command}"
+        try:
+            return 'ok', getattr(self.service, command)(*args, **kwargs)
+        except Exception as e:
+            self.logger.error(f"Error in {command}: {e}")
+            return 'error', str(e)
+
+
+class EngineClient:
+    """Connection to a running engine. Raises OSError if none is listening."""
+
+    def __init__(self, address=None):
+        self.address = address or engine_address()
+        self._conn = Client(self.address, authkey=_read_key())
+        self._lock = threading.Lock()
+        self._events = None
+
+    def call(self, command, *args, **kwargs):
+        with self._lock:
+            self._conn.send((command, args, kwargs))
+            status, value = self._conn.recv()
+        if status == 'error':
+            raise EngineError(value)
+        return value
+
+    def subscribe(self, callback):
+        """Call callback(event, payload) from a background thread for every engine event.
+
+        The event is 'disconnected' once the engine goes away.
+        """
+        self._events = Client(self.address, authkey=_read_key())
+        self._events.send(('subscribe',))
+
+        def receive():
+            try:
+                while True:
+                    callback(*self._events.recv())
+            except (OSError, EOFError):
+                callback('disconnected', None)
+
+        threading.Thread(target=receive, name='shrthnder-ipc-events', daemon=True).start()
+
+    def close(self):
+        self._conn.close()
+        if self._events is not None:
+            self._events.close()
@@ -0,0 +1,185 @@
+from collections import deque
+
+# Characters that end a word and fire any delimiter-terminated trigger
+DELIMITERS = frozenset(" \n\t.,;:!?()[]{}\"")
+
+# How many keystrokes can be undone with backspace before the matcher gives up
+HISTORY_SIZE = 64
+
+
+class Match:
+    """A trigger that fired while feeding keystrokes into the matcher."""
+
+    __slots__ = ('trigger', 'expansion', 'typed', 'delimiter', 'defined')
+
+    def __init__(self, trigger, expansion, typed, delimiter, defined=None):
+        self.trigger = trigger
+        self.expansion = expansion
+        self.typed = typed          # Text exactly as the user typed it
+        self.delimiter = delimiter  # '' for immediate triggers
+        # The trigger in the case the shortcut defines it
+        self.defined = defined if defined is not None else trigger
+
+    def __repr__(self):
+        return f"Match({self.trigger!r}, {self.expansion!r}, typed={self.typed!r}, delimiter={self.delimiter!r})"
+
+
+class _Node:
+    __slots__ = ('children', 'expansion', 'immediate', 'trigger')
+
+    def __init__(self):
+        self.children = None
+        self.expansion = None
+        self.immediate = False
+        self.trigger = None
+
+
+class TriggerMatcher:
+    """Streaming trie matcher that advances one state per keystroke.
+
+    Triggers are matched case-insensitively. A normal trigger fires when it is
+    followed by a delimiter (space, Enter, Tab or punctuation); an immediate
+    trigger fires as soon as its last character is typed. Triggers may contain
+    delimiter characters themselves, in which case the longer trigger wins.
+    """
+
+    def __init__(self, shortcuts=None):
+        self._root = _Node()
+        self._count = 0
+        self.reset()
+        if shortcuts:
+            self.load(shortcuts)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, trigger):
+        node = self._find(trigger.lower())
+        return node is not None and node.expansion is not None
+
+    def get(self, trigger):
+        """Return a trigger's expansion, or None."""
+        node = self._find(trigger.lower())
+        return node.expansion if node is not None else None
+
+    @staticmethod
+    def is_immediate(trigger):
+        # Triggers starting with a symbol (":date", ";sig") fire without a delimiter
+        return bool(trigger) and not trigger[0].isalnum()
+
+    def load(self, shortcuts):
+        """Replace all triggers with the given {trigger: expansion} mapping."""
+        self._root = _Node()
+        self._count = 0
+        for trigger, expansion in shortcuts.items():
+            self.add(trigger, expansion)
+        self.reset()
+
+    def add(self, trigger, expansion, immediate=None):
+        defined = trigger
+        trigger = trigger.lower()
+        if not trigger:
+            return
+        if immediate is None:
+            immediate = self.is_immediate(trigger)
+        node = self._root
+        for char in trigger:
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+            node = child
+        if node.expansion is None:
+            self._count += 1
+        node.expansion = expansion
+        node.immediate = immediate
+        node.trigger = defined
+
+    def remove(self, trigger):
+        trigger = trigger.lower()
+        path = [self._root]
+        for char in trigger:
+            children = path[-1].children
+            if not children or char not in children:
+                return False
+            path.append(children[char])
+        if path[-1].expansion is None:
+            return False
+        path[-1].expansion = None
+        path[-1].immediate = False
+        path[-1].trigger = None
+        self._count -= 1
+        # Prune branches that no longer lead to any trigger
+        for depth in range(len(trigger), 0, -1):
+            node = path[depth]
+            if node.expansion is not None or node.children:
+                break
+            del path[depth - 1].children[trigger[depth - 1]]
+        # Nodes in the keystroke history may have been pruned
+        self.reset()
+        return True
+
+    def _find(self, trigger):
+        node = self._root
+        for char in trigger:
+            if not node.children or char not in node.children:
+                return None
+            node = node.children[char]
+        return node
+
+    def reset(self):
+        """Forget what was typed, e.g. after the cursor moved or text was injected."""
+        self._node = self._root
+        self._typed = []
+        self._history = deque(maxlen=HISTORY_SIZE)
+
+    @property
+    def current_word(self):
+        return ''.join(self._typed)
+
+    def feed(self, char):
+        """Advance by one typed character. Returns a Match or None."""
+        node = self._node
+        self._history.append((node, self._typed, len(self._typed)))
+        lowered = char.lower()
+
+        if node is not None and node.children and lowered in node.children:
+            # Continue the current trigger, even through punctuation
+            node = node.children[lowered]
+            self._typed.append(char)
+        elif char in DELIMITERS:
+            if node is not None and node.expansion is not None and not node.immediate:
+                match = Match(self._trigger_text(), node.expansion, ''.join(self._typed), char, node.trigger)
+                self.reset()
+                return match
+            # A delimiter starts a new word, and may itself start a trigger
+            self._typed = []
+            children = self._root.children
+            if children and lowered in children:
+                node = children[lowered]
+                self._typed.append(char)
+            else:
+                node = self._root
+        else:
+            # No trigger continues with this character; wait for the next word
+            node = None
+            self._typed.append(char)
+
+        self._node = node
+        if node is not None and node.immediate and node.expansion is not None:
+            match = Match(self._trigger_text(), node.expansion, ''.join(self._typed), '', node.trigger)
+            self.reset()
+            return match
+        return None
+
+    def backspace(self):
+        if not self._history:
+            self._node = None
+            self._typed = []
+            return
+        self._node, self._typed, length = self._history.pop()
+        del self._typed[length:]
+
+    def _trigger_text(self):
+        return ''.join(self._typed).lower()
@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+from array import array
+
+# Eight buckets per power of two gives about 12% resolution up to ~18 minutes
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+BUCKETS = 38 * SUB_BUCKETS
+
+# Pipeline stages, in the order an expansion goes through them
+STAGES = (
+    'keystroke',  # Key received, through the event buffer, until the matcher decided
+    'render',     # Filling in the expansion's placeholders
+    'queue',      # Waiting for the injection worker
+    'inject',     # Deleting the trigger and inserting the expansion
+    'total',      # Key received until the expansion was injected
+)
+
+
+def _bucket(ns):
+    if ns < SUB_BUCKETS:
+        return max(ns, 0)
+    shift = ns.bit_length() - SUB_BUCKET_BITS - 1
+    return min((shift << SUB_BUCKET_BITS) + (ns >> shift), BUCKETS - 1)
+
+
+def _bucket_floor(index):
+    if index < SUB_BUCKETS:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    return (SUB_BUCKETS + (index & (SUB_BUCKETS - 1))) << shift
+
+
+class LatencyHistogram:
+    """Fixed-size log-linear histogram of durations in nanoseconds."""
+
+    __slots__ = ('counts', 'count', 'max')
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * BUCKETS))
+        self.count = 0
+        self.max = 0
+
+    def record(self, ns):
+        self.counts[_bucket(ns)] += 1
+        self.count += 1
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, fraction):
+        """Upper edge of the bucket holding the given fraction, in nanoseconds."""
+        if not self.count:
+            return 0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(_bucket_floor(index + 1), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'max_ns': self.max,
+            'buckets': [[_bucket_floor(i), c] for i, c in enumerate(self.counts) if c],
+        }
+
+
+class PipelineMetrics:
+    """Per-stage latency histograms for the expansion pipeline."""
+
+    clock = staticmethod(time.perf_counter_ns)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+    def record(self, stage, start_ns, end_ns):
+        self.histograms[stage].record(end_ns - start_ns)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+    def summary(self, stage='total'):
+        """Return (count, p50, p95, p99) for a stage, in milliseconds."""
+        histogram = self.histograms[stage]
+        return (
+            histogram.count,
+            histogram.percentile(0.50) / 1e6,
+            histogram.percentile(0.95) / 1e6,
+            histogram.percentile(0.99) / 1e6,
+        )
+
+    def export(self, path):
+        with self._lock:
+            data = {stage: histogram.to_dict() for stage, histogram in self.histograms.items()}
+        with open(path, 'w') as f:
+            json.dump({'unit': 'ns', 'stages': data}, f, indent=4)
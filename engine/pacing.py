@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+
+from .profile_store import write_json_atomic
+
+PACING_FILE = 'shrthnder_pacing.json'
+
+# Entry used for applications that have none of their own, set by calibration
+DEFAULT_APP = '*'
+
+# Seconds between injected keys are kept within these bounds, shorter delays become 0
+MIN_KEY_DELAY = 0.0005
+MAX_KEY_DELAY = 0.05
+
+# Delay tried first when keys were dropped without any
+BACKOFF_DELAY = 0.002
+
+# Clean injections in a row before a shorter delay is tried, and how much shorter
+SPEEDUP_AFTER = 5
+SPEEDUP_FACTOR = 0.75
+
+# Clean injections in a row after which a delay that once dropped keys is tried again
+RETRY_AFTER = 200
+
+
+class InjectionPacer:
+    """Learns the delay between injected keys that each application keeps up with.
+
+    An application starts at the calibrated default, or the backend's own
+    delay. An injection that dropped keys doubles the delay, and every
+    SPEEDUP_AFTER intact ones shorten it by SPEEDUP_FACTOR. The delay that
+    failed is remembered, and the pacer only goes down to it again after
+    RETRY_AFTER clean injections, so a slow application isn't probed on
+    every few expansions. Learned delays are kept in the pacing file.
+
+    The engine only learns that our keys reached the display server, not
+    the application, so by default the calibrated delay is a floor: it
+    backs off above it and comes back down to it. With verified set,
+    intact means the text arrived in the application as typed, as
+    calibrate_pacing checks, and shorter delays are tried too.
+    """
+
+    def __init__(self, path=PACING_FILE, verified=False):
+        self.logger = logging.getLogger('shrthnder')
+        self.path = path
+        self.verified = verified
+        # Application -> [delay, delay that dropped keys or None, clean injections in a row]
+        self.apps = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            apps = json.load(f).get('apps', {})
+        self.apps = {app: [entry['delay'], entry.get('failed'), 0] for app, entry in apps.items()}
+
+    def save(self):
+        write_json_atomic(self.path, {'apps': {
+            app: {'delay': delay, 'failed': failed} for app, (delay, failed, _) in self.apps.items()
+        }})
+
+    def delay_for(self, app, default):
+        entry = self.apps.get(app or DEFAULT_APP)
+        if entry is None:
+            return self.floor(default)
+        return entry[0] if self.verified else max(entry[0], self.floor(default))
+
+    def floor(self, default):
+        """The calibrated delay, or the backend's default when there is none."""
+        entry = self.apps.get(DEFAULT_APP)
+        return entry[0] if entry is not None else default
+
+    def set_delay(self, app, delay):
+        self.apps[app or DEFAULT_APP] = [delay, None, 0]
+
+    def record(self, app, default, intact):
+        """Adjust an application's delay after an injection, True if it changed."""
+        if not app and not self.verified:
+            # The calibrated default only changes through calibration
+            return False
+        app = app or DEFAULT_APP
+        entry = self.apps.get(app)
+        if entry is None:
+            entry = self.apps[app] = [self.delay_for(app, default), None, 0]
+        delay, failed, clean = entry
+        if not intact:
+            entry[0] = min(MAX_KEY_DELAY, max(delay * 2, BACKOFF_DELAY))
+            entry[1] = delay
+            entry[2] = 0
+            self.logger.info(f"Keys were dropped in {app}, typing with {entry[0] * 1000:.1f} ms between keys")
+        else:
+            clean += 1
+            entry[2] = clean
+            if not delay or clean < SPEEDUP_AFTER:
+                return False
+            faster = delay * SPEEDUP_FACTOR
+            if not self.verified:
+                faster = max(faster, self.floor(default))
+                if faster >= delay:
+                    return False
+            if faster < MIN_KEY_DELAY:
+                faster = 0.0
+            if failed is not None and faster <= failed:
+                if clean < RETRY_AFTER:
+                    return False
+                entry[1] = None
+            entry[0] = faster
+            entry[2] = 0
+        try:
+            self.save()
+        except OSError as e:
+            self.logger.error(f"Error saving injection pacing: {e}")
+        return True
@@ -0,0 +1,334 @@
+import csv
+import json
+import os
+import uuid
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+# Shortcut pack formats, by file extension
+PACK_FORMATS = {
+    '.csv': 'csv',
+    '.yml': 'espanso',
+    '.yaml': 'espanso',
+    '.textexpander': 'textexpander',
+    '.plist': 'textexpander',
+}
+
+# Header cells that mark a CSV's first row as a header
+CSV_HEADERS = {'trigger', 'shorthand', 'abbreviation', 'shortcut'}
+
+# Problems listed in an import report, the rest are only counted
+MAX_REPORTED_PROBLEMS = 100
+
+
+def detect_format(path):
+    fmt = PACK_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown shortcut pack format: {path}")
+    return fmt
+
+
+def read_pack(path, fmt=None):
+    """Stream (location, trigger, expansion, problem) from a shortcut pack.
+
+    Entries are read one at a time, so memory doesn't grow with the file.
+    problem is None, or why the entry can't be imported. A file that can't
+    be parsed at all raises ValueError.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        return _read_csv(path)
+    if fmt == 'espanso':
+        return _read_espanso(path)
+    if fmt == 'textexpander':
+        return _read_textexpander(path)
+    raise ValueError(f"Unknown shortcut pack format: {fmt}")
+
+
+def write_pack(path, shortcuts, fmt=None):
+    """Write (trigger, expansion) pairs as a shortcut pack, streaming them to the file."""
+    fmt = fmt or detect_format(path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='' if fmt == 'csv' else None, encoding='utf-8') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(['trigger', 'expansion'])
+            writer.writerows(shortcuts)
+        elif fmt == 'espanso':
+            f.write("matches:\n")
+            for trigger, expansion in shortcuts:
+                # JSON strings are valid YAML double-quoted scalars
+                f.write(f"  - trigger: {json.dumps(trigger, ensure_ascii=False)}\n"
+                        f"    replace: {json.dumps(expansion, ensure_ascii=False)}\n")
+        elif fmt == 'textexpander':
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" '
+                    '"http://www.apple.com/DTDs/PropertyList-1.0.dtd">\n'
+                    '<plist version="1.0">\n<dict>\n\t<key>snippetsTE2</key>\n\t<array>\n')
+            for trigger, expansion in shortcuts:
+                f.write(f"\t\t<dict>\n"
+                        f"\t\t\t<key>abbreviation</key>\n\t\t\t<string>{escape(trigger)}</string>\n"
+                        f"\t\t\t<key>plainText</key>\n\t\t\t<string>{escape(expansion)}</string>\n"
+                        f"\t\t\t<key>snippetType</key>\n\t\t\t<integer>0</integer>\n"
+                        f"\t\t\t<key>uuidString</key>\n\t\t\t<string>{uuid.uuid4()}</string>\n"
+                        f"\t\t</dict>\n")
+            f.write('\t</array>\n</dict>\n</plist>\n')
+        else:
+            raise ValueError(f"Unknown shortcut pack format: {fmt}")
+    os.replace(tmp_path, path)
+
+
+def _read_csv(path):
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                raise ValueError(f"line {reader.line_num}: {e}")
+            location = f"line {reader.line_num}"
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if reader.line_num == 1 and row[0].strip().lower() in CSV_HEADERS:
+                continue
+            if len(row) < 2:
+                yield location, row[0], None, "no expansion column"
+                continue
+            # TextExpander's CSV export adds a label column, which is ignored
+            yield location, row[0], row[1], None
+
+
+def _yaml_scalar(value):
+    # The scalar forms espanso files use on a single line
+    value = value.strip()
+    if value.startswith('"'):
+        return json.loads(value)
+    if value.startswith("'"):
+        if len(value) < 2 or not value.endswith("'"):
+            raise ValueError("unterminated string")
+        return value[1:-1].replace("''", "'")
+    if ' #' in value:
+        value = value[:value.index(' #')].rstrip()
+    return value
+
+
+def _yaml_flow_list(value):
+    value = value.strip()
+    if not value.startswith('[') or not value.endswith(']'):
+        raise ValueError("expected a list")
+    items = next(csv.reader([value[1:-1]], skipinitialspace=True), [])
+    return [_yaml_scalar(item) for item in items if item.strip()]
+
+
+def _yaml_block(lines, style):
+    # Literal (|) keeps line breaks, folded (>) joins lines with spaces
+    indent = min((len(line) - len(line.lstrip(' ')) for line in lines if line.strip()), default=0)
+    lines = [line[indent:] for line in lines]
+    text = '\n'.join(lines) if style[0] == '|' else ' '.join(line for line in lines if line)
+    if style.endswith('+'):
+        return text + '\n'
+    text = text.rstrip('\n')
+    return text if style.endswith('-') else text + '\n'
+
+
+def _finish_nested(item, nested):
+    key, style, lines = nested
+    try:
+        if style is None:
+            item[key] = [_yaml_scalar(line.strip()[1:]) for line in lines if line.strip().startswith('-')]
+        else:
+            item[key] = _yaml_block(lines, style)
+    except ValueError as e:
+        item['error'] = f"unreadable {key}: {e}"
+
+
+def _espanso_entries(item):
+    location = f"line {item['line']}"
+    triggers = item.get('triggers') or ([item['trigger']] if 'trigger' in item else [])
+    if 'error' in item:
+        problem = item['error']
+    elif not triggers:
+        problem = "no trigger"
+    elif 'replace' not in item:
+        problem = "no plain text replacement"
+    elif 'vars' in item or '{{' in item['replace']:
+        problem = "uses espanso variables"
+    else:
+        problem = None
+    for trigger in triggers or ['']:
+        yield location, trigger, item.get('replace'), problem
+
+
+def _read_espanso(path):
+    """Stream the matches of an espanso match file.
+
+    Only the part of YAML espanso match files use is understood: a matches
+    list whose items have trigger/triggers and replace, with quoted, plain,
+    flow list and block scalar values. Other keys are skipped.
+    """
+    in_matches = False
+    item = None
+    item_indent = key_indent = None
+    # (item key, block style or None for a list, lines) while collecting nested lines
+    nested = None
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            stripped = line.strip()
+            indent = len(line) - len(line.lstrip(' '))
+            if nested is not None:
+                # A list may start at the key's own indent
+                if not stripped or indent > key_indent or (nested[1] is None and indent == key_indent
+                                                           and stripped.startswith('-')):
+                    nested[2].append(line)
+                    continue
+                _finish_nested(item, nested)
+                nested = None
+            if not stripped or stripped.startswith('#'):
+                continue
+            if indent == 0 and not (in_matches and stripped.startswith('-')):
+                if item is not None:
+                    yield from _espanso_entries(item)
+                    item = None
+                in_matches = stripped == 'matches:'
+                item_indent = None
+                continue
+            if not in_matches:
+                continue
+            if stripped.startswith('-') and (item_indent is None or indent == item_indent):
+                if item is not None:
+                    yield from _espanso_entries(item)
+                item = {'line': line_no}
+                item_indent = indent
+                rest = stripped[1:].lstrip()
+                if not rest:
+                    # Keys start on the next line
+                    key_indent = None
+                    continue
+                key_indent = len(line) - len(rest)
+                stripped, indent = rest, key_indent
+            if item is not None and key_indent is None and indent > item_indent:
+                key_indent = indent
+            if item is None or indent != key_indent or ':' not in stripped:
+                # Nested under a key we don't use, such as vars
+                continue
+            key, value = stripped.split(':', 1)
+            key, value = key.strip(), value.strip()
+            if key not in ('trigger', 'triggers', 'replace'):
+                item[key] = True
+                continue
+            if not value:
+                nested = (key, None, [])
+            elif value[0] in '|>':
+                nested = (key, value, [])
+            else:
+                try:
+                    item[key] = _yaml_flow_list(value) if key == 'triggers' else _yaml_scalar(value)
+                except ValueError as e:
+                    item['error'] = f"unreadable {key}: {e}"
+        if nested is not None:
+            _finish_nested(item, nested)
+        if item is not None:
+            yield from _espanso_entries(item)
+
+
+def _read_textexpander(path):
+    # Snippet dicts are parsed and discarded one by one, not as a whole document
+    try:
+        yield from _iter_snippets(path)
+    except ET.ParseError as e:
+        raise ValueError(str(e))
+
+
+def _iter_snippets(path):
+    count = 0
+    depth = 0
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if elem.tag != 'dict':
+            continue
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        children = list(elem)
+        fields = {}
+        for key, value in zip(children[::2], children[1::2]):
+            if key.tag == 'key':
+                fields[key.text] = value.text or ''
+        if 'abbreviation' in fields:
+            count += 1
+            location = f"snippet {count}"
+            if fields.get('plainText'):
+                yield location, fields['abbreviation'], fields['plainText'], None
+            else:
+                yield location, fields['abbreviation'], None, "no plain text"
+        if depth > 0:
+            elem.clear()
+
+
+class ImportPlan:
+    """What importing a shortcut pack into a profile would change.
+
+    Imported shorthands are compared case-insensitively, like they are
+    matched. One that the profile already has with the same expansion, or
+    that the pack repeats, is a duplicate. One the profile has with a
+    different expansion is a conflict, which is only imported when
+    overwriting. Problems are counted, and the first MAX_REPORTED_PROBLEMS
+    kept for the report.
+    """
+
+    def __init__(self, entries, existing):
+        self.added = {}
+        self.conflicts = {}     # Profile's trigger -> (current expansion, imported expansion)
+        self.duplicates = 0
+        self.problems = []      # (location, trigger, reason)
+        self.problem_count = 0
+        existing_lower = {trigger.lower(): trigger for trigger in existing}
+        seen = set()
+        for location, trigger, expansion, problem in entries:
+            trigger = (trigger or '').strip()
+            if problem is None:
+                problem = self._validate(trigger, expansion)
+            if problem is not None:
+                self._problem(location, trigger, problem)
+                continue
+            lowered = trigger.lower()
+            if lowered in seen:
+                self.duplicates += 1
+                continue
+            seen.add(lowered)
+            current = existing_lower.get(lowered)
+            if current is None:
+                self.added[trigger] = expansion
+            elif existing[current] == expansion:
+                self.duplicates += 1
+            else:
+                self.conflicts[current] = (existing[current], expansion)
+
+    @staticmethod
+    def _validate(trigger, expansion):
+        if not trigger:
+            return "empty shorthand"
+        if any(char.isspace() for char in trigger):
+            return "shorthand contains whitespace"
+        if not expansion:
+            return "empty expansion"
+        return None
+
+    def _problem(self, location, trigger, reason):
+        self.problem_count += 1
+        if len(self.problems) < MAX_REPORTED_PROBLEMS:
+            self.problems.append((location, trigger, reason))
+
+    def shortcuts(self, overwrite=False):
+        if not overwrite or not self.conflicts:
+            return self.added
+        shortcuts = dict(self.added)
+        shortcuts.update((trigger, imported) for trigger, (_, imported) in self.conflicts.items())
+        return shortcuts
+
+    def summary(self):
+        return (f"{len(self.added)} new, {len(self.conflicts)} conflicting, "
+                f"{self.duplicates} duplicate, {self.problem_count} invalid")
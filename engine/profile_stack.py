@@ -0,0 +1,131 @@
+import json
+import os
+from fnmatch import fnmatchcase
+
+from .profile_store import write_json_atomic
+
+APP_RULES_FILE = 'shrthnder_app_rules.json'
+
+# Built stacks kept around, so switching between applications doesn't rebuild them
+MAX_CACHED_STACKS = 4
+
+
+class ProfileStack:
+    """Profiles layered into one lookup table.
+
+    Later profiles take precedence, so ("Default", "Developer") gives
+    Developer's expansion for a trigger both of them define. Edits go to the
+    last profile. A single profile is used as it is, without a copy.
+    """
+
+    def __init__(self, names, profiles):
+        self.names = tuple(names)
+        self.rebuild(profiles)
+
+    @property
+    def top(self):
+        return self.names[-1]
+
+    def rebuild(self, profiles):
+        if len(self.names) == 1:
+            self.shortcuts = profiles[self.names[0]]
+            return
+        merged = {}
+        for name in self.names:
+            merged.update(profiles[name])
+        self.shortcuts = merged
+
+    def refresh(self, profiles, triggers):
+        """Resolve triggers again after members changed.
+
+        Returns {trigger: expansion}, with None for triggers to drop. Triggers
+        match case-insensitively like in the matcher, so deleting 'BTW' from
+        the top profile drops 'BTW' and brings back a lower profile's 'btw'.
+        Drops come before the trigger that takes their place.
+        """
+        members = [profiles[name] for name in reversed(self.names)]
+        # Lowercased trigger -> trigger per member, only built when a case differs
+        lowered = [None] * len(members)
+        updates = {}
+        winners = {}
+        for trigger in triggers:
+            key = trigger.lower()
+            if key in winners:
+                winner = winners[key]
+            else:
+                winner = None
+                for i, shortcuts in enumerate(members):
+                    if trigger in shortcuts:
+                        winner = trigger
+                    elif key in shortcuts:
+                        winner = key
+                    else:
+                        if lowered[i] is None:
+                            lowered[i] = {original.lower(): original for original in shortcuts}
+                        winner = lowered[i].get(key)
+                    if winner is not None:
+                        winner = (winner, shortcuts[winner])
+                        break
+                winners[key] = winner
+            if winner is None or winner[0] != trigger:
+                updates[trigger] = None
+        for winner in winners.values():
+            if winner is not None:
+                updates[winner[0]] = winner[1]
+        if len(self.names) == 1:
+            # The store may have swapped in a new dict for the profile
+            self.shortcuts = members[0]
+            return updates
+        for trigger, expansion in updates.items():
+            if expansion is None:
+                self.shortcuts.pop(trigger, None)
+            else:
+                self.shortcuts[trigger] = expansion
+        return updates
+
+
+class AppProfileRules:
+    """Profile stacks to use while a given application has focus.
+
+    Rules are (pattern, profiles) pairs checked in order. The pattern is a
+    shell-style wildcard matched case-insensitively against the focused
+    window's class. Results are cached per window class, so a focus change
+    costs a dict lookup once an application was seen.
+    """
+
+    def __init__(self, path=APP_RULES_FILE):
+        self.path = path
+        self.rules = []
+        self._cache = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.rules = [(pattern, list(stack)) for pattern, stack in json.load(f).get('rules', [])]
+        self._cache = {}
+
+    def save(self):
+        write_json_atomic(self.path, {'rules': [[pattern, stack] for pattern, stack in self.rules]})
+
+    def set_rule(self, pattern, stack):
+        self.rules = [rule for rule in self.rules if rule[0] != pattern] + [(pattern, list(stack))]
+        self._cache = {}
+        self.save()
+
+    def remove_rule(self, pattern):
+        self.rules = [rule for rule in self.rules if rule[0] != pattern]
+        self._cache = {}
+        self.save()
+
+    def stack_for(self, window_class):
+        """Return the profile names for a window class, or None if no rule matches."""
+        if window_class in self._cache:
+            return self._cache[window_class]
+        stack = None
+        lowered = (window_class or '').lower()
+        for pattern, names in self.rules:
+            if fnmatchcase(lowered, pattern.lower()):
+                stack = tuple(names)
+                break
+        self._cache[window_class] = stack
+        return stack
@@ -0,0 +1,469 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# Compact once the journal is larger than this, or larger than the snapshot
+COMPACT_MIN_BYTES = 256 * 1024
+
+# Upper bound on shortcuts kept in memory for profiles that aren't in use
+DEFAULT_MAX_LOADED_SHORTCUTS = 200_000
+
+# Seconds between checks for edits made to the profiles file by other programs
+RELOAD_POLL_INTERVAL = 1.0
+
+# Strings (with an optional trailing colon) and braces, for scanning the snapshot
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"\s*:?|[{}]')
+
+
+def write_json_atomic(path, data, indent=4):
+    """Write JSON to a temporary file and move it over path in one step."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def scan_profile_offsets(data):
+    """Find the byte span of every top-level profile object in a snapshot."""
+    offsets = {}
+    depth = 0
+    key = None
+    start = None
+    for token in _TOKEN.finditer(data):
+        text = token.group()
+        if text == b'{':
+            depth += 1
+            if depth == 2:
+                start = token.start()
+        elif text == b'}':
+            if depth == 2 and key is not None:
+                offsets[key] = (start, token.end())
+                key = None
+            depth -= 1
+        elif depth == 1 and text.endswith(b':'):
+            key = json.loads(text[:-1].rstrip())
+    if depth != 0:
+        raise ValueError("Profiles file is incomplete")
+    return offsets
+
+
+class ProfileStore(Mapping):
+    """Profiles backed by a JSON snapshot plus an append-only journal.
+
+    Every edit appends one line to `<path>.journal`, so saving is O(1) no
+    matter how many shortcuts exist. The journal is folded back into the
+    snapshot during compaction, which replaces the snapshot atomically. An
+    existing profiles file from older versions is read as the snapshot, so no
+    separate migration step is needed.
+
+    Only profile names and their byte offsets in the snapshot are read at
+    startup (from `<path>.index` when it is current, otherwise by scanning).
+    A profile's shortcuts are parsed the first time it is accessed, and
+    unpinned profiles are evicted again once more than max_loaded_shortcuts
+    are held in memory. A profile found not to parse when it is first read
+    stays listed but is marked unreadable in the index, reading it raises
+    ValueError, and its text is kept as it is when the snapshot is rewritten.
+
+    Reading works like a dict of {profile: {trigger: expansion}}. Changes
+    must go through the store's methods so they reach the journal.
+
+    When another program replaces the snapshot, reload() reads the new one,
+    replays the journal over it again and swaps in fresh dicts for the loaded
+    profiles, leaving the old ones untouched for anyone still reading them.
+
+    Without a path the defaults are only kept in memory and edits are lost
+    on exit, for when the profiles file can't be used at all.
+    """
+
+    def __init__(self, path, defaults=None, max_loaded_shortcuts=DEFAULT_MAX_LOADED_SHORTCUTS):
+        self.logger = logging.getLogger('shrthnder')
+        self.path = path
+        self.journal_path = path + '.journal' if path else None
+        self.index_path = path + '.index' if path else None
+        self.max_loaded_shortcuts = max_loaded_shortcuts
+        self._names = {}            # Profile names in file order
+        self._offsets = {}          # Byte span of each profile in the snapshot
+        self._loaded = OrderedDict()  # Parsed profiles, least recently used first
+        self._loaded_shortcuts = 0
+        self._pinned = set()
+        self._pending = {}          # Journaled operations per profile since the last compaction
+        self._dropped = set()       # Profiles whose snapshot copy was deleted
+        self._unreadable = {}       # Profiles whose snapshot copy can't be parsed, with the reason
+        self._journal = None
+        self._stamp = None          # Size and mtime of the snapshot as we last read or wrote it
+        self._rejected_stamp = None  # Stamp of an external snapshot we couldn't read
+        self._load(defaults)
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        if name in self._unreadable:
+            raise ValueError(f"Profile {name} can't be read: {self._unreadable[name]}")
+        shortcuts = self._loaded.get(name)
+        if shortcuts is None:
+            shortcuts = self._read_profile(name)
+            self._loaded[name] = shortcuts
+            self._loaded_shortcuts += len(shortcuts)
+            self._evict(keep=name)
+        else:
+            self._loaded.move_to_end(name)
+        return shortcuts
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def pin(self, name):
+        """Keep a profile in memory until it is unpinned."""
+        self._pinned.add(name)
+
+    def unpin(self, name):
+        self._pinned.discard(name)
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def is_readable(self, name):
+        return name not in self._unreadable
+
+    def _mark_unreadable(self, names, reason="not valid JSON"):
+        for name in names:
+            if name not in self._unreadable:
+                self.logger.error(f"Profile {name} in the profiles file can't be read: {reason}")
+            self._unreadable[name] = reason
+
+    def _load(self, defaults):
+        if self.path is None:
+            for name, shortcuts in (defaults or {}).items():
+                self._names[name] = None
+                self._loaded[name] = dict(shortcuts)
+                self._loaded_shortcuts += len(shortcuts)
+            return
+        if os.path.exists(self.path):
+            self._read_catalog()
+            self.logger.info(f"Found {len(self._names)} profiles in file")
+        else:
+            profiles = {name: dict(shortcuts) for name, shortcuts in (defaults or {}).items()}
+            self._write_snapshot(profiles, {})
+            self.logger.info("Saved default profiles to file")
+        self._replay_journal()
+        self._journal = open(self.journal_path, 'a')
+
+    def _snapshot_stamp(self, f=None):
+        stat = os.fstat(f.fileno()) if f is not None else os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def changed_on_disk(self):
+        """Check whether the snapshot was replaced since we last read or wrote it."""
+        if self.path is None:
+            return False
+        try:
+            return self._snapshot_stamp() not in (self._stamp, self._rejected_stamp)
+        except OSError:
+            return False
+
+    def _read_catalog(self):
+        stamp = self._snapshot_stamp()
+        self._stamp = stamp
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            offsets = {name: tuple(span) for name, span in index['profiles']}
+            unreadable = set(index.get('unreadable', ()))
+            current = index['stamp'] == stamp
+        except (OSError, ValueError, KeyError, TypeError):
+            offsets, unreadable, current = {}, set(), False
+        if current:
+            self._offsets = offsets
+            self._names = dict.fromkeys(offsets)
+            self._mark_unreadable(unreadable)
+            return
+        # Stale or missing index, find the offsets again. Nothing is parsed,
+        # profiles whose span moved are checked when they are first read
+        with open(self.path, 'rb') as f:
+            self._offsets = scan_profile_offsets(f.read())
+        self._names = dict.fromkeys(self._offsets)
+        self._mark_unreadable(name for name in unreadable if offsets.get(name) == self._offsets.get(name))
+        self._write_index(stamp)
+
+    def _write_index(self, stamp):
+        index = {'stamp': stamp, 'profiles': [[name, list(span)] for name, span in self._offsets.items()],
+                 'unreadable': [name for name in self._unreadable if name in self._offsets]}
+        try:
+            write_json_atomic(self.index_path, index, indent=None)
+        except OSError as e:
+            self.logger.error(f"Error saving profile index: {e}")
+
+    def _read_snapshot_profile(self, name):
+        span = self._offsets.get(name)
+        if span is None or name in self._dropped:
+            return {}
+        with open(self.path, 'rb') as f:
+            if self._snapshot_stamp(f) == self._stamp:
+                f.seek(span[0])
+                text = f.read(span[1] - span[0])
+            else:
+                # Replaced by another program and not reloaded yet, our offsets don't fit
+                data = f.read()
+                span = scan_profile_offsets(data).get(name)
+                if not span:
+                    return {}
+                text = data[span[0]:span[1]]
+        try:
+            shortcuts = json.loads(text)
+        except ValueError as e:
+            self._mark_unreadable([name], str(e))
+            if span == self._offsets.get(name):
+                # Remembered until the snapshot changes
+                self._write_index(self._stamp)
+            raise ValueError(f"Profile {name} can't be read: {e}") from None
+        return shortcuts
+
+    def _read_profile(self, name):
+        shortcuts = self._read_snapshot_profile(name)
+        for op in self._pending.get(name, ()):
+            self._apply_to(shortcuts, op)
+        return shortcuts
+
+    def _evict(self, keep):
+        if self.path is None:
+            # Nothing to read evicted profiles back from
+            return
+        for name in list(self._loaded):
+            if self._loaded_shortcuts <= self.max_loaded_shortcuts:
+                break
+            if name == keep or name in self._pinned:
+                continue
+            self._loaded_shortcuts -= len(self._loaded.pop(name))
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        valid_size = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    # A torn write from a crash, everything before it is intact
+                    self.logger.error("Ignoring incomplete entry at the end of the profiles journal")
+                    break
+                self._apply(op)
+                valid_size += len(line)
+        if valid_size != os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_size)
+
+    @staticmethod
+    def _apply_to(shortcuts, op):
+        if op[0] == 'set':
+            shortcuts[op[2]] = op[3]
+        elif op[0] == 'del':
+            shortcuts.pop(op[2], None)
+
+    def _apply(self, op):
+        kind, profile = op[0], op[1]
+        if kind == 'drop':
+            self._names.pop(profile, None)
+            self._unreadable.pop(profile, None)
+            if profile in self._loaded:
+                self._loaded_shortcuts -= len(self._loaded.pop(profile))
+            self._pending.pop(profile, None)
+            self._dropped.add(profile)
+            return
+        self._names.setdefault(profile, None)
+        if kind == 'create':
+            return
+        self._pending.setdefault(profile, []).append(op)
+        shortcuts = self._loaded.get(profile)
+        if shortcuts is not None:
+            before = len(shortcuts)
+            self._apply_to(shortcuts, op)
+            self._loaded_shortcuts += len(shortcuts) - before
+
+    def _record(self, *ops):
+        for op in ops:
+            self._apply(op)
+        if self._journal is None:
+            return
+        self._journal.write(''.join(json.dumps(op) + '\n' for op in ops))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        # Compaction waits for a reload when another program replaced the snapshot
+        if self._journal.tell() > max(COMPACT_MIN_BYTES, os.path.getsize(self.path)) \
+                and self._snapshot_stamp() == self._stamp:
+            self.compact()
+
+    def set_shortcut(self, profile, trigger, expansion):
+        self._record(['set', profile, trigger, expansion])
+
+    def set_shortcuts(self, profile, shortcuts):
+        """Set many shortcuts with one journal write."""
+        self._record(*(['set', profile, trigger, expansion] for trigger, expansion in shortcuts.items()))
+
+    def delete_shortcut(self, profile, trigger):
+        self._record(['del', profile, trigger])
+
+    def create_profile(self, profile):
+        self._record(['create', profile])
+
+    def delete_profile(self, profile):
+        self._record(['drop', profile])
+
+    def _profile_json(self, name, snapshot):
+        shortcuts = self._loaded.get(name)
+        if shortcuts is None and name in self._pending and name not in self._unreadable:
+            try:
+                shortcuts = self._read_profile(name)
+            except ValueError:
+                # Found broken just now, copied below and its edits stay in the journal
+                pass
+        # Untouched and unreadable profiles are copied from the old snapshot without parsing
+        if shortcuts is None and name not in self._dropped and name in self._offsets:
+            span = self._offsets[name]
+            snapshot.seek(span[0])
+            return snapshot.read(span[1] - span[0]).decode('utf-8')
+        if shortcuts is None:
+            shortcuts = self._read_profile(name)
+        return json.dumps(shortcuts, indent=4).replace('\n', '\n    ')
+
+    def _write_snapshot(self, profiles, chunks):
+        # Written by hand instead of json.dump so we learn each profile's offsets
+        tmp_path = self.path + '.tmp'
+        offsets = {}
+        with open(tmp_path, 'wb') as f:
+            f.write(b'{')
+            for i, name in enumerate(profiles):
+                text = chunks[name] if name in chunks else json.dumps(profiles[name], indent=4).replace('\n', '\n    ')
+                f.write((',\n    ' if i else '\n    ').encode('utf-8'))
+                f.write((json.dumps(name) + ': ').encode('utf-8'))
+                start = f.tell()
+                f.write(text.encode('utf-8'))
+                offsets[name] = (start, f.tell())
+            f.write(b'\n}' if profiles else b'}')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._offsets = offsets
+        self._names = dict.fromkeys(offsets)
+        self._stamp = self._snapshot_stamp()
+        self._write_index(self._stamp)
+
+    def compact(self):
+        """Write all profiles to the snapshot and empty the journal."""
+        if self.path is None:
+            return
+        with open(self.path, 'rb') as snapshot:
+            if self._snapshot_stamp(snapshot) != self._stamp:
+                raise ValueError("Profiles file was changed by another program, reload it first")
+            chunks = {name: self._profile_json(name, snapshot) for name in self._names}
+        self._write_snapshot(dict.fromkeys(self._names), chunks)
+        # Edits to unreadable profiles stay in the journal until someone repairs them
+        kept = [op for name in self._unreadable for op in self._pending.get(name, ())]
+        self._pending = {name: self._pending[name] for name in self._unreadable if name in self._pending}
+        self._dropped = set()
+        # Replaying the old journal over the new snapshot is harmless, so a
+        # crash before this truncate loses nothing
+        self._journal.close()
+        self._journal = open(self.journal_path, 'w')
+        self._journal.write(''.join(json.dumps(op) + '\n' for op in kept))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self.logger.info("Profiles saved to file successfully")
+
+    def reload(self):
+        """Pick up a snapshot written by another program.
+
+        Returns None when the snapshot is unchanged, otherwise a dict with an
+        entry for each loaded profile that changed: (changed, removed) where
+        changed maps added or edited triggers to their expansion, or None if
+        the profile is gone. Edits still in our journal stay on top.
+        """
+        if self.path is None:
+            return None
+        stamp = self._snapshot_stamp()
+        if stamp == self._stamp:
+            return None
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        # Parse what we need before changing anything, a bad file leaves us as we were
+        try:
+            offsets = scan_profile_offsets(data)
+            fresh = {}
+            for name in self._loaded:
+                span = offsets.get(name)
+                if span is not None:
+                    fresh[name] = json.loads(data[span[0]:span[1]])
+            # The others are checked when they are first read
+        except ValueError:
+            # Not tried again until the file changes once more
+            self._rejected_stamp = stamp
+            raise
+        if self._snapshot_stamp() != stamp:
+            raise ValueError("Profiles file changed while reading it")
+
+        old_loaded = self._loaded
+        self._offsets = offsets
+        self._names = dict.fromkeys(offsets)
+        self._unreadable = {}
+        self._pending = {}
+        self._dropped = set()
+        self._loaded = OrderedDict()
+        self._loaded_shortcuts = 0
+        self._stamp = stamp
+        self._write_index(stamp)
+        self._replay_journal()
+
+        changes = {}
+        for name, old in old_loaded.items():
+            if name not in self._names:
+                changes[name] = None
+                continue
+            shortcuts = fresh.get(name, {})
+            for op in self._pending.get(name, ()):
+                self._apply_to(shortcuts, op)
+            self._loaded[name] = shortcuts
+            self._loaded_shortcuts += len(shortcuts)
+            changed = {trigger: expansion for trigger, expansion in shortcuts.items() if old.get(trigger) != expansion}
+            removed = [trigger for trigger in old if trigger not in shortcuts]
+            if changed or removed:
+                changes[name] = (changed, removed)
+        self._evict(keep=None)
+        self.logger.info(f"Reloaded profiles file, {len(changes)} loaded profiles changed")
+        return changes
+
+    def close(self):
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+
+class ProfileWatcher(threading.Thread):
+    """Polls a ProfileStore's snapshot and reports when another program replaced it."""
+
+    def __init__(self, store, on_change, interval=RELOAD_POLL_INTERVAL):
+        super().__init__(name='shrthnder-profiles', daemon=True)
+        self.store = store
+        self.on_change = on_change
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            # A stat per interval, the file is only read once it changed
+            if self.store.changed_on_disk():
+                self.on_change()
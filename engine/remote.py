@@ -0,0 +1,240 @@
+import logging
+
+
+class RemoteProfiles:
+    """The engine's profiles as the settings window reads them.
+
+    A profile's shortcuts are fetched the first time they are read and kept
+    while the profile is in use. Edits made through RemoteController update
+    the kept copy in place, reloads swap in an updated copy.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._cache = {}
+
+    def __getitem__(self, name):
+        shortcuts = self._cache.get(name)
+        if shortcuts is None:
+            shortcuts = self.client.call('get_profile', name)
+            self._cache[name] = shortcuts
+        return shortcuts
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return self.client.call('get_profiles')
+
+    def retain(self, name):
+        for cached in [cached for cached in self._cache if cached != name]:
+            del self._cache[cached]
+
+    def apply_changes(self, changes):
+        for name, change in changes.items():
+            shortcuts = self._cache.get(name)
+            if shortcuts is None:
+                continue
+            if change is None:
+                del self._cache[name]
+                continue
+            changed, removed = change
+            shortcuts = dict(shortcuts)
+            shortcuts.update(changed)
+            for trigger in removed:
+                shortcuts.pop(trigger, None)
+            self._cache[name] = shortcuts
+
+
+class RemoteStack:
+    def __init__(self, names):
+        self.names = tuple(names)
+
+    @property
+    def top(self):
+        return self.names[-1]
+
+
+class RemoteMetrics:
+    def __init__(self, client):
+        self.client = client
+
+    def summary(self, stage='total'):
+        return self.client.call('metrics_summary', stage) or (0, 0.0, 0.0, 0.0)
+
+    def export(self, path):
+        self.client.call('export_metrics', path)
+
+    def reset(self):
+        self.client.call('reset_metrics')
+
+
+class RemoteUsage:
+    def __init__(self, client):
+        self.client = client
+
+    def flush(self):
+        # The engine flushes before answering stats()
+        pass
+
+    def stats(self):
+        return self.client.call('usage_stats')
+
+
+class RemoteController:
+    """Stands in for KeyboardController in a settings window that runs apart from the engine.
+
+    Commands are forwarded to the engine process through an EngineClient,
+    and the engine's events reach the same listener lists the window uses
+    with a local controller. Listeners are called from the event thread.
+    """
+
+    def __init__(self, client):
+        self.logger = logging.getLogger('shrthnder')
+        self.client = client
+        self.profile_listeners = []
+        self.stack_listeners = []
+        self.suggestion_listeners = []
+        # Called once the engine goes away
+        self.disconnect_listeners = []
+        self.profiles = RemoteProfiles(client)
+        self.usage = RemoteUsage(client)
+        self._refresh_state()
+        client.subscribe(self._on_event)
+
+    def _refresh_state(self):
+        state = self.client.call('state')
+        self.profiles.retain(state['current_profile'])
+        # Fetched here so listeners find the new profile ready
+        self.profiles[state['current_profile']]
+        self.profile_stack = RemoteStack(state['stack'])
+        self.current_profile = state['current_profile']
+        self._input_language = state['input_language']
+        self.metrics = RemoteMetrics(self.client) if state['metrics'] else None
+        self.suggestions_enabled = state['suggestions']
+        self.tab_accepts = state['tab_accepts']
+
+    def _on_event(self, event, payload):
+        try:
+            if event == 'stack_changed':
+                self._refresh_state()
+                listeners = self.stack_listeners
+            elif event == 'profiles_reloaded':
+                self.profiles.apply_changes(payload)
+                self._refresh_state()
+                listeners = self.profile_listeners
+            elif event == 'suggestions_changed':
+                listeners = self.suggestion_listeners
+            elif event == 'disconnected':
+                self.logger.error("Lost the connection to the shrthnder engine")
+                listeners = self.disconnect_listeners
+            else:
+                return
+            for listener in listeners:
+                listener(payload)
+        except Exception as e:
+            self.logger.error(f"Error handling engine event {event}: {e}")
+
+    def close(self):
+        self.client.close()
+
+    @property
+    def shortcuts(self):
+        return self.profiles[self.current_profile]
+
+    @property
+    def shorthand_map(self):
+        return self.shortcuts
+
+    @property
+    def input_language(self):
+        return self._input_language
+
+    @input_language.setter
+    def input_language(self, language):
+        self.set_input_language(language)
+
+    @property
+    def active_window_class(self):
+        return self.client.call('active_window')[0]
+
+    @property
+    def recent_window_classes(self):
+        return self.client.call('active_window')[1]
+
+    def get_profiles(self):
+        return self.profiles.keys()
+
+    def get_profile(self, profile_name=None):
+        return self.profiles[profile_name or self.current_profile]
+
+    def get_stack_shortcuts(self):
+        return self.client.call('stack_shortcuts')
+
+    def get_app_rule(self, window_class):
+        return self.client.call('app_rule_for', window_class)
+
+    def set_input_language(self, language):
+        self.client.call('set_input_language', language)
+        self._input_language = language
+
+    def switch_profile(self, profile_name):
+        return self.client.call('switch_profile', profile_name)
+
+    def set_profile(self, profile_name):
+        return self.client.call('switch_profile', profile_name)
+
+    def set_profile_stack(self, profile_names):
+        return self.client.call('set_profile_stack', list(profile_names))
+
+    def create_profile(self, profile_name):
+        self.client.call('create_profile', profile_name)
+
+    def delete_profile(self, profile_name):
+        self.client.call('delete_profile', profile_name)
+
+    def save_profiles(self):
+        self.client.call('save_profiles')
+
+    def add_shortcut(self, shorthand, expansion):
+        if not self.client.call('add_shortcut', shorthand, expansion):
+            return False
+        self.shortcuts[shorthand] = expansion
+        return True
+
+    def delete_shortcut(self, shorthand):
+        if not self.client.call('delete_shortcut', shorthand):
+            return False
+        self.shortcuts.pop(shorthand, None)
+        return True
+
+    def set_app_rule(self, window_class, profile_names):
+        return self.client.call('set_app_rule', window_class, list(profile_names))
+
+    def remove_app_rule(self, window_class):
+        return self.client.call('remove_app_rule', window_class)
+
+    def set_metrics_enabled(self, enabled):
+        self.client.call('set_metrics_enabled', enabled)
+        self.metrics = RemoteMetrics(self.client) if enabled else None
+
+    def set_suggestions_enabled(self, enabled):
+        self.client.call('set_suggestions_enabled', enabled)
+        self.suggestions_enabled = enabled
+
+    def reset_usage(self):
+        self.client.call('reset_usage')
+
+    def plan_import(self, path, fmt=None):
+        return self.client.call('plan_import', path, fmt)
+
+    def apply_import(self, plan, overwrite=False):
+        shortcuts = self.client.call('apply_import', plan, overwrite)
+        self.shortcuts.update(shortcuts)
+        return shortcuts
+
+    def export_shortcuts(self, path, fmt=None):
+        self.client.call('export_shortcuts', path, fmt)
@@ -0,0 +1,91 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+# Queries shorter than this match trigger prefixes instead of substrings
+MIN_SUBSTRING_QUERY = 3
+
+
+class ShortcutSearchIndex:
+    """Prefix and substring search over (trigger, expansion) rows.
+
+    Short queries match the start of a trigger through a sorted list.
+    Longer queries match anywhere in the trigger or expansion: all rows are
+    kept lowercased in one string, so a search is a handful of str.find calls
+    plus a binary search per hit to map it back to its row. That string is
+    rebuilt lazily on the first search after an update.
+    Rows are addressed by integer ids chosen by the caller.
+    """
+
+    def __init__(self, rows=()):
+        self._texts = {}      # row id -> lowercased "trigger\0expansion"
+        self._prefixes = []   # sorted (lowercased trigger, row id)
+        for row_id, trigger, expansion in rows:
+            self._texts[row_id] = f"{trigger}\0{expansion}".lower()
+            self._prefixes.append((trigger.lower(), row_id))
+        self._prefixes.sort()
+        self._blob = None
+
+    def __len__(self):
+        return len(self._texts)
+
+    @staticmethod
+    def matches(query, trigger, expansion):
+        """Check a single row against a query, with the same rules as search()."""
+        query = query.lower()
+        if len(query) < MIN_SUBSTRING_QUERY:
+            return trigger.lower().startswith(query)
+        return query in f"{trigger}\0{expansion}".lower()
+
+    def add(self, row_id, trigger, expansion):
+        if row_id in self._texts:
+            self.remove(row_id)
+        self._texts[row_id] = f"{trigger}\0{expansion}".lower()
+        insort(self._prefixes, (trigger.lower(), row_id))
+        self._blob = None
+
+    def remove(self, row_id):
+        text = self._texts.pop(row_id, None)
+        if text is None:
+            return
+        entry = (text.split('\0', 1)[0], row_id)
+        pos = bisect_left(self._prefixes, entry)
+        if pos < len(self._prefixes) and self._prefixes[pos] == entry:
+            del self._prefixes[pos]
+        self._blob = None
+
+    def _build_blob(self):
+        self._ids = sorted(self._texts)
+        self._starts = array('q')
+        offset = 0
+        for row_id in self._ids:
+            self._starts.append(offset)
+            offset += len(self._texts[row_id]) + 1
+        self._blob = '\n'.join(self._texts[row_id] for row_id in self._ids)
+
+    def search(self, query):
+        """Return the ids of matching rows, in ascending order."""
+        query = query.lower()
+        if not query:
+            return sorted(self._texts)
+        if len(query) < MIN_SUBSTRING_QUERY:
+            start = bisect_left(self._prefixes, (query,))
+            matches = []
+            for trigger, row_id in self._prefixes[start:]:
+                if not trigger.startswith(query):
+                    break
+                matches.append(row_id)
+            return sorted(matches)
+
+        if self._blob is None:
+            self._build_blob()
+        blob, starts, ids = self._blob, self._starts, self._ids
+        matches = []
+        pos = blob.find(query)
+        while pos != -1:
+            row = bisect_right(starts, pos) - 1
+            matches.append(ids[row])
+            # Continue after this row so each row is reported once
+            if row + 1 >= len(starts):
+                break
+            pos = blob.find(query, starts[row + 1])
+        return matches
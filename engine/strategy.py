@@ -0,0 +1,49 @@
+# Expansions at least this long are always pasted
+DEFAULT_PASTE_THRESHOLD = 200
+
+# Shorter expansions are always typed, pasting them is not worth touching the clipboard
+MIN_PASTE_LENGTH = 20
+
+# Weight of the newest measurement in the running cost averages
+SMOOTHING = 0.2
+
+
+class InjectionStrategy:
+    """Chooses between typing and pasting an expansion.
+
+    Expansions longer than paste_threshold are pasted. Between
+    MIN_PASTE_LENGTH and the threshold, the choice follows the observed cost
+    of each method: the average time per typed character and the average
+    time per paste.
+    """
+
+    TYPE = 'type'
+    PASTE = 'paste'
+
+    def __init__(self, paste_threshold=DEFAULT_PASTE_THRESHOLD, can_paste=True):
+        self.paste_threshold = paste_threshold
+        self.can_paste = can_paste
+        self.type_cost_per_char = None
+        self.paste_cost = None
+
+    def choose(self, length):
+        if not self.can_paste or length < MIN_PASTE_LENGTH:
+            return self.TYPE
+        if self.paste_threshold is not None and length >= self.paste_threshold:
+            return self.PASTE
+        if self.type_cost_per_char is not None and self.paste_cost is not None:
+            if self.type_cost_per_char * length > self.paste_cost:
+                return self.PASTE
+        return self.TYPE
+
+    def record(self, strategy, length, seconds):
+        if strategy == self.PASTE:
+            self.paste_cost = self._smooth(self.paste_cost, seconds)
+        elif length:
+            self.type_cost_per_char = self._smooth(self.type_cost_per_char, seconds / length)
+
+    @staticmethod
+    def _smooth(average, value):
+        if average is None:
+            return value
+        return average + SMOOTHING * (value - average)
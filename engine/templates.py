@@ -0,0 +1,149 @@
+import time
+
+# Placeholder kinds in a compiled template
+DATE = 'date'            # {date} or {date:%d.%m.%Y}, any strftime format
+CLIPBOARD = 'clipboard'  # {clipboard}, the clipboard's text
+CURSOR = 'cursor'        # {cursor}, where the cursor is left after typing
+REF = 'ref'              # {@btw}, the expansion of another shortcut
+
+DEFAULT_DATE_FORMAT = '%Y-%m-%d'
+
+# How deep shortcuts may reference each other, deeper references are typed as written
+MAX_NESTING = 8
+
+
+def compile_template(text):
+    """Compile an expansion with placeholders, None when it has none.
+
+    Expansions without a known placeholder are static and typed exactly as
+    written, braces included. In templates '{{' and '}}' type a brace, and
+    an unknown {name} is typed as it is.
+    """
+    if '{' not in text:
+        return None
+    parts = []
+    literal = []
+    found = False
+    i = 0
+    end = len(text)
+    while i < end:
+        char = text[i]
+        if char in '{}' and text[i + 1:i + 2] == char:
+            literal.append(char)
+            i += 2
+            continue
+        close = text.find('}', i + 1) if char == '{' else -1
+        part = _placeholder(text[i + 1:close], text[i:close + 1]) if close != -1 else None
+        if part is None:
+            literal.append(char)
+            i += 1
+            continue
+        if literal:
+            parts.append(''.join(literal))
+            literal = []
+        parts.append(part)
+        found = True
+        i = close + 1
+    if not found:
+        return None
+    if literal:
+        parts.append(''.join(literal))
+    return Template(parts)
+
+
+def _placeholder(name, raw):
+    if name == CLIPBOARD or name == CURSOR:
+        return (name, None)
+    if name == DATE:
+        return (DATE, DEFAULT_DATE_FORMAT)
+    if name.startswith(DATE + ':') and len(name) > len(DATE) + 1:
+        return (DATE, name[len(DATE) + 1:])
+    if name.startswith('@') and len(name) > 1 and not any(char.isspace() or char == '{' for char in name):
+        # The raw text is typed when the shortcut doesn't exist
+        return (REF, (name[1:].lower(), raw))
+    return None
+
+
+def compile_templates(shortcuts):
+    """Map the lowercased triggers of templated expansions to their compiled templates."""
+    templates = {}
+    for trigger, expansion in shortcuts.items():
+        if '{' in expansion:
+            template = compile_template(expansion)
+            if template is not None:
+                templates[trigger.lower()] = template
+    return templates
+
+
+class _Rendering:
+    __slots__ = ('resolve', 'get_clipboard', 'clipboard', 'now', 'pieces', 'length', 'cursor')
+
+    def __init__(self, resolve, get_clipboard):
+        self.resolve = resolve
+        self.get_clipboard = get_clipboard
+        self.clipboard = None
+        self.now = None
+        self.pieces = []
+        self.length = 0
+        self.cursor = None
+
+    def add(self, text):
+        self.pieces.append(text)
+        self.length += len(text)
+
+
+class Template:
+    """An expansion split into literal text and placeholders, parsed once.
+
+    Rendering only joins the literals with the current date, the
+    clipboard's text and referenced expansions.
+    """
+
+    __slots__ = ('parts',)
+
+    def __init__(self, parts):
+        self.parts = tuple(parts)
+
+    def __repr__(self):
+        return f"Template({self.parts!r})"
+
+    def render(self, resolve, get_clipboard=None):
+        """Return (text, characters after the cursor).
+
+        resolve(trigger) gives a lowercased trigger's Template, its
+        expansion, or None. get_clipboard() is called at most once, and
+        only if the clipboard is used.
+        """
+        rendering = _Rendering(resolve, get_clipboard)
+        self._render(rendering, 0)
+        text = ''.join(rendering.pieces)
+        return text, 0 if rendering.cursor is None else len(text) - rendering.cursor
+
+    def _render(self, rendering, depth):
+        for part in self.parts:
+            if part.__class__ is str:
+                rendering.add(part)
+                continue
+            kind, arg = part
+            if kind == DATE:
+                if rendering.now is None:
+                    rendering.now = time.localtime()
+                rendering.add(time.strftime(arg, rendering.now))
+            elif kind == CLIPBOARD:
+                if rendering.clipboard is None:
+                    get_clipboard = rendering.get_clipboard
+                    rendering.clipboard = (get_clipboard() if get_clipboard is not None else None) or ''
+                rendering.add(rendering.clipboard)
+            elif kind == CURSOR:
+                # The first one wins, nested ones included
+                if rendering.cursor is None:
+                    rendering.cursor = rendering.length
+            else:
+                trigger, raw = arg
+                target = rendering.resolve(trigger) if depth < MAX_NESTING else None
+                if target is None:
+                    rendering.add(raw)
+                elif target.__class__ is Template:
+                    target._render(rendering, depth + 1)
+                else:
+                    rendering.add(target)
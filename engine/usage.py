@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from .profile_store import write_json_atomic
+
+USAGE_FILE = 'shrthnder_usage.json'
+
+# Seconds between folding recorded expansions into the totals and writing them out
+USAGE_FLUSH_INTERVAL = 5.0
+
+# Expansions buffered between flushes, far more than anyone types in an interval
+USAGE_BUFFER_SIZE = 4096
+
+
+class UsageRecorder(threading.Thread):
+    """Counts expansions and the keystrokes they saved, per lowercased trigger.
+
+    record() only appends to a bounded deque, which is atomic and never
+    blocks, so the keyboard listener does no locking or I/O for it. The
+    thread drains the deque every interval, adds the batch to the totals,
+    tells the listeners what was used and writes the file if anything
+    changed.
+    """
+
+    def __init__(self, path=USAGE_FILE, interval=USAGE_FLUSH_INTERVAL):
+        super().__init__(name='shrthnder-usage', daemon=True)
+        self.logger = logging.getLogger('shrthnder')
+        self.path = path
+        self.interval = interval
+        # Trigger -> [uses, keystrokes saved, last used]
+        self.totals = {}
+        # Called with {trigger: uses} for every batch
+        self.listeners = []
+        self._events = deque(maxlen=USAGE_BUFFER_SIZE)
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            shortcuts = json.load(f).get('shortcuts', {})
+        self.totals = {trigger: [entry.get('uses', 0), entry.get('saved', 0), entry.get('last_used')]
+                       for trigger, entry in shortcuts.items()}
+
+    def record(self, trigger, saved):
+        self._events.append((trigger, saved))
+
+    def uses(self):
+        with self._lock:
+            return {trigger: entry[0] for trigger, entry in self.totals.items()}
+
+    def stats(self):
+        """Return {trigger: (uses, keystrokes saved, last used)}."""
+        with self._lock:
+            return {trigger: tuple(entry) for trigger, entry in self.totals.items()}
+
+    def reset(self):
+        """Forget all uses, including those recorded since the last flush."""
+        with self._lock:
+            self._events.clear()
+            self.totals = {}
+            self._save()
+
+    def stop(self):
+        self._stop_event.set()
+        # The last batch is written before the process exits
+        if self.is_alive():
+            self.join(self.interval)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        events = self._events
+        batch = {}
+        now = time.time()
+        with self._lock:
+            while events:
+                trigger, saved = events.popleft()
+                entry = self.totals.get(trigger)
+                if entry is None:
+                    entry = self.totals[trigger] = [0, 0, None]
+                entry[0] += 1
+                entry[1] += saved
+                entry[2] = now
+                batch[trigger] = batch.get(trigger, 0) + 1
+            if not batch:
+                return
+            try:
+                self._save()
+            except OSError as e:
+                self.logger.error(f"Error saving usage statistics: {e}")
+        for listener in self.listeners:
+            try:
+                listener(batch)
+            except Exception as e:
+                self.logger.error(f"Error applying usage statistics: {e}")
+
+    def _save(self):
+        write_json_atomic(self.path, {'shortcuts': {
+            trigger: {'uses': uses, 'saved': saved, 'last_used': last_used}
+            for trigger, (uses, saved, last_used) in self.totals.items()
+        }}, indent=None)
@@ -0,0 +1,722 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QPushButton, QWidget, QTableView, QHeaderView, QLabel, QLineEdit, QHBoxLayout, QComboBox, QCheckBox, QInputDialog, QMessageBox, QFileDialog, QDialog, QApplication
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, QPoint, pyqtSignal
+from PyQt5.QtGui import QCursor
+from engine import ShortcutSearchIndex
+
+class ShortcutTableModel(QAbstractTableModel):
+    """Table model over the active profile's shortcuts.
+
+    Rows are only materialized when the view asks for them, single edits
+    insert, update or remove one row, and the filter is answered by a
+    ShortcutSearchIndex that is built the first time a filter is set.
+    """
+
+    HEADERS = ["Shorthand", "Expansion"]
+
+    def __init__(self, keyboard_controller, parent=None):
+        super().__init__(parent)
+        self.keyboard_controller = keyboard_controller
+        self._shortcuts = {}
+        self._triggers = []   # Row id -> trigger, None once deleted
+        self._row_ids = {}    # Trigger -> row id
+        self._rows = []       # Visible row ids, ascending
+        self._query = ""
+        self._index = None
+
+    def set_shortcuts(self, shortcuts):
+        self.beginResetModel()
+        self._shortcuts = shortcuts
+        self._triggers = list(shortcuts)
+        self._row_ids = {trigger: i for i, trigger in enumerate(self._triggers)}
+        self._index = None
+        self._rows = self._filter_rows()
+        self.endResetModel()
+
+    def set_filter(self, query):
+        self.beginResetModel()
+        self._query = query.strip()
+        self._rows = self._filter_rows()
+        self.endResetModel()
+
+    def _search_index(self):
+        if self._index is None:
+            self._index = ShortcutSearchIndex(
+                (i, trigger, self._shortcuts[trigger]) for i, trigger in enumerate(self._triggers) if trigger is not None
+            )
+        return self._index
+
+    def _filter_rows(self):
+        if not self._query:
+            return [i for i, trigger in enumerate(self._triggers) if trigger is not None]
+        return self._search_index().search(self._query)
+
+    def _position(self, row_id):
+        pos = bisect_left(self._rows, row_id)
+        if pos < len(self._rows) and self._rows[pos] == row_id:
+            return pos
+        return None
+
+    def trigger_at(self, row):
+        return self._triggers[self._rows[row]]
+
+    def shortcut_changed(self, trigger):
+        """Show a shortcut that was added or edited in the profile."""
+        expansion = self._shortcuts.get(trigger, "")
+        row_id = self._row_ids.get(trigger)
+        if row_id is None:
+            row_id = len(self._triggers)
+            self._triggers.append(trigger)
+            self._row_ids[trigger] = row_id
+        if self._index is not None:
+            self._index.add(row_id, trigger, expansion)
+
+        pos = self._position(row_id)
+        visible = not self._query or ShortcutSearchIndex.matches(self._query, trigger, expansion)
+        if pos is not None and visible:
+            self.dataChanged.emit(self.index(pos, 0), self.index(pos, 1))
+        elif pos is not None:
+            self.beginRemoveRows(QModelIndex(), pos, pos)
+            del self._rows[pos]
+            self.endRemoveRows()
+        elif visible:
+            pos = bisect_left(self._rows, row_id)
+            self.beginInsertRows(QModelIndex(), pos, pos)
+            self._rows.insert(pos, row_id)
+            self.endInsertRows()
+
+    def apply_changes(self, shortcuts, changed, removed):
+        """Show the shortcuts that changed when the profiles file was reloaded."""
+        if len(changed) + len(removed) > 1000:
+            self.set_shortcuts(shortcuts)
+            return
+        self._shortcuts = shortcuts
+        for trigger in removed:
+            self.shortcut_removed(trigger)
+        for trigger in changed:
+            self.shortcut_changed(trigger)
+
+    def shortcut_removed(self, trigger):
+        row_id = self._row_ids.pop(trigger, None)
+        if row_id is None:
+            return
+        self._triggers[row_id] = None
+        if self._index is not None:
+            self._index.remove(row_id)
+        pos = self._position(row_id)
+        if pos is not None:
+            self.beginRemoveRows(QModelIndex(), pos, pos)
+            del self._rows[pos]
+            self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        trigger = self.trigger_at(index.row())
+        return trigger if index.column() == 0 else self._shortcuts.get(trigger, "")
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        value = value.strip()
+        if role != Qt.EditRole or not value:
+            return False
+        trigger = self.trigger_at(index.row())
+        if index.column() == 1:
+            if not self.keyboard_controller.add_shortcut(trigger, value):
+                return False
+            self.shortcut_changed(trigger)
+            return True
+
+        # Renaming a shorthand replaces it
+        if value == trigger:
+            return False
+        expansion = self._shortcuts[trigger]
+        if not self.keyboard_controller.add_shortcut(value, expansion):
+            return False
+        self.keyboard_controller.delete_shortcut(trigger)
+        self.shortcut_removed(trigger)
+        self.shortcut_changed(value)
+        return True
+
+# File dialog filters for shortcut packs
+PACK_FILTERS = "CSV files (*.csv);;espanso match files (*.yml *.yaml);;TextExpander snippets (*.textexpander *.plist)"
+
+class UsageTableModel(QAbstractTableModel):
+    """How often each shortcut of the active profiles was used, sortable by any column."""
+
+    HEADERS = ["Shorthand", "Expansion", "Uses", "Keystrokes Saved", "Last Used"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._sort = (2, Qt.DescendingOrder)
+
+    def set_stats(self, shortcuts, stats):
+        self.beginResetModel()
+        # Usage is counted per lowercased shorthand, like matching
+        self._rows = [(trigger, expansion) + stats.get(trigger.lower(), (0, 0, None))
+                      for trigger, expansion in shortcuts.items()]
+        self._sort_rows()
+        self.endResetModel()
+
+    def _sort_rows(self):
+        column, order = self._sort
+        if column == 4:
+            key = lambda row: row[4] or 0
+        elif column in (0, 1):
+            key = lambda row: row[column].lower()
+        else:
+            key = lambda row: row[column]
+        self._rows.sort(key=key, reverse=order == Qt.DescendingOrder)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order)
+        self._sort_rows()
+        self.layoutChanged.emit()
+
+    def totals(self):
+        uses = sum(row[2] for row in self._rows)
+        saved = sum(row[3] for row in self._rows)
+        unused = sum(1 for row in self._rows if not row[2])
+        return uses, saved, unused
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        if role == Qt.TextAlignmentRole and column in (2, 3):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role != Qt.DisplayRole:
+            return None
+        value = self._rows[index.row()][column]
+        if column == 4:
+            return time.strftime('%Y-%m-%d %H:%M', time.localtime(value)) if value else "Never"
+        return value
+
+class UsageDialog(QDialog):
+    def __init__(self, keyboard_controller, parent=None):
+        super().__init__(parent)
+        self.keyboard_controller = keyboard_controller
+        self.setWindowTitle("Usage Statistics")
+        self.resize(700, 500)
+        layout = QVBoxLayout()
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        self.model = UsageTableModel(self)
+        table = QTableView()
+        table.setModel(self.model)
+        table.setSortingEnabled(True)
+        table.sortByColumn(2, Qt.DescendingOrder)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.setColumnWidth(0, 120)
+        table.setColumnWidth(1, 250)
+        layout.addWidget(table)
+        buttons = QHBoxLayout()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        reset_button = QPushButton("Reset Stats")
+        reset_button.clicked.connect(self.reset_stats)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        buttons.addWidget(reset_button)
+        buttons.addStretch(1)
+        buttons.addWidget(refresh_button)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self):
+        usage = self.keyboard_controller.usage
+        # Count what was typed since the last background flush too
+        usage.flush()
+        self.model.set_stats(self.keyboard_controller.get_stack_shortcuts(), usage.stats())
+        uses, saved, unused = self.model.totals()
+        self.summary_label.setText(f"{uses} expansions saved {saved} keystrokes. "
+                                   f"{unused} of {self.model.rowCount()} shortcuts were never used.")
+
+    def reset_stats(self):
+        answer = QMessageBox.question(self, "Reset Stats", "Forget how often every shortcut was used?")
+        if answer == QMessageBox.Yes:
+            self.keyboard_controller.reset_usage()
+            self.refresh()
+
+class SuggestionPopup(QLabel):
+    """Completions for the word being typed, shown next to the mouse pointer.
+
+    It floats over whichever application has focus without taking it, so
+    typing carries on while it is shown.
+    """
+
+    MAX_EXPANSION_LENGTH = 40
+
+    def __init__(self, tab_accepts):
+        super().__init__(None, Qt.ToolTip | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+        # Where the Tab can't be kept from the application, the suggestions are only shown
+        self.first_label = 'Tab' if tab_accepts else '   '
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.setStyleSheet("background-color: white; border: 1px solid #4CAF50; padding: 4px; font-size: 13px;")
+
+    def show_suggestions(self, suggestions):
+        if not suggestions:
+            self.hide()
+            return
+        lines = []
+        for i, (trigger, expansion) in enumerate(suggestions):
+            if len(expansion) > self.MAX_EXPANSION_LENGTH:
+                expansion = expansion[:self.MAX_EXPANSION_LENGTH - 3] + "..."
+            expansion = expansion.replace('\n', ' ')
+            lines.append(f"{self.first_label if i == 0 else '   '}  {trigger} → {expansion}")
+        self.setText('\n'.join(lines))
+        self.adjustSize()
+        self.move(QCursor.pos() + QPoint(16, 16))
+        self.show()
+
+class MainWindow(QMainWindow):
+    # Reloads happen on the watcher thread, the signal brings them to the GUI thread
+    profiles_reloaded = pyqtSignal(object)
+    # Application rules switch profiles from the focus monitor's thread
+    stack_changed = pyqtSignal(object)
+    # Suggestions are computed on the keyboard listener's thread
+    suggestions_changed = pyqtSignal(object)
+    # Only sent when the window is a client of a separate engine process
+    engine_disconnected = pyqtSignal(object)
+
+    def __init__(self, keyboard_controller):
+        super().__init__()
+        self.keyboard_controller = keyboard_controller
+        self.init_ui()
+        self.profiles_reloaded.connect(self.on_profiles_reloaded)
+        keyboard_controller.profile_listeners.append(self.profiles_reloaded.emit)
+        self.stack_changed.connect(self.on_stack_changed)
+        keyboard_controller.stack_listeners.append(self.stack_changed.emit)
+        self.suggestion_popup = SuggestionPopup(keyboard_controller.tab_accepts)
+        self.suggestions_changed.connect(self.suggestion_popup.show_suggestions)
+        keyboard_controller.suggestion_listeners.append(self.suggestions_changed.emit)
+        self.engine_disconnected.connect(self.on_engine_disconnected)
+        getattr(keyboard_controller, 'disconnect_listeners', []).append(self.engine_disconnected.emit)
+
+    def init_ui(self):
+        self.setWindowTitle("Shrthnder - Typing Efficiency Tool")
+        self.setGeometry(100, 100, 800, 600)
+        self.setStyleSheet("""
+            QMainWindow {
+                background-color: #f0f0f0;
+            }
+            QLabel {
+                font-size: 14px;
+                color: #333;
+                margin: 5px;
+            }
+            QPushButton {
+                background-color: #4CAF50;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-size: 14px;
+                margin: 5px;
+            }
+            QPushButton:hover {
+                background-color: #45a049;
+            }
+            QComboBox {
+                padding: 5px;
+                border: 1px solid #ddd;
+                border-radius: 4px;
+                background: white;
+                min-width: 150px;
+            }
+            QLineEdit {
+                padding: 8px;
+                border: 1px solid #ddd;
+                border-radius: 4px;
+                margin: 5px;
+            }
+            QTableView {
+                border: 1px solid #ddd;
+                border-radius: 4px;
+                background: white;
+                gridline-color: #ddd;
+            }
+            QTableView::item {
+                padding: 5px;
+            }
+        """)
+        
+        layout = QVBoxLayout()
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+        
+        # Status label with better styling
+        self.status_label = QLabel("Shrthnder is running...")
+        self.status_label.setStyleSheet("font-weight: bold; color: #4CAF50;")
+        layout.addWidget(self.status_label)
+
+        # Live expansion latency, refreshed once a second while measuring
+        metrics_layout = QHBoxLayout()
+        self.metrics_checkbox = QCheckBox("Measure latency")
+        self.metrics_checkbox.setChecked(self.keyboard_controller.metrics is not None)
+        self.metrics_checkbox.toggled.connect(self.on_metrics_toggled)
+        self.metrics_label = QLabel("")
+        export_metrics_button = QPushButton("Export Metrics")
+        export_metrics_button.clicked.connect(self.export_metrics)
+        reset_metrics_button = QPushButton("Reset Metrics")
+        reset_metrics_button.clicked.connect(self.reset_metrics)
+        metrics_layout.addWidget(self.metrics_checkbox)
+        metrics_layout.addWidget(self.metrics_label, 1)
+        metrics_layout.addWidget(reset_metrics_button)
+        metrics_layout.addWidget(export_metrics_button)
+        layout.addLayout(metrics_layout)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(1000)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start()
+        self.update_metrics()
+        
+        # Profile selector
+        settings_layout = QHBoxLayout()
+        
+        # Profile group
+        profile_group = QVBoxLayout()
+        profile_label = QLabel("Profile:")
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems(self.keyboard_controller.get_profiles())
+        self.profile_combo.setCurrentText(self.keyboard_controller.current_profile)
+        self.profile_combo.currentTextChanged.connect(self.on_profile_changed)
+        profile_group.addWidget(profile_label)
+        profile_group.addWidget(self.profile_combo)
+        settings_layout.addLayout(profile_group)
+        
+        # Language group
+        language_group = QVBoxLayout()
+        language_label = QLabel("Input Language:")
+        self.language_combo = QComboBox()
+        self.language_combo.addItems(["English", "German"])
+        self.language_combo.setCurrentText(self.keyboard_controller.input_language)
+        self.language_combo.currentTextChanged.connect(self.on_language_changed)
+        language_group.addWidget(language_label)
+        language_group.addWidget(self.language_combo)
+        settings_layout.addLayout(language_group)
+        
+        layout.addLayout(settings_layout)
+
+        # Profiles layered on top of each other, and the applications that pick them
+        stack_layout = QHBoxLayout()
+        self.stack_label = QLabel()
+        layer_button = QPushButton("Layer Profile")
+        layer_button.clicked.connect(self.layer_profile)
+        app_rule_button = QPushButton("App Rule")
+        app_rule_button.clicked.connect(self.edit_app_rule)
+        stack_layout.addWidget(self.stack_label, 1)
+        stack_layout.addWidget(layer_button)
+        stack_layout.addWidget(app_rule_button)
+        usage_button = QPushButton("Usage Stats")
+        usage_button.clicked.connect(self.show_usage)
+        stack_layout.addWidget(usage_button)
+        self.update_stack_label()
+        layout.addLayout(stack_layout)
+
+        # Completions for the word being typed, most used first
+        hint = " (Tab accepts)" if self.keyboard_controller.tab_accepts else ""
+        self.suggestions_checkbox = QCheckBox("Suggest shortcuts while typing" + hint)
+        self.suggestions_checkbox.setChecked(self.keyboard_controller.suggestions_enabled)
+        self.suggestions_checkbox.toggled.connect(self.keyboard_controller.set_suggestions_enabled)
+        layout.addWidget(self.suggestions_checkbox)
+        
+        # Add shorthand section
+        shorthand_layout = QVBoxLayout()
+        shorthand_label = QLabel("Add Custom Shorthand:")
+        shorthand_label.setStyleSheet("font-weight: bold; margin-top: 15px;")
+        self.shorthand_input = QLineEdit()
+        self.shorthand_input.setPlaceholderText("Enter shorthand (e.g., btw)")
+        self.expansion_input = QLineEdit()
+        self.expansion_input.setPlaceholderText("Enter expansion (e.g., by the way)")
+        self.expansion_input.setToolTip("Placeholders: {date}, {date:%d.%m.%Y}, {clipboard}, {cursor}, "
+                                        "{@shorthand} for another shortcut's expansion")
+        
+        add_button = QPushButton("Add Shorthand")
+        add_button.clicked.connect(self.add_shorthand)
+        
+        shorthand_layout.addWidget(shorthand_label)
+        shorthand_layout.addWidget(self.shorthand_input)
+        shorthand_layout.addWidget(self.expansion_input)
+        shorthand_layout.addWidget(add_button)
+        layout.addLayout(shorthand_layout)
+        
+        # Table for shorthand rules
+        table_label = QLabel("Available Shortcuts:")
+        table_label.setStyleSheet("font-weight: bold; margin-top: 15px;")
+        layout.addWidget(table_label)
+
+        # Search box, filtering waits until typing pauses
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search shortcuts (shorthand prefix, or any text from 3 characters)")
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        layout.addWidget(self.search_input)
+
+        self.table_model = ShortcutTableModel(self.keyboard_controller, self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 150)
+        self.update_table()
+        layout.addWidget(self.table)
+
+        table_buttons = QHBoxLayout()
+        delete_button = QPushButton("Delete Selected")
+        delete_button.clicked.connect(self.delete_selected)
+        import_button = QPushButton("Import...")
+        import_button.clicked.connect(self.import_shortcuts)
+        export_button = QPushButton("Export...")
+        export_button.clicked.connect(self.export_shortcuts)
+        table_buttons.addWidget(delete_button, 1)
+        table_buttons.addWidget(import_button)
+        table_buttons.addWidget(export_button)
+        layout.addLayout(table_buttons)
+        
+        container = QWidget()
+        container.setLayout(layout)
+        self.setCentralWidget(container)
+
+    def on_profile_changed(self, profile_name):
+        # The table follows through on_stack_changed
+        if self.keyboard_controller.switch_profile(profile_name) or not profile_name:
+            return
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.setCurrentText(self.keyboard_controller.current_profile)
+        self.profile_combo.blockSignals(False)
+        QMessageBox.warning(self, "Switch Profile", f"Could not switch to {profile_name}, see the log for details.")
+
+    def update_profiles(self):
+        # Update profile list in combo box
+        self.profile_combo.clear()
+        profiles = self.keyboard_controller.get_profiles()
+        self.profile_combo.addItems(profiles)
+
+    def on_profiles_reloaded(self, changes):
+        current = self.keyboard_controller.current_profile
+        shown = self.profile_combo.currentText()
+        self.profile_combo.blockSignals(True)
+        self.update_profiles()
+        self.profile_combo.setCurrentText(current)
+        self.profile_combo.blockSignals(False)
+        change = changes.get(current)
+        if shown != current:
+            # The profile we showed is gone and the controller switched to another one
+            self.update_table()
+        elif change is not None:
+            self.table_model.apply_changes(self.keyboard_controller.get_profile(), *change)
+
+    def on_stack_changed(self, profile_names):
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.setCurrentText(self.keyboard_controller.current_profile)
+        self.profile_combo.blockSignals(False)
+        self.update_stack_label()
+        self.update_table()
+
+    def update_stack_label(self):
+        names = self.keyboard_controller.profile_stack.names
+        window_class = self.keyboard_controller.active_window_class
+        rule = " (application rule)" if window_class and self.keyboard_controller.get_app_rule(window_class) == names else ""
+        self.stack_label.setText(f"Active profiles: {' + '.join(names)}{rule}")
+
+    def layer_profile(self):
+        names = list(self.keyboard_controller.profile_stack.names)
+        choices = [name for name in self.keyboard_controller.get_profiles() if name not in names]
+        if not choices:
+            return
+        name, ok = QInputDialog.getItem(self, "Layer Profile", "Profile to add on top (its shortcuts win):",
+                                        choices, 0, False)
+        if ok and not self.keyboard_controller.set_profile_stack(names + [name]):
+            QMessageBox.warning(self, "Layer Profile", f"Could not add {name}, see the log for details.")
+
+    def edit_app_rule(self):
+        # Offer the applications that had focus before this window
+        classes = list(reversed(self.keyboard_controller.recent_window_classes))
+        window_class, ok = QInputDialog.getItem(self, "App Rule", "Window class (wildcards allowed):",
+                                                classes, 0, True)
+        window_class = window_class.strip()
+        if not ok or not window_class:
+            return
+        current = self.keyboard_controller.get_app_rule(window_class) or self.keyboard_controller.profile_stack.names
+        text, ok = QInputDialog.getText(self, "App Rule",
+                                        "Profiles to use, later ones win (leave empty to remove the rule):",
+                                        text=" + ".join(current))
+        if not ok:
+            return
+        names = [name.strip() for name in text.split('+') if name.strip()]
+        profiles = self.keyboard_controller.get_profiles()
+        unknown = [name for name in names if name not in profiles]
+        if unknown:
+            QMessageBox.warning(self, "App Rule", f"Unknown profiles: {', '.join(unknown)}")
+        elif names:
+            self.keyboard_controller.set_app_rule(window_class, names)
+        else:
+            self.keyboard_controller.remove_app_rule(window_class)
+
+    def on_engine_disconnected(self, _):
+        self.metrics_timer.stop()
+        self.suggestion_popup.hide()
+        self.status_label.setText("The shrthnder engine stopped. Start shrthnder again to reconnect.")
+        self.status_label.setStyleSheet("font-weight: bold; color: #c62828;")
+        self.centralWidget().setEnabled(False)
+
+    def show_usage(self):
+        UsageDialog(self.keyboard_controller, self).exec_()
+
+    def on_language_changed(self, new_language):
+        self.keyboard_controller.input_language = new_language
+        logging.info(f"Input language changed to: {new_language}")
+
+    def on_metrics_toggled(self, enabled):
+        self.keyboard_controller.set_metrics_enabled(enabled)
+        self.update_metrics()
+
+    def update_metrics(self):
+        metrics = self.keyboard_controller.metrics
+        if metrics is None:
+            self.metrics_label.setText("Latency measurement is off")
+            return
+        count, p50, p95, p99 = metrics.summary('total')
+        _, key_p50, _, key_p99 = metrics.summary('keystroke')
+        self.metrics_label.setText(
+            f"Expansion: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms ({count})   "
+            f"Keystroke: p50 {key_p50 * 1000:.0f} µs, p99 {key_p99 * 1000:.0f} µs"
+        )
+
+    def reset_metrics(self):
+        metrics = self.keyboard_controller.metrics
+        if metrics is not None:
+            metrics.reset()
+            self.update_metrics()
+
+    def export_metrics(self):
+        metrics = self.keyboard_controller.metrics
+        if metrics is None:
+            QMessageBox.information(self, "Export Metrics", "Turn on latency measurement first.")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "shrthnder_metrics.json", "JSON files (*.json)")
+        if path:
+            try:
+                metrics.export(path)
+            except OSError as e:
+                QMessageBox.warning(self, "Export Metrics", f"Could not write {path}: {e}")
+
+    def update_table(self):
+        # Get shortcuts from current profile
+        shortcuts = self.keyboard_controller.get_profile()
+        self.table_model.set_shortcuts(shortcuts)
+
+    def apply_search(self):
+        self.table_model.set_filter(self.search_input.text())
+
+    def delete_selected(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()}, reverse=True)
+        for trigger in [self.table_model.trigger_at(row) for row in rows]:
+            if self.keyboard_controller.delete_shortcut(trigger):
+                self.table_model.shortcut_removed(trigger)
+
+    def import_shortcuts(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Shortcuts", "", PACK_FILTERS)
+        if not path:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            plan = self.keyboard_controller.plan_import(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Import Shortcuts", f"Could not read {path}: {e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        profile = self.keyboard_controller.current_profile
+        box = QMessageBox(self)
+        box.setWindowTitle("Import Shortcuts")
+        box.setText(f"{os.path.basename(path)}: {plan.summary()}.")
+        details = [f"{trigger}: \"{current}\" would become \"{imported}\""
+                   for trigger, (current, imported) in list(plan.conflicts.items())[:100]]
+        details += [f"{location} ({trigger}): {reason}" for location, trigger, reason in plan.problems]
+        if details:
+            box.setDetailedText('\n'.join(details))
+        if plan.conflicts:
+            box.setInformativeText(f"Replace the {len(plan.conflicts)} shortcuts in {profile} that have a different expansion?")
+            replace_button = box.addButton("Replace", QMessageBox.AcceptRole)
+            keep_button = box.addButton("Keep Mine", QMessageBox.AcceptRole)
+            box.addButton(QMessageBox.Cancel)
+        elif plan.added:
+            box.setInformativeText(f"Add {len(plan.added)} shortcuts to {profile}?")
+            replace_button = None
+            keep_button = box.addButton("Import", QMessageBox.AcceptRole)
+            box.addButton(QMessageBox.Cancel)
+        else:
+            box.setInformativeText("There is nothing new to import.")
+            box.exec_()
+            return
+        box.exec_()
+        if box.clickedButton() not in (replace_button, keep_button):
+            return
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            imported = self.keyboard_controller.apply_import(plan, overwrite=box.clickedButton() is replace_button)
+            # One table update for the whole import
+            self.table_model.apply_changes(self.keyboard_controller.get_profile(), list(imported), [])
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.status_label.setText(f"Imported {len(imported)} shortcuts into {profile}")
+
+    def export_shortcuts(self):
+        profile = self.keyboard_controller.current_profile
+        path, _ = QFileDialog.getSaveFileName(self, "Export Shortcuts", f"{profile}.csv", PACK_FILTERS)
+        if not path:
+            return
+        try:
+            self.keyboard_controller.export_shortcuts(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Export Shortcuts", f"Could not write {path}: {e}")
+
+    def add_shorthand(self):
+        shorthand = self.shorthand_input.text().strip()
+        expansion = self.expansion_input.text().strip()
+        
+        if shorthand and expansion:
+            # Add to current profile
+            if self.keyboard_controller.add_shortcut(shorthand, expansion):
+                self.table_model.shortcut_changed(shorthand)
+            self.shorthand_input.clear()
+            self.expansion_input.clear()
@@ -0,0 +1,52 @@
+import logging
+import threading
+
+from Xlib import X, display, error
+
+
+class XActiveWindowMonitor(threading.Thread):
+    """Reports the WM_CLASS of the focused window whenever focus moves.
+
+    Waits for PropertyNotify on the root window's _NET_ACTIVE_WINDOW on its
+    own X connection, so nothing runs between focus changes.
+    """
+
+    def __init__(self, on_change):
+        super().__init__(name='shrthnder-active-window', daemon=True)
+        self.logger = logging.getLogger('shrthnder')
+        self.on_change = on_change
+        self.current = None
+        self._stopped = False
+
+    def stop(self):
+        # Seen on the next event, the thread is a daemon so it never holds up exit
+        self._stopped = True
+
+    def run(self):
+        conn = display.Display()
+        root = conn.screen().root
+        active_window = conn.intern_atom('_NET_ACTIVE_WINDOW')
+        root.change_attributes(event_mask=X.PropertyChangeMask)
+        self._report(conn, root, active_window)
+        while not self._stopped:
+            event = conn.next_event()
+            if event.type == X.PropertyNotify and event.atom == active_window:
+                self._report(conn, root, active_window)
+        conn.close()
+
+    def _report(self, conn, root, active_window):
+        window_class = None
+        try:
+            prop = root.get_full_property(active_window, X.AnyPropertyType)
+            if prop and prop.value and prop.value[0]:
+                wm_class = conn.create_resource_object('window', prop.value[0]).get_wm_class()
+                window_class = wm_class[1] if wm_class else None
+        except error.XError:
+            # The window closed before we could ask about it
+            pass
+        if window_class != self.current:
+            self.current = window_class
+            try:
+                self.on_change(window_class)
+            except Exception as e:
+                self.logger.error(f"Error handling focus change: {e}")
@@ -0,0 +1,32 @@
+import shutil
+import subprocess
+
+# Clipboard tools we know how to drive, in order of preference
+CLIPBOARD_COMMANDS = {
+    'xclip': (['xclip', '-selection', 'clipboard', '-o'], ['xclip', '-selection', 'clipboard', '-i']),
+    'xsel': (['xsel', '--clipboard', '--output'], ['xsel', '--clipboard', '--input']),
+}
+
+
+def _commands():
+    for tool, commands in CLIPBOARD_COMMANDS.items():
+        if shutil.which(tool):
+            return commands
+    raise RuntimeError("Clipboard access needs xclip or xsel")
+
+
+def get_clipboard():
+    read_cmd, _ = _commands()
+    result = subprocess.run(read_cmd, capture_output=True, timeout=1)
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode('utf-8', errors='replace')
+
+
+def set_clipboard(text):
+    _, write_cmd = _commands()
+    subprocess.run(write_cmd, input=text.encode('utf-8'), timeout=1)
+
+
+def is_available():
+    return any(shutil.which(tool) for tool in CLIPBOARD_COMMANDS)
@@ -1,15 +1,51 @@
 import subprocess
 import time
+from . import clipboard
+
+# Time the target application gets to read the clipboard before we restore it
+PASTE_RESTORE_DELAY = 0.1
 
 class LinuxTextInput:
+    # Seconds between keys so the application registers each one, adjusted per application
+    key_delay = 0.01
+
     @staticmethod
     def delete_chars(count):
         # Use xdotool to simulate backspace key presses
         for _ in range(count):
             subprocess.run(['xdotool', 'key', 'BackSpace'])
-            time.sleep(0.01)  # Small delay to ensure proper key registration
+            if LinuxTextInput.key_delay:
+                time.sleep(LinuxTextInput.key_delay)
         
     @staticmethod
     def insert_text(text):
-        # Use xdotool to type the text
-        subprocess.run(['xdotool', 'type', text]) 
\ No newline at end of file
+        # Use xdotool to type the text, it takes the delay in milliseconds
+        subprocess.run(['xdotool', 'type', '--delay', str(round(LinuxTextInput.key_delay * 1000)), text])
+
+    @staticmethod
+    def replace_text(count, text):
+        LinuxTextInput.delete_chars(count)
+        LinuxTextInput.insert_text(text) 
+
+    @staticmethod
+    def move_left(count):
+        # One xdotool run for all the presses
+        subprocess.run(['xdotool', 'key', '--repeat', str(count), 'Left'])
+
+    @staticmethod
+    def get_clipboard():
+        return clipboard.get_clipboard()
+
+    @staticmethod
+    def can_paste():
+        return clipboard.is_available()
+
+    @staticmethod
+    def paste_text(count, text):
+        previous = clipboard.get_clipboard()
+        clipboard.set_clipboard(text)
+        LinuxTextInput.delete_chars(count)
+        subprocess.run(['xdotool', 'key', 'ctrl+v'])
+        time.sleep(PASTE_RESTORE_DELAY)
+        if previous is not None:
+            clipboard.set_clipboard(previous)
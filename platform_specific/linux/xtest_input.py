@@ -0,0 +1,212 @@
+import threading
+import time
+
+from Xlib import X, XK, display
+from Xlib.ext import xtest
+from . import clipboard
+
+# Keysyms for the control characters we type ourselves
+SPECIAL_KEYSYMS = {
+    '\n': XK.XK_Return,
+    '\t': XK.XK_Tab,
+}
+
+# Time the target application gets to read the clipboard before we restore it
+PASTE_RESTORE_DELAY = 0.1
+
+
+class XTestTextInput:
+    """Injects keystrokes through one persistent X connection using XTEST.
+
+    All events for a replacement are queued on the connection and flushed
+    with a single round trip, instead of spawning xdotool for every key.
+    Characters are looked up in the keymap of the active layout group, and
+    the lookups are redone after a MappingNotify or a group switch.
+    """
+
+    _display = None
+    _lock = threading.Lock()
+    # Seconds between keys, 0 sends them all in one batch. Adjusted per application
+    key_delay = 0.0
+    # Character -> (keycode, shift) in the active group, emptied when the keymap or group changes
+    _keycodes = {}
+    _group = 0
+    _scratch_keycode = None
+
+    @classmethod
+    def is_available(cls):
+        try:
+            cls._connection()
+            return True
+        except Exception:
+            return False
+
+    @classmethod
+    def _connection(cls):
+        if cls._display is None:
+            conn = display.Display()
+            if not conn.has_extension('XTEST'):
+                conn.close()
+                raise RuntimeError("X server does not support the XTEST extension")
+            cls._display = conn
+            cls._load_keymap(conn)
+        else:
+            cls._check_keymap(cls._display)
+        return cls._display
+
+    @classmethod
+    def _load_keymap(cls, conn):
+        cls._keycodes = {}
+        cls._group = cls._active_group(conn)
+        cls._backspace = conn.keysym_to_keycode(XK.XK_BackSpace)
+        cls._left = conn.keysym_to_keycode(XK.XK_Left)
+        cls._shift = conn.keysym_to_keycode(XK.XK_Shift_L)
+        cls._control = conn.keysym_to_keycode(XK.XK_Control_L)
+        cls._paste_key = conn.keysym_to_keycode(XK.XK_v)
+        cls._scratch_keycode = cls._find_scratch_keycode(conn)
+
+    @classmethod
+    def _check_keymap(cls, conn):
+        # The server tells every client about keymap changes, e.g. from setxkbmap.
+        # Our own remapping of the scratch keycode needs no new lookups
+        remapped = False
+        while conn.pending_events():
+            event = conn.next_event()
+            if event.type == X.MappingNotify:
+                conn.refresh_keyboard_mapping(event)
+                if event.request == X.MappingKeyboard and (event.count, event.first_keycode) != (1, cls._scratch_keycode):
+                    remapped = True
+        if remapped:
+            cls._load_keymap(conn)
+        else:
+            # Switching between a layout's groups doesn't change the keymap
+            group = cls._active_group(conn)
+            if group != cls._group:
+                cls._keycodes = {}
+                cls._group = group
+
+    @staticmethod
+    def _active_group(conn):
+        # XKB servers report the active group in bits 13-14 of the core state
+        return (conn.screen().root.query_pointer().mask >> 13) & 3
+
+    @staticmethod
+    def _find_scratch_keycode(conn):
+        # A keycode without any keysyms can be remapped to type unmapped characters
+        first = conn.display.info.min_keycode
+        count = conn.display.info.max_keycode - first + 1
+        mapping = conn.get_keyboard_mapping(first, count)
+        for offset in range(count - 1, -1, -1):
+            if not any(mapping[offset]):
+                return first + offset
+        return None
+
+    @staticmethod
+    def _keysym(char):
+        if char in SPECIAL_KEYSYMS:
+            return SPECIAL_KEYSYMS[char]
+        code = ord(char)
+        # Latin-1 keysyms match their code points, everything else uses the Unicode range
+        if 0x20 <= code <= 0x7e or 0xa0 <= code <= 0xff:
+            return code
+        return 0x01000000 | code
+
+    @classmethod
+    def _lookup(cls, conn, char):
+        cached = cls._keycodes.get(char)
+        if cached is not None:
+            return cached
+        keysym = cls._keysym(char)
+        # The core keymap lists the first two groups as (group 1, shifted, group 2,
+        # shifted). Keys with fewer groups type their first group in any group
+        base = 2 * cls._group if cls._group < 2 else 0
+        result = (0, False)
+        for keycode, index in conn.keysym_to_keycodes(keysym):
+            if keycode == cls._scratch_keycode:
+                continue
+            if index in (base, base + 1):
+                result = (keycode, index == base + 1)
+                break
+            if index in (0, 1) and not conn.keycode_to_keysym(keycode, base) and not result[0]:
+                result = (keycode, index == 1)
+        cls._keycodes[char] = result
+        return result
+
+    @classmethod
+    def _tap(cls, conn, keycode, shift=False):
+        if shift:
+            xtest.fake_input(conn, X.KeyPress, cls._shift)
+        xtest.fake_input(conn, X.KeyPress, keycode)
+        xtest.fake_input(conn, X.KeyRelease, keycode)
+        if shift:
+            xtest.fake_input(conn, X.KeyRelease, cls._shift)
+        if cls.key_delay:
+            conn.sync()
+            time.sleep(cls.key_delay)
+
+    @classmethod
+    def _tap_unmapped(cls, conn, char):
+        if cls._scratch_keycode is None:
+            return
+        keysym = cls._keysym(char)
+        conn.change_keyboard_mapping(cls._scratch_keycode, [(keysym, keysym)])
+        conn.sync()
+        time.sleep(0.01)  # Give clients time to see the new mapping
+        cls._tap(conn, cls._scratch_keycode)
+        conn.sync()
+        time.sleep(0.01)  # Let the key be delivered before the mapping changes again
+
+    @classmethod
+    def replace_text(cls, count, text):
+        with cls._lock:
+            conn = cls._connection()
+            for _ in range(count):
+                cls._tap(conn, cls._backspace)
+            for char in text:
+                keycode, shift = cls._lookup(conn, char)
+                if keycode:
+                    cls._tap(conn, keycode, shift)
+                else:
+                    cls._tap_unmapped(conn, char)
+            # One round trip for the whole batch
+            conn.sync()
+
+    @classmethod
+    def delete_chars(cls, count):
+        cls.replace_text(count, '')
+
+    @classmethod
+    def insert_text(cls, text):
+        cls.replace_text(0, text)
+
+    @classmethod
+    def move_left(cls, count):
+        with cls._lock:
+            conn = cls._connection()
+            for _ in range(count):
+                cls._tap(conn, cls._left)
+            conn.sync()
+
+    @classmethod
+    def get_clipboard(cls):
+        return clipboard.get_clipboard()
+
+    @classmethod
+    def can_paste(cls):
+        return clipboard.is_available()
+
+    @classmethod
+    def paste_text(cls, count, text):
+        previous = clipboard.get_clipboard()
+        clipboard.set_clipboard(text)
+        with cls._lock:
+            conn = cls._connection()
+            for _ in range(count):
+                cls._tap(conn, cls._backspace)
+            xtest.fake_input(conn, X.KeyPress, cls._control)
+            cls._tap(conn, cls._paste_key)
+            xtest.fake_input(conn, X.KeyRelease, cls._control)
+            conn.sync()
+        time.sleep(PASTE_RESTORE_DELAY)
+        if previous is not None:
+            clipboard.set_clipboard(previous)
@@ -0,0 +1,40 @@
+import logging
+import threading
+
+from AppKit import NSWorkspace
+
+# Seconds between checks of the frontmost application
+POLL_INTERVAL = 0.5
+
+
+class MacActiveWindowMonitor(threading.Thread):
+    """Reports the bundle identifier of the frontmost application when it changes.
+
+    Workspace notifications need a Cocoa run loop that the headless mode
+    doesn't have, so this checks twice a second on its own thread instead.
+    Key handling never waits on it.
+    """
+
+    def __init__(self, on_change):
+        super().__init__(name='shrthnder-active-window', daemon=True)
+        self.logger = logging.getLogger('shrthnder')
+        self.on_change = on_change
+        self.current = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        workspace = NSWorkspace.sharedWorkspace()
+        while True:
+            app = workspace.frontmostApplication()
+            window_class = app.bundleIdentifier() if app is not None else None
+            if window_class != self.current:
+                self.current = window_class
+                try:
+                    self.on_change(window_class)
+                except Exception as e:
+                    self.logger.error(f"Error handling focus change: {e}")
+            if self._stop_event.wait(POLL_INTERVAL):
+                break
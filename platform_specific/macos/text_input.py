@@ -1,14 +1,27 @@
 from Foundation import NSString
-from AppKit import NSApplication, NSEvent, NSKeyUp
+from AppKit import NSApplication, NSEvent, NSKeyUp, NSPasteboard, NSPasteboardTypeString
 import Quartz
+import time
+
+# Virtual key codes for the V and left arrow keys
+KEY_V = 0x09
+KEY_LEFT = 0x7B
+
+# Time the target application gets to read the clipboard before we restore it
+PASTE_RESTORE_DELAY = 0.1
 
 class MacTextInput:
+    # Seconds between keys, adjusted per application for those that drop keys
+    key_delay = 0.0
+
     @staticmethod
     def delete_chars(count):
         for _ in range(count):
             event = Quartz.CGEventCreateKeyboardEvent(None, 0x33, True)
             Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
             Quartz.CGEventPost(Quartz.kCGHIDEventTap, Quartz.CGEventCreateKeyboardEvent(None, 0x33, False))
+            if MacTextInput.key_delay:
+                time.sleep(MacTextInput.key_delay)
         
     @staticmethod
     def insert_text(text):
@@ -18,4 +31,47 @@ class MacTextInput:
             event = Quartz.CGEventCreateKeyboardEvent(None, 0, True)
             Quartz.CGEventKeyboardSetUnicodeString(event, len(char), chr(ord(char)))
             Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
-            Quartz.CGEventPost(Quartz.kCGHIDEventTap, Quartz.CGEventCreateKeyboardEvent(None, 0, False)) 
\ No newline at end of file
+            Quartz.CGEventPost(Quartz.kCGHIDEventTap, Quartz.CGEventCreateKeyboardEvent(None, 0, False))
+            if MacTextInput.key_delay:
+                time.sleep(MacTextInput.key_delay)
+
+    @staticmethod
+    def move_left(count):
+        for _ in range(count):
+            Quartz.CGEventPost(Quartz.kCGHIDEventTap, Quartz.CGEventCreateKeyboardEvent(None, KEY_LEFT, True))
+            Quartz.CGEventPost(Quartz.kCGHIDEventTap, Quartz.CGEventCreateKeyboardEvent(None, KEY_LEFT, False))
+
+    @staticmethod
+    def replace_text(count, text):
+        MacTextInput.delete_chars(count)
+        MacTextInput.insert_text(text) 
+
+    @staticmethod
+    def can_paste():
+        return True
+
+    @staticmethod
+    def get_clipboard():
+        return NSPasteboard.generalPasteboard().stringForType_(NSPasteboardTypeString)
+
+    @staticmethod
+    def set_clipboard(text):
+        pasteboard = NSPasteboard.generalPasteboard()
+        pasteboard.clearContents()
+        pasteboard.setString_forType_(text, NSPasteboardTypeString)
+
+    @staticmethod
+    def paste_text(count, text):
+        previous = MacTextInput.get_clipboard()
+        MacTextInput.set_clipboard(text)
+        MacTextInput.delete_chars(count)
+
+        # Cmd+V
+        for key_down in (True, False):
+            event = Quartz.CGEventCreateKeyboardEvent(None, KEY_V, key_down)
+            Quartz.CGEventSetFlags(event, Quartz.kCGEventFlagMaskCommand)
+            Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
+
+        time.sleep(PASTE_RESTORE_DELAY)
+        if previous is not None:
+            MacTextInput.set_clipboard(previous)
@@ -13,7 +13,30 @@ class TextInputFactory:
             from .windows.text_input import WindowsTextInput
             return WindowsTextInput
         elif system == 'linux':
+            # Prefer a persistent XTEST connection, fall back to xdotool
+            try:
+                from .linux.xtest_input import XTestTextInput
+                if XTestTextInput.is_available():
+                    return XTestTextInput
+            except ImportError:
+                pass
             from .linux.text_input import LinuxTextInput
             return LinuxTextInput
         else:
-            raise NotImplementedError(f"Platform {system} is not supported") 
\ No newline at end of file
+            raise NotImplementedError(f"Platform {system} is not supported") 
+
+    @staticmethod
+    def get_active_window_monitor(on_change):
+        """Return a thread calling on_change with the focused application's window class, or None."""
+        system = platform.system().lower()
+
+        if system == 'darwin':
+            from .macos.active_window import MacActiveWindowMonitor
+            return MacActiveWindowMonitor(on_change)
+        elif system == 'windows':
+            from .windows.active_window import WindowsActiveWindowMonitor
+            return WindowsActiveWindowMonitor(on_change)
+        elif system == 'linux':
+            from .linux.active_window import XActiveWindowMonitor
+            return XActiveWindowMonitor(on_change)
+        return None
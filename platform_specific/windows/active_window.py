@@ -0,0 +1,57 @@
+import ctypes
+import logging
+import threading
+from ctypes import wintypes
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+WINEVENT_OUTOFCONTEXT = 0x0000
+WM_QUIT = 0x0012
+
+WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                  wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+
+class WindowsActiveWindowMonitor(threading.Thread):
+    """Reports the class name of the foreground window whenever it changes.
+
+    Uses a WinEventHook for EVENT_SYSTEM_FOREGROUND, delivered to this
+    thread's message loop, so nothing runs between focus changes.
+    """
+
+    def __init__(self, on_change):
+        super().__init__(name='shrthnder-active-window', daemon=True)
+        self.logger = logging.getLogger('shrthnder')
+        self.on_change = on_change
+        self.current = None
+        self._thread_id = None
+
+    def stop(self):
+        if self._thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+
+    def run(self):
+        user32 = ctypes.windll.user32
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        # Keep a reference, the hook calls through it for as long as it exists
+        callback = WinEventProc(lambda hook, event, hwnd, *_: self._report(hwnd))
+        hook = user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND, 0, callback, 0, 0,
+                                      WINEVENT_OUTOFCONTEXT)
+        self._report(user32.GetForegroundWindow())
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        user32.UnhookWinEvent(hook)
+
+    def _report(self, hwnd):
+        window_class = None
+        if hwnd:
+            buffer = ctypes.create_unicode_buffer(256)
+            if ctypes.windll.user32.GetClassNameW(hwnd, buffer, len(buffer)):
+                window_class = buffer.value
+        if window_class != self.current:
+            self.current = window_class
+            try:
+                self.on_change(window_class)
+            except Exception as e:
+                self.logger.error(f"Error handling focus change: {e}")
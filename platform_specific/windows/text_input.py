@@ -1,15 +1,29 @@
 import win32api
+import win32clipboard
 import win32con
 import time
 
+# Low-level hook flags for key releases and extended keys
+LLKHF_EXTENDED = 0x01
+LLKHF_UP = 0x80
+
+# Time the target application gets to read the clipboard before we restore it
+PASTE_RESTORE_DELAY = 0.1
+
 class WindowsTextInput:
+    # Stored in dwExtraInfo so the listener can recognize our own events
+    EVENT_TAG = 0x5348524E
+
+    # Seconds between keys so the application registers each one
+    key_delay = 0.01
+
     @staticmethod
     def delete_chars(count):
         for _ in range(count):
             # Simulate backspace key press
-            win32api.keybd_event(win32con.VK_BACK, 0, 0, 0)  # Press
-            win32api.keybd_event(win32con.VK_BACK, 0, win32con.KEYEVENTF_KEYUP, 0)  # Release
-            time.sleep(0.01)  # Small delay to ensure proper key registration
+            win32api.keybd_event(win32con.VK_BACK, 0, 0, WindowsTextInput.EVENT_TAG)  # Press
+            win32api.keybd_event(win32con.VK_BACK, 0, win32con.KEYEVENTF_KEYUP, WindowsTextInput.EVENT_TAG)  # Release
+            time.sleep(WindowsTextInput.key_delay)
         
     @staticmethod
     def insert_text(text):
@@ -25,14 +39,79 @@ class WindowsTextInput:
 
             # Press shift if needed
             if shift_state & 1:
-                win32api.keybd_event(win32con.VK_SHIFT, 0, 0, 0)
+                win32api.keybd_event(win32con.VK_SHIFT, 0, 0, WindowsTextInput.EVENT_TAG)
 
             # Press and release the key
-            win32api.keybd_event(vk_code, 0, 0, 0)
-            win32api.keybd_event(vk_code, 0, win32con.KEYEVENTF_KEYUP, 0)
+            win32api.keybd_event(vk_code, 0, 0, WindowsTextInput.EVENT_TAG)
+            win32api.keybd_event(vk_code, 0, win32con.KEYEVENTF_KEYUP, WindowsTextInput.EVENT_TAG)
 
             # Release shift if it was pressed
             if shift_state & 1:
-                win32api.keybd_event(win32con.VK_SHIFT, 0, win32con.KEYEVENTF_KEYUP, 0)
+                win32api.keybd_event(win32con.VK_SHIFT, 0, win32con.KEYEVENTF_KEYUP, WindowsTextInput.EVENT_TAG)
+
+            time.sleep(WindowsTextInput.key_delay) 
 
-            time.sleep(0.01)  # Small delay to ensure proper key registration 
\ No newline at end of file
+    @staticmethod
+    def move_left(count):
+        # Arrow keys are extended keys
+        for _ in range(count):
+            win32api.keybd_event(win32con.VK_LEFT, 0, win32con.KEYEVENTF_EXTENDEDKEY, WindowsTextInput.EVENT_TAG)
+            win32api.keybd_event(win32con.VK_LEFT, 0, win32con.KEYEVENTF_EXTENDEDKEY | win32con.KEYEVENTF_KEYUP,
+                                 WindowsTextInput.EVENT_TAG)
+            time.sleep(WindowsTextInput.key_delay)
+
+    @staticmethod
+    def replace_text(count, text):
+        WindowsTextInput.delete_chars(count)
+        WindowsTextInput.insert_text(text)
+
+    @staticmethod
+    def can_paste():
+        return True
+
+    @staticmethod
+    def get_clipboard():
+        win32clipboard.OpenClipboard()
+        try:
+            if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
+                return win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
+            return None
+        finally:
+            win32clipboard.CloseClipboard()
+
+    @staticmethod
+    def set_clipboard(text):
+        win32clipboard.OpenClipboard()
+        try:
+            win32clipboard.EmptyClipboard()
+            win32clipboard.SetClipboardText(text, win32con.CF_UNICODETEXT)
+        finally:
+            win32clipboard.CloseClipboard()
+
+    @staticmethod
+    def paste_text(count, text):
+        previous = WindowsTextInput.get_clipboard()
+        WindowsTextInput.set_clipboard(text)
+        WindowsTextInput.delete_chars(count)
+
+        # Ctrl+V
+        win32api.keybd_event(win32con.VK_CONTROL, 0, 0, WindowsTextInput.EVENT_TAG)
+        win32api.keybd_event(ord('V'), 0, 0, WindowsTextInput.EVENT_TAG)
+        win32api.keybd_event(ord('V'), 0, win32con.KEYEVENTF_KEYUP, WindowsTextInput.EVENT_TAG)
+        win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, WindowsTextInput.EVENT_TAG)
+
+        time.sleep(PASTE_RESTORE_DELAY)
+        if previous is not None:
+            WindowsTextInput.set_clipboard(previous)
+
+    @staticmethod
+    def replay_events(events):
+        # Re-post keys that were held back during an injection, untagged so
+        # the listener treats them as the user's own typing
+        for vk_code, scan_code, flags in events:
+            event_flags = 0
+            if flags & LLKHF_UP:
+                event_flags |= win32con.KEYEVENTF_KEYUP
+            if flags & LLKHF_EXTENDED:
+                event_flags |= win32con.KEYEVENTF_EXTENDEDKEY
+            win32api.keybd_event(vk_code, scan_code, event_flags, 0)
\ No newline at end of file
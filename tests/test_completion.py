@@ -0,0 +1,72 @@
+import random
+
+from engine.completion import CompletionIndex, SCAN_LIMIT
+
+
+def expected(shortcuts, scores, prefix, k=5):
+    # What the index should return, by brute force
+    prefix = prefix.lower()
+    found = [trigger for trigger, expansion in shortcuts.items()
+             if trigger.lower().startswith(prefix) or expansion.lower().startswith(prefix)]
+    return sorted(found, key=lambda trigger: (-scores.get(trigger.lower(), 0), trigger))[:k]
+
+
+def test_ranked_by_use_then_alphabetically():
+    shortcuts = {'btw': 'by the way', 'bta': 'b a', 'btb': 'b b'}
+    index = CompletionIndex(shortcuts, {'btb': 3})
+    assert index.suggest('bt') == ['btb', 'bta', 'btw']
+
+
+def test_matches_expansion_start_case_insensitively():
+    index = CompletionIndex({'addr': 'Main Street 1', 'sig': 'Regards'})
+    assert index.suggest('MAIN') == ['addr']
+    assert index.suggest('Re') == ['sig']
+
+
+def test_short_prefix_gets_nothing():
+    index = CompletionIndex({'btw': 'by the way'})
+    assert index.suggest('b') == []
+    assert index.suggest('xy') == []
+
+
+def test_add_and_remove():
+    index = CompletionIndex({'btw': 'by the way'})
+    index.add('bts', 'behind the scenes')
+    assert index.suggest('bt') == ['bts', 'btw']
+    # Replacing the expansion drops the old key
+    index.add('bts', 'x')
+    assert index.suggest('be') == []
+    index.remove('btw')
+    assert index.suggest('bt') == ['bts']
+    assert len(index) == 1
+
+
+def test_rerank_moves_trigger_up():
+    scores = {}
+    index = CompletionIndex({'bta': 'a', 'btb': 'b'}, scores)
+    scores['btb'] = 1
+    index.rerank('BTB')
+    assert index.suggest('bt') == ['btb', 'bta']
+
+
+def test_large_ranges_match_brute_force():
+    rng = random.Random(1)
+    shortcuts = {f"ab{i:04d}": f"expansion {i}" for i in range(SCAN_LIMIT * 4)}
+    scores = {trigger: rng.randrange(10) for trigger in shortcuts}
+    index = CompletionIndex(shortcuts, scores)
+    for prefix in ('ab', 'ab0', 'ab01', 'ex', 'expansion 1'):
+        assert index.suggest(prefix) == expected(shortcuts, scores, prefix)
+
+    for i in range(50):
+        trigger = f"ab{rng.randrange(SCAN_LIMIT * 8):04d}"
+        if trigger in shortcuts and rng.random() < 0.5:
+            del shortcuts[trigger]
+            index.remove(trigger)
+        else:
+            shortcuts[trigger] = f"added {i}"
+            index.add(trigger, shortcuts[trigger])
+        bumped = rng.choice(sorted(shortcuts))
+        scores[bumped] = scores.get(bumped, 0) + 5
+        index.rerank(bumped)
+        for prefix in ('ab', 'ab0', 'ab02', 'ad', 'ex'):
+            assert index.suggest(prefix) == expected(shortcuts, scores, prefix)
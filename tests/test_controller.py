@@ -0,0 +1,99 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from engine.controller import KeyboardController
+
+
+class EchoingTextInput:
+    """Backend stub whose keys come back through the listener, as on X11."""
+
+    def __init__(self):
+        self.controller = None
+        self.calls = []
+
+    def _echo(self, keys):
+        for key in keys:
+            self.controller.on_press(key)
+
+    def replace_text(self, count, text):
+        self.calls.append(('type', count, text))
+        self._echo([SimpleNamespace(name='backspace')] * count + [SimpleNamespace(char=char) for char in text])
+
+    def paste_text(self, count, text):
+        self.calls.append(('paste', count, text))
+        # The Ctrl press has no code, the V comes back as a plain 'v'
+        self._echo([SimpleNamespace(name='backspace')] * count + [SimpleNamespace(name='ctrl'), SimpleNamespace(char='v')])
+
+    def move_left(self, count):
+        self._echo([SimpleNamespace(name='left')] * count)
+
+    def can_paste(self):
+        return True
+
+
+def type_keys(controller, text):
+    for char in text:
+        controller.on_press(SimpleNamespace(char=char))
+
+
+def wait_idle(controller):
+    # Waits for the consumer to drain, then for the jobs it submitted
+    for _ in range(2):
+        done = threading.Event()
+        while len(controller.key_events):
+            controller.key_events.wait(0.01)
+        controller.injector.submit(done.set)
+        assert done.wait(timeout=2)
+
+
+@pytest.fixture
+def make_controller(tmp_path):
+    controllers = []
+
+    def make(shortcuts, **kwargs):
+        profiles_file = tmp_path / 'profiles.json'
+        profiles_file.write_text(json.dumps({'Default': shortcuts}))
+        text_input = EchoingTextInput()
+        controller = KeyboardController(profiles_file=str(profiles_file), text_input=text_input,
+                                        app_rules_file=str(tmp_path / 'rules.json'),
+                                        usage_file=str(tmp_path / 'usage.json'),
+                                        pacing_file=str(tmp_path / 'pacing.json'), **kwargs)
+        text_input.controller = controller
+        controllers.append(controller)
+        return controller, text_input
+
+    yield make
+    for controller in controllers:
+        controller.injector.stop()
+
+
+def test_expansion_is_typed(make_controller):
+    controller, text_input = make_controller({'btw': 'by the way'})
+    type_keys(controller, 'btw ')
+    wait_idle(controller)
+    assert text_input.calls == [('type', 3, 'y the way ')]
+
+
+def test_trigger_right_after_a_paste(make_controller):
+    controller, text_input = make_controller({'lng': 'a long expansion that is pasted', 'btw': 'by the way'},
+                                             paste_threshold=20)
+    type_keys(controller, 'lng ')
+    wait_idle(controller)
+    assert text_input.calls == [('paste', 4, 'a long expansion that is pasted ')]
+    # The paste's 'v' was ours, not the start of a word
+    assert controller.current_word == ''
+    type_keys(controller, 'btw ')
+    wait_idle(controller)
+    assert text_input.calls[1] == ('type', 3, 'y the way ')
+
+
+def test_readers_for_remote_clients(make_controller):
+    controller, _ = make_controller({'btw': 'by the way'})
+    shortcuts = controller.get_profile_shortcuts('Default')
+    shortcuts['omw'] = 'on my way'
+    # A copy, the profile itself is unchanged
+    assert controller.get_profile() == {'btw': 'by the way'}
+    assert controller.get_active_stack() == (('Default',), 'Default')
@@ -0,0 +1,64 @@
+from engine.edit_plan import match_case, plan_edit
+
+
+def test_match_case_lowercase_leaves_expansion():
+    assert match_case('btw', 'by the way') == 'by the way'
+    assert match_case('btw', 'By The Way') == 'By The Way'
+
+
+def test_match_case_capitalized():
+    assert match_case('Btw', 'by the way') == 'By the way'
+
+
+def test_match_case_all_caps():
+    assert match_case('BTW', 'by the way') == 'BY THE WAY'
+
+
+def test_match_case_ignores_symbols():
+    assert match_case(':Sig', 'regards') == 'Regards'
+    assert match_case(':SIG', 'regards') == 'REGARDS'
+    assert match_case(':;', 'regards') == 'regards'
+    # One capital letter capitalizes, it isn't all caps
+    assert match_case('B', 'by the way') == 'By the way'
+
+
+def test_match_case_capitalizes_first_letter():
+    assert match_case('Sig', '-- regards') == '-- Regards'
+    assert match_case('Sig', '123') == '123'
+
+
+def test_match_case_trigger_typed_as_defined():
+    # Uppercase abbreviations are defined that way, typing them as defined changes nothing
+    assert match_case('BP', 'blood pressure', 'BP') == 'blood pressure'
+    assert match_case('Nyc', 'New York City', 'Nyc') == 'New York City'
+    assert match_case('Nyc', 'new york city', 'Nyc') == 'new york city'
+
+
+def test_match_case_trigger_typed_in_another_case():
+    assert match_case('Bp', 'blood pressure', 'BP') == 'Blood pressure'
+    assert match_case('bp', 'blood pressure', 'BP') == 'blood pressure'
+    assert match_case('NYC', 'new york city', 'Nyc') == 'NEW YORK CITY'
+    assert match_case('BTW', 'by the way', 'btw') == 'BY THE WAY'
+
+
+def test_plan_edit_common_prefix_is_kept():
+    assert plan_edit('func ', 'function ') == (1, 4)
+    assert plan_edit('btw ', 'by the way ') == (3, 1)
+
+
+def test_plan_edit_nothing_in_common():
+    assert plan_edit('idk ', "I don't know ") == (4, 0)
+
+
+def test_plan_edit_identical():
+    assert plan_edit('abc', 'abc') == (0, 3)
+
+
+def test_plan_edit_target_is_prefix():
+    assert plan_edit('abcd', 'ab') == (2, 2)
+
+
+def test_plan_edit_result():
+    for current, target in (('btw ', 'by the way '), ('teh ', 'the '), ('', 'x'), ('x', '')):
+        count, start = plan_edit(current, target)
+        assert current[:len(current) - count] + target[start:] == target
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+from engine.events import KeyEncoder, KeyEventRing, event_token, BACKSPACE, RESET, OVERFLOW, LEFT
+
+
+def drain(ring):
+    events = []
+    while len(ring):
+        start, count = ring.peek()
+        events.extend((ring.codes[slot], ring.stamps[slot]) for slot in range(start, start + count))
+        ring.advance(count)
+    return events
+
+
+def test_events_come_out_in_order():
+    ring = KeyEventRing(capacity=8)
+    for code in range(5):
+        assert ring.push(code, code * 10)
+    assert len(ring) == 5
+    assert drain(ring) == [(code, code * 10) for code in range(5)]
+    assert len(ring) == 0
+
+
+def test_peek_splits_at_wrap():
+    ring = KeyEventRing(capacity=8)
+    for code in range(6):
+        ring.push(code)
+    drain(ring)
+    for code in range(6):
+        ring.push(code)
+    assert ring.peek() == (6, 2)
+    ring.advance(2)
+    assert ring.peek() == (0, 4)
+    assert [code for code, _ in drain(ring)] == [2, 3, 4, 5]
+
+
+def test_overflow_drops_and_marks_the_gap():
+    ring = KeyEventRing(capacity=4)
+    results = [ring.push(code) for code in range(6)]
+    # One slot is kept for the overflow marker, later keys are dropped
+    assert results == [True, True, True, False, False, False]
+    assert ring.dropped == 3
+    assert [code for code, _ in drain(ring)] == [0, 1, 2, OVERFLOW]
+
+
+def test_overflow_marker_again_after_recovering():
+    ring = KeyEventRing(capacity=4)
+    for code in range(4):
+        ring.push(code)
+    drain(ring)
+    assert ring.push(7)
+    for code in range(3):
+        ring.push(code)
+    assert [code for code, _ in drain(ring)] == [7, 0, 1, OVERFLOW]
+    assert ring.dropped == 2
+
+
+def test_wait_returns_once_pushed():
+    ring = KeyEventRing(capacity=4)
+    ring.push(1)
+    ring.wait(timeout=1)
+    assert len(ring) == 1
+
+
+def test_encoder():
+    encoder = KeyEncoder({'space': ' ', 'enter': '\n', 'tab': '\t'}, {'shift'})
+    assert encoder.encode(SimpleNamespace(char='a')) == ord('a')
+    assert encoder.encode(SimpleNamespace(char='\x03')) == RESET
+    assert encoder.encode(SimpleNamespace(name='space')) == ord(' ')
+    assert encoder.encode(SimpleNamespace(name='backspace')) == BACKSPACE
+    assert encoder.encode(SimpleNamespace(name='shift')) is None
+    assert encoder.encode(SimpleNamespace(name='left')) == LEFT
+    assert encoder.encode(SimpleNamespace(name='right')) == RESET
+
+
+def test_event_token():
+    assert event_token(ord('a')) == 'a'
+    assert event_token(BACKSPACE) == '\b'
+    assert event_token(LEFT) == '\x1b'
+    assert event_token(RESET) == ''
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from engine.injector import InjectionWorker, EchoFilter
+from engine.events import event_token, BACKSPACE, LEFT
+
+
+def test_worker_runs_jobs_in_order_and_reports_idle():
+    done = []
+    idle = threading.Event()
+    release = threading.Event()
+    worker = InjectionWorker(on_idle=idle.set)
+    worker.start()
+    worker.submit(release.wait)
+    worker.submit(done.append, 1)
+    worker.submit(done.append, 2)
+    # Busy from the moment a job is submitted
+    assert worker.busy
+    release.set()
+    assert idle.wait(timeout=1)
+    assert done == [1, 2]
+    assert not worker.busy
+    worker.stop()
+
+
+def test_worker_survives_failing_job():
+    idle = threading.Event()
+    worker = InjectionWorker(on_idle=idle.set)
+    worker.start()
+    worker.submit(lambda: 1 / 0)
+    assert idle.wait(timeout=1)
+    idle.clear()
+    done = []
+    worker.submit(done.append, 1)
+    assert idle.wait(timeout=1)
+    assert done == [1]
+    worker.stop()
+
+
+def test_echo_filter_drops_injected_keys_and_cursor_moves():
+    echo = EchoFilter()
+    mark = echo.expect(2, 'ab', left=1)
+    tokens = [event_token(code) for code in (BACKSPACE, BACKSPACE, ord('a'), ord('x'), ord('b'), LEFT, LEFT)]
+    # The user's 'x' and second left arrow aren't ours
+    assert [echo.consume(token) for token in tokens] == [True, True, True, False, True, True, False]
+    assert echo.echoed(mark)
+
+
+def test_echo_filter_ignores_keys_when_nothing_expected():
+    echo = EchoFilter()
+    assert not echo.consume('a')
+
+
+def test_echo_filter_gives_up_on_keys_that_never_came_back():
+    echo = EchoFilter(timeout=0)
+    mark = echo.expect(0, 'ab')
+    assert echo.echoed(mark) is None
+    time.sleep(0.01)
+    # Noticed when the next key arrives, which is the user's own
+    assert not echo.consume('x')
+    assert echo.echoed(mark) is False
+    assert not echo.consume('a')
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+from engine.ipc import EngineServer, EngineClient, EngineError
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    controller = SimpleNamespace(stack_listeners=[], profile_listeners=[], suggestion_listeners=[],
+                                 active_window_class='firefox', recent_window_classes=['firefox'])
+    address = str(tmp_path / 'engine.sock')
+    server = EngineServer(controller, address=address)
+    server.start()
+    client = EngineClient(address)
+    yield client
+    client.close()
+    server.stop()
+
+
+def test_command(client):
+    assert client.call('active_window') == ('firefox', ['firefox'])
+
+
+def test_only_commands_are_reachable(client):
+    for name in ('controller', 'on_shutdown', '__init__', 'nonexistent'):
+        with pytest.raises(EngineError):
+            client.call(name)
+    assert client.call('active_window') == ('firefox', ['firefox'])
+
+
+def test_errors_are_returned_and_connection_survives(client):
+    # Wrong arity
+    with pytest.raises(EngineError):
+        client.call('active_window', 1, 2)
+    # Not (command, args, kwargs)
+    client._conn.send(['active_window'])
+    assert client._conn.recv()[0] == 'error'
+    client._conn.send(('active_window', None, None))
+    assert client._conn.recv()[0] == 'error'
+    # Not a pickle at all
+    client._conn.send_bytes(b'not a pickle')
+    assert client._conn.recv()[0] == 'error'
+    assert client.call('active_window') == ('firefox', ['firefox'])
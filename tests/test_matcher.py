@@ -0,0 +1,130 @@
+from engine.matcher import TriggerMatcher, HISTORY_SIZE
+
+
+def feed(matcher, text):
+    """Feed text one character at a time, returning the matches that fired."""
+    return [match for match in map(matcher.feed, text) if match is not None]
+
+
+def test_delimiter_fires_trigger():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    matches = feed(matcher, 'btw ')
+    assert len(matches) == 1
+    match = matches[0]
+    assert (match.trigger, match.expansion, match.typed, match.delimiter) == ('btw', 'by the way', 'btw', ' ')
+
+
+def test_every_delimiter_fires():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    for delimiter in ' \n\t.,;:!?()[]{}"':
+        matches = feed(matcher, 'btw' + delimiter)
+        assert [m.delimiter for m in matches] == [delimiter]
+
+
+def test_no_match_without_delimiter_or_inside_word():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    assert feed(matcher, 'btw') == []
+    matcher.reset()
+    assert feed(matcher, 'abtw ') == []
+    assert feed(matcher, 'btwx ') == []
+
+
+def test_match_after_previous_word():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    matches = feed(matcher, 'ok btw ')
+    assert [m.typed for m in matches] == ['btw']
+
+
+def test_case_insensitive_keeps_typed_text():
+    matcher = TriggerMatcher({'BTW': 'by the way'})
+    assert 'btw' in matcher
+    match, = feed(matcher, 'Btw.')
+    assert match.trigger == 'btw'
+    assert match.typed == 'Btw'
+    assert match.delimiter == '.'
+
+
+def test_match_keeps_defined_case():
+    matcher = TriggerMatcher({'BP': 'blood pressure', 'btw': 'by the way'})
+    match, = feed(matcher, 'bp ')
+    assert (match.trigger, match.defined) == ('bp', 'BP')
+    match, = feed(matcher, 'BTW ')
+    assert match.defined == 'btw'
+
+
+def test_immediate_trigger_fires_on_last_character():
+    matcher = TriggerMatcher({':date': 'today', ';sig': 'Regards'})
+    assert matcher.is_immediate(':date')
+    match, = feed(matcher, ':date')
+    assert (match.trigger, match.typed, match.delimiter) == (':date', ':date', '')
+    match, = feed(matcher, 'see ;sig')
+    assert match.expansion == 'Regards'
+
+
+def test_immediate_trigger_started_by_delimiter():
+    # ':' is both a delimiter and the first character of the trigger
+    matcher = TriggerMatcher({':d': 'today'})
+    match, = feed(matcher, 'x:d')
+    assert match.typed == ':d'
+
+
+def test_longer_trigger_with_delimiter_wins():
+    matcher = TriggerMatcher({'e': 'short', 'e.g': 'for example'})
+    match, = feed(matcher, 'e.g ')
+    assert match.expansion == 'for example'
+
+
+def test_backspace_restores_state():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    feed(matcher, 'btx')
+    matcher.backspace()
+    assert matcher.current_word == 'bt'
+    match, = feed(matcher, 'w ')
+    assert match.typed == 'btw'
+
+
+def test_backspace_over_delimiter():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    assert feed(matcher, 'btq,x') == []
+    for _ in range(3):
+        matcher.backspace()
+    assert matcher.current_word == 'bt'
+    assert feed(matcher, 'w ')[0].typed == 'btw'
+
+
+def test_backspace_fixes_typo():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    feed(matcher, 'btwx')
+    matcher.backspace()
+    assert feed(matcher, ' ')[0].typed == 'btw'
+
+
+def test_backspace_past_history_gives_up():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    feed(matcher, 'x' * (HISTORY_SIZE + 5))
+    for _ in range(HISTORY_SIZE + 5):
+        matcher.backspace()
+    assert matcher.current_word == ''
+    # Nothing is known about the word any more, so the trigger only fires in a new one
+    assert feed(matcher, 'btw ') == []
+    assert len(feed(matcher, 'btw ')) == 1
+
+
+def test_add_remove_and_get():
+    matcher = TriggerMatcher({'btw': 'by the way', 'bt': 'bluetooth'})
+    assert len(matcher) == 2
+    assert matcher.get('BTW') == 'by the way'
+    assert matcher.remove('btw')
+    assert not matcher.remove('btw')
+    assert matcher.get('btw') is None
+    assert matcher.get('bt') == 'bluetooth'
+    assert len(matcher) == 1
+    matcher.add('omw', 'on my way')
+    assert feed(matcher, 'omw ')[0].expansion == 'on my way'
+
+
+def test_reset_forgets_word():
+    matcher = TriggerMatcher({'btw': 'by the way'})
+    feed(matcher, 'bt')
+    matcher.reset()
+    assert feed(matcher, 'w ') == []
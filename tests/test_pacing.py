@@ -0,0 +1,42 @@
+from engine.pacing import InjectionPacer, DEFAULT_APP, BACKOFF_DELAY, SPEEDUP_AFTER, RETRY_AFTER
+
+
+def test_clean_injections_stay_at_the_default(tmp_path):
+    pacer = InjectionPacer(str(tmp_path / 'pacing.json'))
+    for _ in range(100):
+        pacer.record('app', 0.004, True)
+    assert pacer.delay_for('app', 0.004) == 0.004
+
+
+def test_calibrated_delay_is_the_floor(tmp_path):
+    pacer = InjectionPacer(str(tmp_path / 'pacing.json'))
+    pacer.set_delay(DEFAULT_APP, 0.003)
+    assert pacer.delay_for('app', 0.01) == 0.003
+    pacer.record('app', 0.01, False)
+    assert pacer.delay_for('app', 0.01) == 0.006
+    # The floor itself dropped keys, so it is only tried again after a while
+    for _ in range(SPEEDUP_AFTER * 10):
+        pacer.record('app', 0.01, True)
+    assert 0.003 < pacer.delay_for('app', 0.01) < 0.006
+    for _ in range(RETRY_AFTER):
+        pacer.record('app', 0.01, True)
+    assert pacer.delay_for('app', 0.01) == 0.003
+    # Unknown applications don't move the calibrated delay
+    assert not pacer.record(None, 0.01, False)
+    assert pacer.delay_for(None, 0.01) == 0.003
+
+
+def test_backs_off_from_no_delay(tmp_path):
+    pacer = InjectionPacer(str(tmp_path / 'pacing.json'))
+    pacer.record('app', 0.0, False)
+    assert pacer.delay_for('app', 0.0) == BACKOFF_DELAY
+    pacer = InjectionPacer(str(tmp_path / 'pacing.json'))
+    pacer.load()
+    assert pacer.delay_for('app', 0.0) == BACKOFF_DELAY
+
+
+def test_verified_runs_go_below_the_default(tmp_path):
+    pacer = InjectionPacer(str(tmp_path / 'pacing.json'), verified=True)
+    for _ in range(SPEEDUP_AFTER * 2):
+        pacer.record('calibrate', 0.004, True)
+    assert pacer.delay_for('calibrate', 0.004) < 0.004
@@ -0,0 +1,152 @@
+import pytest
+
+from engine.packs import ImportPlan, read_pack, write_pack, detect_format, MAX_REPORTED_PROBLEMS
+
+SHORTCUTS = [
+    ('btw', 'by the way'),
+    ('addr', 'Main St. 1, "Springfield"\nSecond line'),
+    (':tag', '<b>&amp; café</b>'),
+    ("it's", "it is, isn't it"),
+]
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def entries(path, fmt=None):
+    return list(read_pack(path, fmt))
+
+
+def pairs(path):
+    return [(trigger, expansion) for _, trigger, expansion, problem in entries(path) if problem is None]
+
+
+@pytest.mark.parametrize('name', ['pack.csv', 'pack.yml', 'pack.textexpander'])
+def test_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    write_pack(path, SHORTCUTS)
+    assert pairs(path) == SHORTCUTS
+
+
+def test_detect_format():
+    assert detect_format('a.YAML') == 'espanso'
+    assert detect_format('a.plist') == 'textexpander'
+    with pytest.raises(ValueError):
+        detect_format('a.txt')
+
+
+def test_csv_header_blank_lines_and_label_column(tmp_path):
+    path = write(tmp_path, 'pack.csv', 'Shorthand,Expansion\n\nbtw,by the way,label\n,\nidk\n')
+    assert entries(path) == [
+        ('line 3', 'btw', 'by the way', None),
+        ('line 5', 'idk', None, "no expansion column"),
+    ]
+
+
+def test_csv_without_header(tmp_path):
+    path = write(tmp_path, 'pack.csv', 'btw,by the way\n')
+    assert pairs(path) == [('btw', 'by the way')]
+
+
+def test_espanso_scalars_lists_and_blocks(tmp_path):
+    path = write(tmp_path, 'pack.yml', """# Comment
+global_vars:
+  - name: x
+matches:
+  - trigger: ":sig"
+    replace: 'It''s me'
+  - triggers: [hello, "hi there"]
+    replace: Hello # greeting
+  - trigger: addr
+    replace: |
+      Main St. 1
+      Springfield
+  - trigger: para
+    replace: >-
+      one
+      two
+  -
+    trigger: list
+    triggers:
+    - a
+    - b
+    replace: x
+""")
+    assert pairs(path) == [
+        (':sig', "It's me"),
+        ('hello', 'Hello'),
+        ('hi there', 'Hello'),
+        ('addr', 'Main St. 1\nSpringfield\n'),
+        ('para', 'one two'),
+        ('a', 'x'),
+        ('b', 'x'),
+    ]
+
+
+def test_espanso_problems(tmp_path):
+    path = write(tmp_path, 'pack.yml', """matches:
+  - trigger: date
+    replace: "{{mydate}}"
+    vars:
+      - name: mydate
+        type: date
+  - trigger: img
+    image_path: /tmp/a.png
+  - replace: orphan
+  - trigger: 'broken
+    replace: x
+""")
+    assert [(location, problem) for location, _, _, problem in entries(path)] == [
+        ('line 2', "uses espanso variables"),
+        ('line 7', "no plain text replacement"),
+        ('line 9', "no trigger"),
+        ('line 10', "unreadable trigger: unterminated string"),
+    ]
+
+
+def test_textexpander_problems_and_malformed(tmp_path):
+    path = write(tmp_path, 'pack.textexpander', """<?xml version="1.0" encoding="UTF-8"?>
+<plist version="1.0"><dict><key>snippetsTE2</key><array>
+<dict><key>abbreviation</key><string>btw</string><key>plainText</key><string>by the way</string></dict>
+<dict><key>abbreviation</key><string>pic</string><key>plainText</key><string></string></dict>
+</array></dict></plist>
+""")
+    assert entries(path) == [
+        ('snippet 1', 'btw', 'by the way', None),
+        ('snippet 2', 'pic', None, "no plain text"),
+    ]
+    path = write(tmp_path, 'broken.textexpander', '<plist><dict><key>abbreviation</key>')
+    with pytest.raises(ValueError):
+        entries(path)
+
+
+def test_import_plan_sorts_entries():
+    existing = {'BTW': 'by the way', 'idk': "I don't know"}
+    plan = ImportPlan([
+        ('line 1', 'omw', 'on my way', None),
+        ('line 2', 'btw', 'by the way', None),      # Already there, matched case-insensitively
+        ('line 3', 'idk', 'I do not know', None),   # Conflict
+        ('line 4', 'OMW', 'on my way!', None),      # Repeated in the pack
+        ('line 5', 'two words', 'x', None),
+        ('line 6', '  ', 'x', None),
+        ('line 7', 'gone', '', None),
+        ('line 8', 'img', None, "no plain text"),
+    ], existing)
+    assert plan.added == {'omw': 'on my way'}
+    assert plan.conflicts == {'idk': ("I don't know", 'I do not know')}
+    assert plan.duplicates == 2
+    assert [problem for _, _, problem in plan.problems] == [
+        "shorthand contains whitespace", "empty shorthand", "empty expansion", "no plain text"]
+    assert plan.summary() == "1 new, 1 conflicting, 2 duplicate, 4 invalid"
+    assert plan.shortcuts() == {'omw': 'on my way'}
+    # Conflicts replace the profile's expansion under the profile's own trigger
+    assert plan.shortcuts(overwrite=True) == {'omw': 'on my way', 'idk': 'I do not know'}
+
+
+def test_import_plan_caps_reported_problems():
+    plan = ImportPlan(((f'line {i}', '', 'x', None) for i in range(MAX_REPORTED_PROBLEMS + 5)), {})
+    assert plan.problem_count == MAX_REPORTED_PROBLEMS + 5
+    assert len(plan.problems) == MAX_REPORTED_PROBLEMS
@@ -0,0 +1,65 @@
+from engine.matcher import TriggerMatcher
+from engine.profile_stack import ProfileStack
+
+
+def apply(matcher, updates):
+    # As the controller applies a refresh to the matcher
+    for trigger, expansion in updates.items():
+        if expansion is None:
+            matcher.remove(trigger)
+        else:
+            matcher.add(trigger, expansion)
+
+
+def test_later_profiles_win():
+    profiles = {'Default': {'btw': 'by the way', 'idk': "I don't know"}, 'Dev': {'btw': 'between'}}
+    stack = ProfileStack(('Default', 'Dev'), profiles)
+    assert stack.top == 'Dev'
+    assert stack.shortcuts == {'btw': 'between', 'idk': "I don't know"}
+
+
+def test_refresh_falls_through_to_lower_profile():
+    profiles = {'Default': {'btw': 'by the way'}, 'Dev': {'btw': 'between'}}
+    stack = ProfileStack(('Default', 'Dev'), profiles)
+    del profiles['Dev']['btw']
+    assert stack.refresh(profiles, ['btw']) == {'btw': 'by the way'}
+    assert stack.shortcuts == {'btw': 'by the way'}
+
+
+def test_refresh_removes_trigger_nobody_has():
+    profiles = {'Default': {}, 'Dev': {'fn': 'function'}}
+    stack = ProfileStack(('Default', 'Dev'), profiles)
+    del profiles['Dev']['fn']
+    assert stack.refresh(profiles, ['fn']) == {'fn': None}
+    assert stack.shortcuts == {}
+
+
+def test_refresh_ignores_case_like_the_matcher():
+    profiles = {'Default': {'btw': 'by the way'}, 'Dev': {'BTW': 'between'}}
+    stack = ProfileStack(('Default', 'Dev'), profiles)
+    matcher = TriggerMatcher(stack.shortcuts)
+    assert matcher.get('btw') == 'between'
+
+    del profiles['Dev']['BTW']
+    updates = stack.refresh(profiles, ['BTW'])
+    assert list(updates.items()) == [('BTW', None), ('btw', 'by the way')]
+    apply(matcher, updates)
+    assert matcher.get('btw') == 'by the way'
+    assert stack.shortcuts == {'btw': 'by the way'}
+
+
+def test_refresh_finds_other_case_in_lower_profile():
+    profiles = {'Default': {'Btw': 'by the way'}, 'Dev': {'btw': 'between'}}
+    stack = ProfileStack(('Default', 'Dev'), profiles)
+    matcher = TriggerMatcher(stack.shortcuts)
+    del profiles['Dev']['btw']
+    apply(matcher, stack.refresh(profiles, ['btw']))
+    assert matcher.get('btw') == 'by the way'
+
+
+def test_refresh_single_profile():
+    profiles = {'Default': {'btw': 'by the way'}}
+    stack = ProfileStack(('Default',), profiles)
+    profiles['Default'] = {'btw': 'by the way', 'omw': 'on my way'}
+    assert stack.refresh(profiles, ['omw']) == {'omw': 'on my way'}
+    assert stack.shortcuts is profiles['Default']
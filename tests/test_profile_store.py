@@ -0,0 +1,240 @@
+import json
+import os
+
+import pytest
+
+from engine.profile_store import ProfileStore, scan_profile_offsets
+
+DEFAULTS = {
+    'Default': {'btw': 'by the way', 'idk': "I don't know"},
+    'Dev': {'fn': 'function'},
+}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'profiles.json')
+
+
+def open_store(path, **kwargs):
+    return ProfileStore(path, defaults=DEFAULTS, **kwargs)
+
+
+def read_snapshot(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_defaults_written_on_first_start(path):
+    store = open_store(path)
+    assert read_snapshot(path) == DEFAULTS
+    assert list(store) == ['Default', 'Dev']
+    assert store['Dev'] == {'fn': 'function'}
+    store.close()
+
+
+def test_edits_go_to_journal_not_snapshot(path):
+    store = open_store(path)
+    store.set_shortcut('Default', 'omw', 'on my way')
+    store.delete_shortcut('Default', 'idk')
+    assert store['Default'] == {'btw': 'by the way', 'omw': 'on my way'}
+    assert read_snapshot(path) == DEFAULTS
+    with open(path + '.journal') as f:
+        assert [json.loads(line) for line in f] == [['set', 'Default', 'omw', 'on my way'], ['del', 'Default', 'idk']]
+    store.close()
+
+
+def test_reopen_replays_journal(path):
+    store = open_store(path)
+    store.set_shortcut('Dev', 'ret', 'return')
+    store.create_profile('Legal')
+    store.set_shortcuts('Legal', {'crt': 'court', 'def': 'defendant'})
+    store.delete_profile('Default')
+    store.close()
+
+    store = open_store(path)
+    assert list(store) == ['Dev', 'Legal']
+    assert store['Dev'] == {'fn': 'function', 'ret': 'return'}
+    assert store['Legal'] == {'crt': 'court', 'def': 'defendant'}
+    store.close()
+
+
+def test_torn_journal_entry_is_dropped(path):
+    store = open_store(path)
+    store.set_shortcut('Dev', 'ret', 'return')
+    store.close()
+    with open(path + '.journal', 'a') as f:
+        f.write('["set", "Dev", "im')
+    store = open_store(path)
+    assert store['Dev'] == {'fn': 'function', 'ret': 'return'}
+    store.set_shortcut('Dev', 'imp', 'import')
+    store.close()
+    store = open_store(path)
+    assert store['Dev'] == {'fn': 'function', 'ret': 'return', 'imp': 'import'}
+    store.close()
+
+
+def test_compact_folds_journal_into_snapshot(path):
+    store = open_store(path)
+    store.set_shortcut('Dev', 'ret', 'return')
+    store.create_profile('Empty')
+    store.delete_profile('Default')
+    store.compact()
+    assert os.path.getsize(path + '.journal') == 0
+    assert read_snapshot(path) == {'Dev': {'fn': 'function', 'ret': 'return'}, 'Empty': {}}
+    store.close()
+
+    store = open_store(path)
+    assert dict(store.items()) == {'Dev': {'fn': 'function', 'ret': 'return'}, 'Empty': {}}
+    store.close()
+
+
+def test_in_memory_store():
+    store = ProfileStore(None, defaults=DEFAULTS)
+    store.set_shortcut('Dev', 'ret', 'return')
+    store.create_profile('Legal')
+    store.set_shortcut('Legal', 'crt', 'court')
+    store.compact()
+    assert store.reload() is None
+    assert not store.changed_on_disk()
+    assert store['Dev'] == {'fn': 'function', 'ret': 'return'}
+    assert store['Legal'] == {'crt': 'court'}
+    store.close()
+
+
+def test_compact_keeps_offsets_of_untouched_profiles(path):
+    store = open_store(path)
+    store.set_shortcut('Default', 'omw', 'on my way')
+    store.compact()
+    with open(path, 'rb') as f:
+        data = f.read()
+    for name, (start, end) in scan_profile_offsets(data).items():
+        assert json.loads(data[start:end]) == store[name]
+    store.close()
+
+
+def test_index_used_on_reopen(path):
+    store = open_store(path)
+    store.close()
+    assert os.path.exists(path + '.index')
+    store = open_store(path)
+    assert store['Default'] == DEFAULTS['Default']
+    store.close()
+
+
+def test_profiles_load_lazily_and_evict(path):
+    store = open_store(path, max_loaded_shortcuts=1)
+    assert not store.is_loaded('Default')
+    store.pin('Default')
+    assert store['Default'] == DEFAULTS['Default']
+    store['Dev']
+    # Default is pinned, so only Dev can go once the limit is exceeded
+    assert store.is_loaded('Default')
+    store.close()
+
+
+def test_reload_reports_external_changes(path):
+    store = open_store(path)
+    store['Default']
+    store.set_shortcut('Default', 'omw', 'on my way')
+    assert store.reload() is None
+    with open(path, 'w') as f:
+        json.dump({'Default': {'btw': 'between', 'idk': "I don't know"}, 'Dev': {'fn': 'function'}}, f)
+    changes = store.reload()
+    # The journaled edit stays on top of the new snapshot
+    assert changes == {'Default': ({'btw': 'between'}, [])}
+    assert store['Default'] == {'btw': 'between', 'idk': "I don't know", 'omw': 'on my way'}
+    store.close()
+
+
+def test_scan_profile_offsets_rejects_incomplete_file():
+    with pytest.raises(ValueError):
+        scan_profile_offsets(b'{"Default": {"btw": "by the way"}')
+
+
+BROKEN = b'{"Default": {"btw": "by the way"}, "Dev": {"fn": "function",}, "Torn": {"a": "b" "c": "d"}}'
+
+
+def test_broken_profiles_are_marked_unreadable_when_read(path):
+    with open(path, 'wb') as f:
+        f.write(BROKEN)
+    store = open_store(path)
+    assert list(store) == ['Default', 'Dev', 'Torn']
+    assert store['Default'] == {'btw': 'by the way'}
+    # Nothing is parsed before it is needed
+    assert store.is_readable('Dev')
+    with pytest.raises(ValueError):
+        store['Dev']
+    assert not store.is_readable('Dev')
+    assert store.is_readable('Torn')
+    store.close()
+    # Remembered in the index
+    store = open_store(path)
+    assert not store.is_readable('Dev')
+    store.close()
+
+
+def test_stale_index_keeps_marks_of_unmoved_profiles(path):
+    with open(path, 'wb') as f:
+        f.write(BROKEN)
+    store = open_store(path)
+    for name in ('Dev', 'Torn'):
+        with pytest.raises(ValueError):
+            store[name]
+    store.close()
+    # Torn moves and is repaired, Dev stays where it was
+    with open(path, 'wb') as f:
+        f.write(BROKEN.replace(b'"Torn": {"a": "b" "c"', b'"Torn": {"a": "b", "c"'))
+    store = open_store(path)
+    assert not store.is_readable('Dev')
+    assert store['Torn'] == {'a': 'b', 'c': 'd'}
+    store.close()
+
+
+def test_compact_keeps_unreadable_profiles_and_their_edits(path):
+    with open(path, 'wb') as f:
+        f.write(BROKEN)
+    store = open_store(path)
+    # Dev is found broken while compacting, Torn is copied without being read
+    store.set_shortcut('Dev', 'ret', 'return')
+    store.set_shortcut('Default', 'omw', 'on my way')
+    store.compact()
+    assert not store.is_readable('Dev')
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert b'{"fn": "function",}' in data
+    assert b'{"a": "b" "c": "d"}' in data
+    with open(path + '.journal') as f:
+        assert [json.loads(line) for line in f] == [['set', 'Dev', 'ret', 'return']]
+    store.close()
+
+
+def test_unreadable_profile_found_when_read(path):
+    with open(path, 'wb') as f:
+        f.write(b'{"Default": {"btw": "by the way"}, "Dev": {"fn": "function"}}')
+    open_store(path).close()
+    # Same size and time, so the index still counts as current and nothing is checked until read
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, 'r+b') as f:
+        f.seek(-4, os.SEEK_END)
+        f.write(b'",}}')
+    os.utime(path, ns=(mtime, mtime))
+    store = open_store(path)
+    assert store.is_readable('Dev')
+    with pytest.raises(ValueError):
+        store['Dev']
+    assert not store.is_readable('Dev')
+    store.close()
+
+
+def test_reload_leaves_other_profiles_unread(path):
+    store = open_store(path)
+    store['Default']
+    with open(path, 'wb') as f:
+        f.write(b'{"Default": {"btw": "between"}, "Dev": {"fn": "function",}}')
+    # Dev isn't loaded, so its broken text only matters once it is read
+    assert store.reload() == {'Default': ({'btw': 'between'}, ['idk'])}
+    assert store.is_readable('Dev')
+    with pytest.raises(ValueError):
+        store['Dev']
+    store.close()
@@ -0,0 +1,65 @@
+import random
+
+from engine.search_index import ShortcutSearchIndex
+
+ROWS = [
+    (0, 'btw', 'by the way'),
+    (1, 'BRB', 'be right back'),
+    (2, 'addr', 'Main Street 1'),
+    (3, 'sig', 'Best regards'),
+]
+
+
+def brute_force(rows, query):
+    return sorted(row_id for row_id, trigger, expansion in rows
+                  if ShortcutSearchIndex.matches(query, trigger, expansion))
+
+
+def test_short_query_matches_trigger_start():
+    index = ShortcutSearchIndex(ROWS)
+    assert index.search('b') == [0, 1]
+    assert index.search('BR') == [1]
+    # Not the expansion, and not inside the trigger
+    assert index.search('ma') == []
+    assert index.search('tw') == []
+
+
+def test_long_query_matches_anywhere():
+    index = ShortcutSearchIndex(ROWS)
+    assert index.search('street') == [2]
+    assert index.search('REG') == [3]
+    assert index.search('the') == [0]
+    # Each row once, even with several hits
+    assert index.search('bes') == [3]
+
+
+def test_query_does_not_span_rows():
+    index = ShortcutSearchIndex([(0, 'aaa', 'xx'), (1, 'yy', 'bbb')])
+    assert index.search('xxyy') == []
+
+
+def test_empty_query_lists_all():
+    assert ShortcutSearchIndex(ROWS).search('') == [0, 1, 2, 3]
+
+
+def test_add_and_remove():
+    index = ShortcutSearchIndex(ROWS)
+    index.add(4, 'omw', 'on my way')
+    assert index.search('om') == [4]
+    assert index.search('my way') == [4]
+    # Re-adding a row replaces it
+    index.add(0, 'bbw', 'big bad wolf')
+    assert index.search('the way') == []
+    assert index.search('bb') == [0]
+    index.remove(2)
+    assert index.search('street') == []
+    assert len(index) == 4
+
+
+def test_matches_brute_force():
+    rng = random.Random(1)
+    rows = [(i, ''.join(rng.choice('abc') for _ in range(rng.randrange(1, 5))),
+             ' '.join(rng.choice(['ab', 'bc', 'ca', 'Abc']) for _ in range(3))) for i in range(300)]
+    index = ShortcutSearchIndex(rows)
+    for query in ('a', 'ab', 'abc', 'bc ca', 'cab', 'ABC'):
+        assert index.search(query) == brute_force(rows, query)
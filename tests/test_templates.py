@@ -0,0 +1,84 @@
+import time
+
+from engine.templates import compile_template, compile_templates, Template, MAX_NESTING
+
+
+def render(text, shortcuts=None, clipboard=None):
+    # Looked up like the controller does, by lowercased trigger
+    shortcuts = {trigger.lower(): expansion for trigger, expansion in (shortcuts or {}).items()}
+    templates = compile_templates(shortcuts)
+
+    def resolve(trigger):
+        return templates.get(trigger) or shortcuts.get(trigger)
+
+    return compile_template(text).render(resolve, lambda: clipboard)
+
+
+def test_static_expansions_are_not_templates():
+    assert compile_template('by the way') is None
+    assert compile_template('{unknown} and {braces}') is None
+    assert compile_template('{date') is None
+
+
+def test_unknown_placeholders_and_escaped_braces_are_typed():
+    assert render('{{date}} {unknown} {date:} {@} {cursor}') == ('{date} {unknown} {date:} {@} ', 0)
+
+
+def test_date_formats():
+    now = time.localtime()
+    text, _ = render('{date}|{date:%d.%m.%Y}')
+    assert text == time.strftime('%Y-%m-%d', now) + '|' + time.strftime('%d.%m.%Y', now)
+
+
+def test_cursor_counts_characters_after_it():
+    assert render('<b>{cursor}</b>') == ('<b></b>', 4)
+    assert render('{cursor}abc') == ('abc', 3)
+    assert render('abc{cursor}') == ('abc', 0)
+    # Only the first cursor counts
+    assert render('a{cursor}b{cursor}c') == ('abc', 2)
+
+
+def test_cursor_inside_reference():
+    shortcuts = {'tag': '<{cursor}>', 'wrap': '[{@tag}]'}
+    assert render('x{@wrap}y', shortcuts) == ('x[<>]y', 3)
+
+
+def test_clipboard_read_once():
+    reads = []
+
+    def get_clipboard():
+        reads.append(1)
+        return 'clip'
+
+    template = compile_template('{clipboard}-{clipboard}')
+    assert template.render(lambda trigger: None, get_clipboard) == ('clip-clip', 0)
+    assert len(reads) == 1
+    # Nothing in the clipboard types nothing
+    assert render('[{clipboard}]') == ('[]', 0)
+
+
+def test_clipboard_not_read_when_unused():
+    def get_clipboard():
+        raise AssertionError("clipboard read")
+
+    assert compile_template('{date:%Y}').render(lambda trigger: None, get_clipboard)[0]
+
+
+def test_references():
+    shortcuts = {'sig': 'Regards, {@name}', 'name': 'Ann', 'Btw': 'by the way'}
+    assert render('{@sig}', shortcuts) == ('Regards, Ann', 0)
+    # Triggers are looked up lowercased, missing ones are typed as written
+    assert render('{@BTW} {@missing}', shortcuts) == ('by the way {@missing}', 0)
+
+
+def test_reference_cycles_stop_at_max_nesting():
+    shortcuts = {'a': 'a{@b}', 'b': 'b{@a}'}
+    text, _ = render('{@a}', shortcuts)
+    # The reference that would go deeper is typed as written
+    assert text == 'ab' * (MAX_NESTING // 2) + '{@a}'
+
+
+def test_compile_templates_keys_lowercased_triggers():
+    templates = compile_templates({'Sig': 'Regards {cursor}', 'btw': 'by the way'})
+    assert list(templates) == ['sig']
+    assert isinstance(templates['sig'], Template)